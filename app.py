@@ -1,28 +1,42 @@
+import os
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
+from dashboard_charts import bar_chart, monthly_chart, trend_chart
+from dashboard_data import DISPLAY_NAMES, POLLUTANTS, cube_version, load_cubes
+from figure_cache import FigureCache
+from trends import TRENDS_FILE, load_trends, run_trends
 
 # Seite konfigurieren
 st.set_page_config(page_title="Luftqualitätsvergleich", layout="centered")
 
-# Daten laden
-df = pd.read_csv("data/test_dashboard_air_quality.csv")
-df["Datum"] = pd.to_datetime(df[["Year", "Month", "Day"]])
+# Daten laden: vorberechnete Monats-/Jahresmittel (siehe dashboard_data.py), einmal je Datenstand
+@st.cache_data
+def wuerfel_laden(version):
+    return load_cubes()
+
+# Trendkomponenten aller Städte und Schadstoffe (siehe trends.py), fehlende Datei einmal aus dem Würfel erzeugen
+@st.cache_data
+def trend_laden(version):
+    df_trend, _ = load_trends()
+    if df_trend is None:
+        df_trend = run_trends(load_cubes().monthly, max_workers=1)
+    return df_trend.dropna(subset=["Trend"])
+
+# gerenderte Diagramme, geteilt zwischen allen Sitzungen
+@st.cache_resource
+def diagramm_cache():
+    return FigureCache(max_entries=128)
+
+wuerfel = wuerfel_laden(cube_version())
+bilder = diagramm_cache()
 
 # Stadt A und Stadt B auswählen
-alle_staedte = sorted(df["City"].unique())
+alle_staedte = wuerfel.cities
 stadt_a = st.selectbox("Stadt A auswählen", alle_staedte, index=0)
 stadt_b = st.selectbox("Stadt B auswählen", alle_staedte, index=1)
 
 # Schadstoff-Auswahl
-schadstoffe = ["Pm25", "Co", "No2", "So2", "O3"]
-anzeige_namen = {
-    "Pm25": "PM2.5",
-    "Co": "CO",
-    "No2": "NO₂",
-    "So2": "SO₂",
-    "O3": "O₃"
-}
+schadstoffe = POLLUTANTS
+anzeige_namen = DISPLAY_NAMES
 auswahl = st.selectbox("Wähle einen Schadstoff", schadstoffe)
 
 # Grenzwert-Modus auswählen
@@ -31,100 +45,30 @@ modus = st.radio(
     ("Offizieller Grenzwert", "Statistisch (oberes Quartil)")
 )
 
-# Grenzwert festlegen
-if modus == "Offizieller Grenzwert":
-    if auswahl == "Pm25":
-        grenzwert = 25
-    elif auswahl == "No2":
-        grenzwert = 40
-    elif auswahl == "So2":
-        grenzwert = 20
-    elif auswahl == "O3":
-        grenzwert = 100
-    elif auswahl == "Co":
-        grenzwert = 5  # Beispielwert in mg/m³
-    else:
-        grenzwert = None
-else:
-    grenzwert = df[auswahl].quantile(0.75)
+# Grenzwert festlegen (offizieller Wert oder oberes Quartil der Tageswerte)
+grenzwert = wuerfel.threshold(auswahl, modus)
 
 st.caption(f"Verwendeter Grenzwert für {anzeige_namen[auswahl]}: {grenzwert:.2f}")
 
-# Farben definieren
-farbe_a = "#4c7195"     # Stadt A
-farbe_b = "#6ec9e0"     # Stadt B
-farbe_hoch_a = "#c62828"  # Hoher Wert A (Dunkelrot)
-farbe_hoch_b = "#ff4069"  # Hoher Wert B (Leuchtrot)
-
-# Monatliche Mittelwerte vorbereiten
-df["Jahr_Monat"] = df["Datum"].dt.to_period("M")
-df_grouped = df.groupby(["City", "Jahr_Monat"])[auswahl].mean().reset_index()
-df_grouped["Jahr_Monat"] = df_grouped["Jahr_Monat"].astype(str)
-df_grouped["Jahr_Monat"] = pd.to_datetime(df_grouped["Jahr_Monat"])
-
-# Daten filtern
-df_a = df_grouped[df_grouped["City"] == stadt_a]
-df_b = df_grouped[df_grouped["City"] == stadt_b]
+# Monatliche Mittelwerte der beiden Städte aus dem Würfel
+df_a = wuerfel.monthly_city(stadt_a, auswahl)
+df_b = wuerfel.monthly_city(stadt_b, auswahl)
 
 # Abschnittstrennung im Dashboard: Balkendiagramm
 st.markdown("## 🌍 Vergleich der Jahresmittelwerte")
 
-# Jahresmittelwerte berechnen
-df["Jahr"] = df["Datum"].dt.year
-jahresmittel = df.groupby(["City", "Jahr"])[auswahl].mean().reset_index()
-
-# Neuestes Jahr wählen (z. B. 2023, 2022 ...)
-letztes_jahr = jahresmittel["Jahr"].max()
-df_letztes_jahr = jahresmittel[jahresmittel["Jahr"] == letztes_jahr]
-
-# Balkendiagramm mit matplotlib
-fig_bar, ax_bar = plt.subplots()
-farben = {
-    "Delhi": "#ff4069",
-    "Tokyo": "#4c7195",
-    "Osaka": "#6ec9e0"
-}
-ax_bar.bar(
-    df_letztes_jahr["City"],
-    df_letztes_jahr[auswahl],
-    color=[farben[stadt] for stadt in df_letztes_jahr["City"]]
-)
-
-# Styling
-ax_bar.set_title(f"{anzeige_namen[auswahl]}-Jahresmittel {letztes_jahr}")
-ax_bar.set_ylabel(f"{anzeige_namen[auswahl]} (µg/m³)")
-ax_bar.set_xlabel("Stadt")
-ax_bar.grid(axis="y")
+# Jahresmittelwerte im neuesten Jahr (z. B. 2023, 2022 ...)
+letztes_jahr, df_letztes_jahr = wuerfel.yearly_latest(auswahl)
 
-# Balkendiagramm anzeigen
-st.pyplot(fig_bar)
+# Balkendiagramm (gerendert nur beim ersten Aufruf je Schadstoff und Datenstand)
+st.image(bilder.get(("bar", auswahl, wuerfel.version),
+                    lambda: bar_chart(letztes_jahr, df_letztes_jahr, auswahl)),
+         use_container_width=True)
 
 # Abschnittstrennung im Dashboard: Liniendiagramm
-
-# Plot erstellen
-fig, ax = plt.subplots()
-
-# Linien plotten
-# Linien plotten
-ax.plot(df_a["Jahr_Monat"], df_a[auswahl], label=stadt_a, marker='o', color=farbe_a)
-ax.plot(df_b["Jahr_Monat"], df_b[auswahl], label=stadt_b, marker='x', color=farbe_b)
-
-# Hohe Werte hervorheben
-hoch_a = df_a[df_a[auswahl] > grenzwert]
-hoch_b = df_b[df_b[auswahl] > grenzwert]
-
-ax.scatter(hoch_a["Jahr_Monat"], hoch_a[auswahl], color=farbe_hoch_a, s=50, label=f"hoch in {stadt_a}", zorder=5)
-ax.scatter(hoch_b["Jahr_Monat"], hoch_b[auswahl], color=farbe_hoch_b, s=50, label=f"hoch in {stadt_b}", zorder=5)
-
-# Styling
-ax.set_title(f"{anzeige_namen[auswahl]}-Monatsmittel in {stadt_a} vs. {stadt_b}")
-ax.set_xlabel("Monat")
-ax.set_ylabel(f"{anzeige_namen[auswahl]} (Monatsmittel)")
-ax.legend()
-ax.grid(True)
-
-# Plot anzeigen
-st.pyplot(fig)
+st.image(bilder.get(("monthly", stadt_a, stadt_b, auswahl, modus, wuerfel.version),
+                    lambda: monthly_chart(df_a, df_b, stadt_a, stadt_b, auswahl, grenzwert)),
+         use_container_width=True)
 
 # Kennzahlen berechnen
 mean_a = df_a[auswahl].mean()
@@ -155,31 +99,30 @@ with col2:
     st.caption(f"{count_b} Monatswerte")
 
 st.markdown("## 🔍 Langfristige Entwicklung (Trend aus Zeitreihenzerlegung)")
-st.caption("Visualisierung der PM2.5-Trendlinie auf Basis monatlicher Mittelwerte")
+st.caption(f"Visualisierung der {anzeige_namen[auswahl]}-Trendlinie auf Basis monatlicher Mittelwerte")
 
 # Abschnittstrennung im Dashboard: Trendlinien
 
 # Trenddaten laden
-df_trend = pd.read_csv("data/trendlinien_pm25.csv")
-df_trend["Datum"] = pd.to_datetime(df_trend["Datum"])
+trend_version = os.path.getmtime(TRENDS_FILE) if os.path.exists(TRENDS_FILE) else wuerfel.version
+df_trend = trend_laden(trend_version)
+df_trend = df_trend[df_trend["Pollutant"] == auswahl]
 
 # Daten für Stadt A und B
 trend_a = df_trend[df_trend["City"] == stadt_a]
 trend_b = df_trend[df_trend["City"] == stadt_b]
 
-# Plot erstellen
-fig_trend, ax_trend = plt.subplots()
-
-# Linien plotten
-ax_trend.plot(trend_a["Datum"], trend_a["Trend"], label=f"{stadt_a}", color=farbe_a, linewidth=2)
-ax_trend.plot(trend_b["Datum"], trend_b["Trend"], label=f"{stadt_b}", color=farbe_b, linewidth=2)
-
-# Styling
-ax_trend.set_title(f"PM2.5-Trend in {stadt_a} vs. {stadt_b}")
-ax_trend.set_xlabel("Jahr")
-ax_trend.set_ylabel("Trend (PM2.5)")
-ax_trend.legend()
-ax_trend.grid(True)
+# Städte ohne genug Monatswerte für eine Zerlegung
+for stadt, trend in [(stadt_a, trend_a), (stadt_b, trend_b)]:
+    if trend.empty:
+        st.warning(f"⚠️ Für {stadt} liegen zu wenige {anzeige_namen[auswahl]}-Monatswerte für eine Trendlinie vor.")
 
 # Anzeigen
-st.pyplot(fig_trend)
+st.image(bilder.get(("trend", stadt_a, stadt_b, auswahl, trend_version),
+                    lambda: trend_chart(trend_a, trend_b, stadt_a, stadt_b, auswahl)),
+         use_container_width=True)
+
+# Trefferquote des Diagramm-Caches
+statistik = bilder.stats()
+st.sidebar.caption(f"Diagramm-Cache: {statistik['hits']} Treffer, {statistik['misses']} neu gerendert "
+                   f"({statistik['hit_rate']:.0%}), {statistik['entries']} Bilder")
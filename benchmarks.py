@@ -0,0 +1,261 @@
+import os
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import gazetteer
+import population
+import data_preparation
+from data_preparation import reshape_species, SPECIES_COLUMNS
+from instrumentation import Instrumentation
+from synthetic_data import generate_sources, fake_meteostat, BASE_DAYS
+from weather_cache import WeatherCache, WEATHER_CACHE_DIR
+
+# Benchmarks für einzelne Pipeline-Schritte
+# Aufruf: python benchmarks.py --cities 500 --days 730
+# Stufen der Bereinigung auf synthetischen Quelldaten (ohne Netz, Meteostat simuliert, Wetter-Cache echt auf der Platte):
+#   python benchmarks.py --suite stages --scale 10 --save-baseline
+#   python benchmarks.py --suite stages --scale 10 --compare
+#   python benchmarks.py --suite stages --scale 10 --compare --save-baseline   (erst vergleichen, dann speichern)
+
+ALL_SPECIES = ["co", "dew", "humidity", "no2", "o3", "pm10", "pm25", "pressure", "so2",
+               "temperature", "wind-gust", "wind-speed", "aqi", "uvi", "wd", "precipitation"]
+
+def make_long_table(n_cities=100, n_days=365, species=ALL_SPECIES, seed=0):
+    """Synthetische Rohdaten im WAQI-Langformat (eine Zeile je Tag/Stadt/Specie, mit Duplikaten)"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2019-01-01", periods=n_days, freq="D")
+    cities = [f"city_{i}" for i in range(n_cities)]
+    countries = [f"C{i % 40}" for i in range(n_cities)]
+
+    n = n_days * n_cities * len(species)
+    city_idx = np.tile(np.repeat(np.arange(n_cities), len(species)), n_days)
+    df = pd.DataFrame({
+        "Date": np.repeat(dates.to_numpy(), n_cities * len(species)),
+        "Country": pd.Categorical(np.asarray(countries)[city_idx]),
+        "City": pd.Categorical(np.asarray(cities)[city_idx]),
+        "Specie": pd.Categorical(np.tile(species, n_days * n_cities)),
+        "count": rng.integers(1, 50, n).astype("int32"),
+        "min": rng.random(n).astype("float32"),
+        "max": rng.random(n).astype("float32"),
+        "median": (rng.random(n) * 100).astype("float32"),
+        "variance": rng.random(n).astype("float32"),
+    })
+    # ca. 10 % der Zeilen doppelt, wie bei Stationen mit mehreren Einträgen pro Tag
+    return pd.concat([df, df.sample(frac=0.1, random_state=seed)], ignore_index=True)
+
+def reshape_reference(df):
+    """Bisheriger Weg in data_cleaning: groupby + pivot, Date als String und zurück"""
+    df = df.copy()
+    df = df.drop(columns=['variance', 'min', 'max'], errors='ignore')
+    df = df.groupby(["Date", "Country", "City", "Specie"], as_index=False, observed=True).agg({"median": "mean"})
+    df = df.pivot(index=["Date", "Country", "City"], columns="Specie", values='median').reset_index()
+    df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
+def measure(func, *args, **kwargs):
+    """Laufzeit (s) und Spitzenspeicher (MB, tracemalloc) eines Aufrufs"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 1024 ** 2
+
+def bench_reshape(n_cities=200, n_days=365, repeat=3):
+    """Vergleicht reshape_species mit dem bisherigen groupby + pivot auf denselben Daten"""
+    df = make_long_table(n_cities, n_days)
+
+    old_times, new_times, old_peaks, new_peaks = [], [], [], []
+    for _ in range(repeat):
+        old, seconds, peak = measure(reshape_reference, df)
+        old_times.append(seconds)
+        old_peaks.append(peak)
+        new, seconds, peak = measure(reshape_species, df)
+        new_times.append(seconds)
+        new_peaks.append(peak)
+
+    # gleiche Werte auf den gemeinsamen Spalten
+    old = old[["Date", "Country", "City"] + SPECIES_COLUMNS].astype({"Country": str, "City": str})
+    pd.testing.assert_frame_equal(new, old, check_names=False, check_dtype=False,
+                                  check_column_type=False, check_index_type=False)
+
+    result = {
+        "rows_in": len(df),
+        "rows_out": len(new),
+        "old_seconds": min(old_times),
+        "new_seconds": min(new_times),
+        "speedup": min(old_times) / min(new_times),
+        "old_peak_mb": min(old_peaks),
+        "new_peak_mb": min(new_peaks),
+    }
+    print(f"reshape: {result['rows_in']:,} Zeilen -> {result['rows_out']:,} Zeilen")
+    print(f"  groupby + pivot : {result['old_seconds']:.3f} s, Spitze {result['old_peak_mb']:.1f} MB")
+    print(f"  reshape_species : {result['new_seconds']:.3f} s, Spitze {result['new_peak_mb']:.1f} MB")
+    print(f"  Speedup {result['speedup']:.1f}x, Speicher {result['new_peak_mb'] / result['old_peak_mb']:.0%}")
+    return result
+
+BASELINE_FILE = './benchmark_baseline.json'
+# Kennzahlen, die mit der Baseline verglichen werden
+COMPARED_METRICS = ["seconds", "peak_mb"]
+
+@contextmanager
+def _working_dir(path):
+    """Arbeitsverzeichnis vorübergehend wechseln (die Pipeline liest ./data/...)"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+def _cold_start():
+    """Gazetteer, Einwohnertabelle und Wetter-Cache neu laden lassen, wie bei einem frischen Lauf"""
+    gazetteer._loaded.clear()
+    population._loaded.clear()
+    if os.path.exists(gazetteer.GAZETTEER_FILE):
+        os.remove(gazetteer.GAZETTEER_FILE)
+    shutil.rmtree(WEATHER_CACHE_DIR, ignore_errors=True)
+
+def run_stages(max_workers=1, compact=False):
+    """
+    Ein Durchlauf von data_import und data_cleaning im aktuellen Verzeichnis; gibt {Stufe: Kennzahlen} zurück
+    Gemessen wird der echte data_cleaning-Aufruf mit Instrumentation.active(): data_cleaning selbst und
+    jeder seiner Schritte (reshape_species, geo_data, weather_data, ...) als eigene Stufe.
+    compact=True: data_cleaning(compact=True) mit Copy-on-Write und kompaktem Schema nach jedem Schritt
+    Die Wetterdaten laufen wie im echten Lauf über den WeatherCache auf der Platte (WEATHER_CACHE_DIR relativ
+    zum aktuellen Verzeichnis); nur Meteostat selbst ist simuliert.
+    """
+    _cold_start()
+    instrumentation = Instrumentation()
+    with instrumentation.active():
+        raw = data_preparation.data_import(data_folder='./data/', max_workers=max_workers)
+        data_preparation.data_cleaning(raw, weather_cache=WeatherCache(WEATHER_CACHE_DIR), compact=compact)
+
+    results = {}
+    for record in instrumentation.stages:
+        first_input = next(iter(record["inputs"].values()), {})
+        results[record["stage"]] = {
+            "seconds": record["wall_seconds"], "peak_mb": record["peak_mb"],
+            "rows_in": record["rows_in"], "cols_in": first_input.get("columns", 0),
+            "rows_out": record["rows_out"] or 0, "cols_out": record["cols_out"] or 0,
+        }
+    return results
+
+def bench_stages(scale=1, n_days=BASE_DAYS, n_cities=None, repeat=1, seed=0, max_workers=1, compact=False):
+    """
+    Laufzeit und Spitzenspeicher je Stufe auf synthetischen Quelldaten in einem temporären Verzeichnis
+    Bei repeat > 1 zählt je Stufe der schnellste Lauf bzw. die kleinste Speicherspitze.
+    compact=True misst den kompakten Modus von data_cleaning (siehe run_stages).
+    """
+    root = tempfile.mkdtemp(prefix="bench_")
+    try:
+        cities = generate_sources(os.path.join(root, "data"), scale, n_days, n_cities, seed=seed)
+        runs = []
+        with _working_dir(root), fake_meteostat(n_stations=max(50, len(cities)), seed=seed) as meteostat:
+            for _ in range(repeat):
+                runs.append(run_stages(max_workers, compact))
+            weather_cache = WeatherCache(WEATHER_CACHE_DIR)
+            cache_stats = {"stations": len(weather_cache.stations()), "bytes": weather_cache.total_bytes()}
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    stages = {}
+    for name in runs[0]:
+        stages[name] = dict(runs[0][name])
+        for metric in COMPARED_METRICS:
+            stages[name][metric] = min(run[name][metric] for run in runs)
+
+    result = {
+        "settings": {"scale": scale, "n_cities": len(cities), "n_days": n_days, "repeat": repeat, "seed": seed,
+                     "compact": compact},
+        "environment": {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__},
+        "meteostat_calls": meteostat.calls,
+        "weather_cache": cache_stats,
+        "stages": stages,
+    }
+    print(f"Stufen: {len(cities)} Städte x {n_days} Tage, {repeat} Durchläufe{', kompakt' if compact else ''}")
+    for name, stage in stages.items():
+        print(f"  {name:<16}: {stage['seconds']:8.3f} s, Spitze {stage['peak_mb']:8.1f} MB, "
+              f"{stage['rows_in']:>10,} -> {stage['rows_out']:>10,} Zeilen")
+    return result
+
+def save_baseline(result, path=BASELINE_FILE):
+    """Ergebnis von bench_stages als Baseline speichern"""
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(result, file, indent=2)
+    print(f"✅ Baseline gespeichert: {path}")
+
+def load_baseline(path=BASELINE_FILE):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+def compare_and_save(result, compare=None, save=None, tolerance=0.2):
+    """
+    Reihenfolge für die Kommandozeile: erst mit der alten Baseline vergleichen, dann die neue speichern
+    Gibt True zurück, wenn eine Regression gefunden wurde; der Aufrufer beendet sich erst danach mit Fehler.
+    """
+    regression = False
+    if compare:
+        comparison = compare_baseline(result, load_baseline(compare), tolerance)
+        regression = bool(comparison["Regression"].any())
+    if save:
+        save_baseline(result, save)
+    return regression
+
+def compare_baseline(result, baseline, tolerance=0.2, min_seconds=0.05, min_mb=1.0):
+    """
+    Vergleicht je Stufe Laufzeit und Speicher mit der Baseline
+    Regression: mehr als (1 + tolerance) x Baseline und über der Rauschgrenze (min_seconds bzw. min_mb)
+    Gibt eine Tabelle Stage, Metric, Baseline, Current, Ratio, Regression zurück.
+    """
+    if result["settings"] != baseline["settings"]:
+        print(f"⚠️ Andere Einstellungen als die Baseline: {baseline['settings']} -> {result['settings']}")
+
+    floors = {"seconds": min_seconds, "peak_mb": min_mb}
+    rows = []
+    for name, stage in result["stages"].items():
+        if name not in baseline["stages"]:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = baseline["stages"][name][metric], stage[metric]
+            ratio = new / old if old else np.inf
+            rows.append({"Stage": name, "Metric": metric, "Baseline": old, "Current": new, "Ratio": ratio,
+                         "Regression": bool(ratio > 1 + tolerance and new > floors[metric])})
+    comparison = pd.DataFrame(rows, columns=["Stage", "Metric", "Baseline", "Current", "Ratio", "Regression"])
+
+    regressions = comparison[comparison["Regression"]]
+    if regressions.empty:
+        print(f"✅ Keine Regression gegenüber der Baseline (Toleranz {tolerance:.0%})")
+    else:
+        for row in regressions.itertuples():
+            print(f"⚠️ Regression {row.Stage}/{row.Metric}: {row.Baseline:.3f} -> {row.Current:.3f} ({row.Ratio:.2f}x)")
+    return comparison
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks der Pipeline-Schritte")
+    parser.add_argument("--suite", choices=["reshape", "stages"], default="reshape")
+    parser.add_argument("--cities", type=int, default=None)
+    parser.add_argument("--days", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=None)
+    parser.add_argument("--scale", type=int, default=1, help="Stufen: 1, 10, 100 x Anzahl Städte")
+    parser.add_argument("--save-baseline", nargs="?", const=BASELINE_FILE, default=None, metavar="PATH")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_FILE, default=None, metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--compact", action="store_true", help="Stufen: kompakter Modus (Copy-on-Write, float32, Kategorien)")
+    args = parser.parse_args()
+
+    if args.suite == "reshape":
+        bench_reshape(args.cities or 200, args.days or 365, args.repeat or 3)
+    else:
+        result = bench_stages(args.scale, args.days or BASE_DAYS, args.cities, args.repeat or 1, compact=args.compact)
+        if compare_and_save(result, args.compare, args.save_baseline, args.tolerance):
+            raise SystemExit(1)
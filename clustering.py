@@ -0,0 +1,152 @@
+import os
+import json
+import hashlib
+import joblib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import pairwise_distances, silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+# Clusteranalyse der Städte nach mittlerer Schadstoffbelastung (siehe 4_cluster_analyis.ipynb)
+# - Stadt x Schadstoff-Matrix, standardisiert (StandardScaler)
+# - k-Sweep für die Elbow-Kurve: die k-Werte werden in feste Blöcke geteilt, die parallel laufen;
+#   innerhalb eines Blocks startet k mit den Zentren von k-1 plus dem am schlechtesten erklärten Punkt
+# - Inertia und Silhouette im selben Durchgang, die Distanzmatrix für die Silhouette wird nur einmal berechnet
+# - skalierte Matrix und Sweep-Ergebnisse (inkl. Modelle) werden unter dem Hash der Eingabedaten abgelegt
+
+CLUSTER_POLLUTANTS = ['Co', 'No2', 'O3', 'Pm10', 'Pm25', 'So2']
+CLUSTER_CACHE_DIR = './data/cluster_cache/'
+K_RANGE = range(1, 31)
+# feste Blockgröße, damit das Ergebnis nicht von der Anzahl der Worker abhängt
+BLOCK_SIZE = 5
+# Silhouette auf höchstens so vielen Städten (O(n²) Distanzen)
+SILHOUETTE_SAMPLE = 2000
+
+@dataclass
+class SweepResult:
+    """Ergebnis des k-Sweeps: Kennzahlen je k und die angepassten Modelle"""
+    scores: pd.DataFrame            # k, inertia, silhouette
+    models: dict                    # k -> KMeans / MiniBatchKMeans
+    scaled: pd.DataFrame            # standardisierte Stadt x Schadstoff-Matrix
+    data_hash: str
+
+    def best_k(self):
+        """k mit der höchsten Silhouette"""
+        return int(self.scores.loc[self.scores["silhouette"].idxmax(), "k"])
+
+def city_matrix(df, pollutants=CLUSTER_POLLUTANTS, exclude=()):
+    """Mittelwert je Stadt und Schadstoff, nur Städte mit Werten für alle Schadstoffe"""
+    matrix = df.groupby('City', observed=True)[list(pollutants)].mean().dropna()
+    return matrix.drop(index=[city for city in exclude if city in matrix.index])
+
+def data_hash(matrix):
+    """Hash über Städte, Spalten und Werte der Matrix"""
+    sha = hashlib.sha256()
+    sha.update(json.dumps([str(col) for col in matrix.columns]).encode("utf-8"))
+    sha.update(pd.util.hash_pandas_object(matrix, index=True).to_numpy().tobytes())
+    return sha.hexdigest()[:16]
+
+def scale(matrix, cache_dir=CLUSTER_CACHE_DIR):
+    """Standardisierte Matrix (wie StandardScaler().fit_transform), zwischengespeichert je Daten-Hash"""
+    path = os.path.join(cache_dir, f"{data_hash(matrix)}-scaled.parquet") if cache_dir else None
+    if path and os.path.exists(path):
+        return pd.read_parquet(path)
+
+    scaled = pd.DataFrame(StandardScaler().fit_transform(matrix), index=matrix.index, columns=matrix.columns)
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        scaled.to_parquet(path)
+    return scaled
+
+def _model(k, mode, init, random_state):
+    if mode == "minibatch":
+        return MiniBatchKMeans(n_clusters=k, init=init, n_init="auto", random_state=random_state, batch_size=1024)
+    return KMeans(n_clusters=k, init=init, n_init="auto", random_state=random_state)
+
+def _next_centers(X, model):
+    """Warmstart für k+1: bisherige Zentren plus der Punkt mit dem größten Abstand zu seinem Zentrum"""
+    distances = ((X - model.cluster_centers_[model.labels_]) ** 2).sum(axis=1)
+    return np.vstack([model.cluster_centers_, X[np.argmax(distances)]])
+
+def _fit_block(X, ks, mode, random_state, sample, distances):
+    """Ein Block aufeinanderfolgender k: Modelle, Inertia und Silhouette"""
+    results = []
+    init = "k-means++"
+    for k in ks:
+        model = _model(k, mode, init, random_state).fit(X)
+        labels = model.labels_[sample]
+        if 2 <= k < len(X) and len(np.unique(labels)) > 1:
+            silhouette = silhouette_score(distances, labels, metric="precomputed")
+        else:
+            silhouette = np.nan
+        results.append((k, model, float(model.inertia_), float(silhouette)))
+        init = _next_centers(X, model)
+    return results
+
+def _sweep_path(cache_dir, digest, settings):
+    key = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{digest}-sweep-{key}.joblib")
+
+def k_sweep(matrix, k_range=K_RANGE, mode="kmeans", random_state=42, max_workers=None,
+            block_size=BLOCK_SIZE, silhouette_sample=SILHOUETTE_SAMPLE, cache_dir=CLUSTER_CACHE_DIR):
+    """
+    k-Sweep über die standardisierte Matrix
+    - mode: "kmeans" oder "minibatch" (MiniBatchKMeans für große Stadtlisten)
+    - Blöcke zu block_size k-Werten laufen parallel auf max_workers Prozessen, mit Warmstart innerhalb der Blöcke
+    - Ergebnis liegt je Daten-Hash und Einstellungen im cache_dir; ein zweiter Aufruf lädt es nur
+    """
+    scaled = scale(matrix, cache_dir)
+    digest = data_hash(matrix)
+    ks = [k for k in k_range if k <= len(scaled)]
+    settings = {"k": ks, "mode": mode, "random_state": random_state, "block_size": block_size,
+                "silhouette_sample": silhouette_sample}
+    path = _sweep_path(cache_dir, digest, settings) if cache_dir else None
+    if path and os.path.exists(path):
+        scores, models = joblib.load(path)
+        return SweepResult(scores, models, scaled, digest)
+
+    X = scaled.to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(random_state)
+    sample = np.sort(rng.choice(len(X), silhouette_sample, replace=False)) if len(X) > silhouette_sample \
+        else np.arange(len(X))
+    distances = pairwise_distances(X[sample])
+
+    blocks = [ks[i:i + block_size] for i in range(0, len(ks), block_size)]
+    args = [(X, block, mode, random_state, sample, distances) for block in blocks]
+    max_workers = min(max_workers or os.cpu_count() or 1, len(blocks)) if blocks else 1
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = [item for block in pool.map(_fit_block, *zip(*args)) for item in block]
+    else:
+        results = [item for arg in args for item in _fit_block(*arg)]
+
+    scores = pd.DataFrame([(k, inertia, silhouette) for k, _, inertia, silhouette in results],
+                          columns=["k", "inertia", "silhouette"])
+    models = {k: model for k, model, _, _ in results}
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        joblib.dump((scores, models), path)
+    return SweepResult(scores, models, scaled, digest)
+
+def cluster_cities(matrix, k=6, random_state=42, drop_singletons=True, max_rounds=5):
+    """
+    KMeans mit k Clustern wie im Notebook
+    Mit drop_singletons werden Städte, die allein ein Cluster bilden, entfernt und neu angepasst
+    (im Notebook von Hand: Ashkelon, Temuco, danach Khorramshahr).
+    Gibt (matrix mit Spalte Cluster, entfernte Städte) zurück.
+    """
+    removed = []
+    for attempt in range(max_rounds + 1):
+        scaled = StandardScaler().fit_transform(matrix)
+        labels = KMeans(n_clusters=k, random_state=random_state).fit_predict(scaled)
+        sizes = np.bincount(labels, minlength=k)
+        singletons = matrix.index[sizes[labels] == 1]
+        if not drop_singletons or singletons.empty or attempt == max_rounds:
+            break
+        removed.extend(singletons)
+        matrix = matrix.drop(index=singletons)
+
+    return matrix.assign(Cluster=labels), removed
@@ -0,0 +1,125 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+# Dichter Würfel Stadt x Kalendertag x Variable (float32) als NumPy-Memmap
+# - values.f32: Rohdaten in C-Reihenfolge, die Zeitreihe einer Stadt liegt zusammenhängend
+# - cities.csv: Code -> Country, City; meta.json: Variablen, erster Tag, Form
+# Eine Stadt zu lesen ist damit ein Slice ohne Kopie statt df[df['City'] == ...] über den ganzen Datensatz;
+# fehlende Tage sind NaN. Monatsmittel und gleitende Mittel rechnen direkt auf den Arrays.
+
+CUBE_FOLDER = './data/cube/'
+VALUES_FILE = "values.f32"
+CITIES_FILE = "cities.csv"
+META_FILE = "meta.json"
+# Spalten je Stadt (nicht je Tag), die nicht in den Würfel gehören
+STATIC_COLUMNS = ["Latitude", "Longitude", "Population"]
+
+def _days(df):
+    """Kalendertag (datetime64[D]) aus Year/Month/Day, ohne über Strings zu gehen"""
+    return pd.to_datetime(pd.DataFrame({"year": df["Year"], "month": df["Month"], "day": df["Day"]})) \
+        .to_numpy().astype("datetime64[D]")
+
+def write_cube(df, folder=CUBE_FOLDER, variables=None):
+    """
+    Schreibt cleaned_data als Würfel nach folder und gibt die Städtetabelle (Code, Country, City) zurück
+    variables: Standard alle Messwert-Spalten (ohne Datum, Ort und STATIC_COLUMNS)
+    """
+    keys = ["Year", "Month", "Day", "Country", "City"]
+    if variables is None:
+        variables = [col for col in df.columns if col not in keys + STATIC_COLUMNS
+                     and pd.api.types.is_numeric_dtype(df[col])]
+
+    days = _days(df)
+    start = days.min()
+    day_codes = (days - start).astype(np.int64)
+    n_days = int(day_codes.max()) + 1
+
+    city_codes, cities = pd.factorize(pd.MultiIndex.from_arrays([df["Country"].astype(str), df["City"].astype(str)]),
+                                      sort=True)
+    city_table = pd.DataFrame({"Code": np.arange(len(cities)), "Country": cities.get_level_values(0),
+                               "City": cities.get_level_values(1)})
+
+    os.makedirs(folder, exist_ok=True)
+    if os.path.exists(os.path.join(folder, META_FILE)):
+        os.remove(os.path.join(folder, META_FILE))
+    tmp_path = os.path.join(folder, VALUES_FILE + ".tmp")
+    shape = (len(cities), n_days, len(variables))
+    cube = np.memmap(tmp_path, dtype=np.float32, mode="w+", shape=shape)
+    cube[:] = np.nan
+    cube[city_codes, day_codes] = df[variables].to_numpy(dtype=np.float32, na_value=np.nan)
+    cube.flush()
+    del cube
+    os.replace(tmp_path, os.path.join(folder, VALUES_FILE))
+
+    city_table.to_csv(os.path.join(folder, CITIES_FILE), index=False)
+    # meta.json zuletzt: ein Würfel ohne meta gilt als unvollständig
+    with open(os.path.join(folder, META_FILE), "w", encoding="utf-8") as file:
+        json.dump({"variables": list(variables), "start": str(start), "shape": list(shape)}, file)
+
+    print(f"✅ Würfel gespeichert: {shape[0]} Städte x {shape[1]} Tage x {shape[2]} Variablen ({folder})")
+    return city_table
+
+@dataclass
+class Cube:
+    """Geöffneter Würfel: values ist eine read-only Memmap (Stadt x Tag x Variable)"""
+    values: np.memmap
+    cities: pd.DataFrame
+    variables: list
+    start: np.datetime64
+
+    @property
+    def dates(self):
+        return pd.date_range(self.start, periods=self.values.shape[1], freq="D")
+
+    def city_code(self, city, country=None):
+        """Code einer Stadt; bei gleichnamigen Städten in mehreren Ländern country angeben"""
+        rows = self.cities[(self.cities["City"] == city) & ((country is None) | (self.cities["Country"] == country))]
+        if len(rows) != 1:
+            raise KeyError(f"Stadt nicht eindeutig oder nicht vorhanden: {city} ({country})")
+        return int(rows["Code"].iloc[0])
+
+    def series(self, city, variable=None, country=None):
+        """Zeitreihe einer Stadt als View ohne Kopie: (Tage x Variablen) oder (Tage,) für eine Variable"""
+        block = self.values[self.city_code(city, country)]
+        return block if variable is None else block[:, self.variables.index(variable)]
+
+    def frame(self, city, country=None):
+        """Zeitreihe einer Stadt als DataFrame mit Datumsindex"""
+        return pd.DataFrame(self.series(city, country=country), index=self.dates, columns=self.variables)
+
+    def monthly_means(self, variable):
+        """Monatsmittel aller Städte (Country/City x Monate), NaN-Tage werden ausgelassen"""
+        values = self.values[:, :, self.variables.index(variable)]
+        months = self.dates.to_period("M")
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        valid = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(valid, values, 0), starts, axis=1, dtype=np.float64)
+        counts = np.add.reduceat(valid, starts, axis=1, dtype=np.int64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+        index = pd.MultiIndex.from_frame(self.cities[["Country", "City"]])
+        return pd.DataFrame(means.astype(np.float32), index=index, columns=months[starts])
+
+    def rolling_mean(self, city, variable, window, min_periods=1, country=None):
+        """Gleitendes Mittel über window Tage (wie Series.rolling(window, min_periods).mean())"""
+        values = self.series(city, variable, country).astype(np.float64)
+        valid = ~np.isnan(values)
+        sums = np.cumsum(np.where(valid, values, 0))
+        counts = np.cumsum(valid)
+        sums[window:] = sums[window:] - sums[:-window]
+        counts[window:] = counts[window:] - counts[:-window]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+        means[counts < min_periods] = np.nan
+        return pd.Series(means, index=self.dates, name=variable)
+
+def open_cube(folder=CUBE_FOLDER):
+    """Öffnet den Würfel read-only; gelesen wird erst beim Zugriff auf einen Ausschnitt"""
+    with open(os.path.join(folder, META_FILE), encoding="utf-8") as file:
+        meta = json.load(file)
+    values = np.memmap(os.path.join(folder, VALUES_FILE), dtype=np.float32, mode="r", shape=tuple(meta["shape"]))
+    cities = pd.read_csv(os.path.join(folder, CITIES_FILE), keep_default_na=False)
+    return Cube(values, cities, meta["variables"], np.datetime64(meta["start"], "D"))
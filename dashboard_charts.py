@@ -0,0 +1,82 @@
+import io
+from matplotlib.figure import Figure
+from dashboard_data import DISPLAY_NAMES
+
+# Diagramme des Dashboards als PNG-Bytes
+# Gezeichnet wird über matplotlib.figure.Figure statt pyplot: ohne globalen Zustand,
+# dadurch können mehrere Sitzungen gleichzeitig rendern.
+
+# Farben definieren
+FARBE_A = "#4c7195"     # Stadt A
+FARBE_B = "#6ec9e0"     # Stadt B
+FARBE_HOCH_A = "#c62828"  # Hoher Wert A (Dunkelrot)
+FARBE_HOCH_B = "#ff4069"  # Hoher Wert B (Leuchtrot)
+FARBEN_STAEDTE = {
+    "Delhi": "#ff4069",
+    "Tokyo": "#4c7195",
+    "Osaka": "#6ec9e0"
+}
+
+def _png(fig):
+    # wie st.pyplot: PNG mit 200 dpi, Ränder beschnitten
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=200, bbox_inches="tight")
+    return buffer.getvalue()
+
+def bar_chart(letztes_jahr, df_letztes_jahr, auswahl):
+    """Balkendiagramm der Jahresmittel aller Städte im neuesten Jahr"""
+    fig = Figure()
+    ax_bar = fig.subplots()
+    ax_bar.bar(
+        df_letztes_jahr["City"].astype(str),
+        df_letztes_jahr[auswahl],
+        color=[FARBEN_STAEDTE.get(stadt, FARBE_A) for stadt in df_letztes_jahr["City"]]
+    )
+
+    # Styling
+    ax_bar.set_title(f"{DISPLAY_NAMES[auswahl]}-Jahresmittel {letztes_jahr}")
+    ax_bar.set_ylabel(f"{DISPLAY_NAMES[auswahl]} (µg/m³)")
+    ax_bar.set_xlabel("Stadt")
+    ax_bar.grid(axis="y")
+    return _png(fig)
+
+def monthly_chart(df_a, df_b, stadt_a, stadt_b, auswahl, grenzwert):
+    """Monatsmittel zweier Städte, Werte über dem Grenzwert hervorgehoben"""
+    fig = Figure()
+    ax = fig.subplots()
+
+    # Linien plotten
+    ax.plot(df_a["Jahr_Monat"], df_a[auswahl], label=stadt_a, marker='o', color=FARBE_A)
+    ax.plot(df_b["Jahr_Monat"], df_b[auswahl], label=stadt_b, marker='x', color=FARBE_B)
+
+    # Hohe Werte hervorheben
+    hoch_a = df_a[df_a[auswahl] > grenzwert]
+    hoch_b = df_b[df_b[auswahl] > grenzwert]
+
+    ax.scatter(hoch_a["Jahr_Monat"], hoch_a[auswahl], color=FARBE_HOCH_A, s=50, label=f"hoch in {stadt_a}", zorder=5)
+    ax.scatter(hoch_b["Jahr_Monat"], hoch_b[auswahl], color=FARBE_HOCH_B, s=50, label=f"hoch in {stadt_b}", zorder=5)
+
+    # Styling
+    ax.set_title(f"{DISPLAY_NAMES[auswahl]}-Monatsmittel in {stadt_a} vs. {stadt_b}")
+    ax.set_xlabel("Monat")
+    ax.set_ylabel(f"{DISPLAY_NAMES[auswahl]} (Monatsmittel)")
+    ax.legend()
+    ax.grid(True)
+    return _png(fig)
+
+def trend_chart(trend_a, trend_b, stadt_a, stadt_b, auswahl="Pm25"):
+    """Trendlinien zweier Städte für einen Schadstoff"""
+    fig = Figure()
+    ax_trend = fig.subplots()
+
+    # Linien plotten
+    ax_trend.plot(trend_a["Datum"], trend_a["Trend"], label=f"{stadt_a}", color=FARBE_A, linewidth=2)
+    ax_trend.plot(trend_b["Datum"], trend_b["Trend"], label=f"{stadt_b}", color=FARBE_B, linewidth=2)
+
+    # Styling
+    ax_trend.set_title(f"{DISPLAY_NAMES[auswahl]}-Trend in {stadt_a} vs. {stadt_b}")
+    ax_trend.set_xlabel("Jahr")
+    ax_trend.set_ylabel(f"Trend ({DISPLAY_NAMES[auswahl]})")
+    ax_trend.legend()
+    ax_trend.grid(True)
+    return _png(fig)
@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from dataclasses import dataclass, field
+
+# Vorberechnete Aggregate (Würfel) für das Dashboard
+# - Monatsmittel je Stadt und Schadstoff (Stadt x Monat x Schadstoff)
+# - Jahresmittel je Stadt und Schadstoff
+# - Schwellen für den statistischen Modus (oberes Quartil der Tageswerte)
+# Die Tagesdaten werden nur beim Aufbau gelesen; das Dashboard schneidet nur noch die
+# kleinen Würfel, unabhängig von der Größe des täglichen Datensatzes.
+
+POLLUTANTS = ["Pm25", "Co", "No2", "So2", "O3"]
+DISPLAY_NAMES = {
+    "Pm25": "PM2.5",
+    "Co": "CO",
+    "No2": "NO₂",
+    "So2": "SO₂",
+    "O3": "O₃"
+}
+# offizielle Grenzwerte (Co: Beispielwert in mg/m³)
+OFFICIAL_LIMITS = {"Pm25": 25, "No2": 40, "So2": 20, "O3": 100, "Co": 5}
+
+DASHBOARD_CSV = './data/test_dashboard_air_quality.csv'
+CUBE_FOLDER = './data/dashboard/'
+MONTHLY_FILE = "monthly.parquet"
+YEARLY_FILE = "yearly.parquet"
+META_FILE = "meta.json"
+
+@dataclass
+class DashboardCubes:
+    monthly: pd.DataFrame           # City, Jahr_Monat, <Schadstoffe>
+    yearly: pd.DataFrame            # City, Jahr, <Schadstoffe>
+    quartiles: dict = field(default_factory=dict)   # oberes Quartil der Tageswerte je Schadstoff
+    version: str = ""               # Hash der Würfel, ändert sich bei neuen Daten
+
+    @property
+    def cities(self):
+        return sorted(self.monthly["City"].unique())
+
+    def monthly_city(self, city, pollutant):
+        """Monatsmittel einer Stadt (Jahr_Monat, <pollutant>)"""
+        rows = self.monthly[self.monthly["City"] == city]
+        return rows[["Jahr_Monat", pollutant]].reset_index(drop=True)
+
+    def yearly_latest(self, pollutant):
+        """Jahresmittel aller Städte im neuesten Jahr: (Jahr, DataFrame City/<pollutant>)"""
+        latest = self.yearly["Jahr"].max()
+        rows = self.yearly[self.yearly["Jahr"] == latest]
+        return latest, rows[["City", pollutant]].reset_index(drop=True)
+
+    def threshold(self, pollutant, mode):
+        """Grenzwert je Modus ("Offizieller Grenzwert" oder statistisch über das obere Quartil)"""
+        if mode == "Offizieller Grenzwert":
+            return OFFICIAL_LIMITS.get(pollutant)
+        return self.quartiles.get(pollutant)
+
+def _compact(df, key_cols):
+    df = df.astype({col: "float32" for col in POLLUTANTS})
+    df["City"] = df["City"].astype("category")
+    return df.sort_values(key_cols).reset_index(drop=True)
+
+def build_cubes(df):
+    """
+    Würfel aus Tagesdaten (Year, Month, Day, City, Schadstoffe)
+    Monats- und Jahresmittel wie groupby(["City", "Jahr_Monat"]) bzw. groupby(["City", "Jahr"]) im Dashboard
+    """
+    df = df.reindex(columns=["Year", "Month", "City"] + POLLUTANTS)
+    year = df["Year"].astype(int)
+    month = df["Month"].astype(int)
+
+    monthly = df.groupby([df["City"].astype(object), year.rename("Y"), month.rename("M")])[POLLUTANTS].mean().reset_index()
+    monthly.insert(1, "Jahr_Monat", pd.to_datetime(dict(year=monthly["Y"], month=monthly["M"], day=1)))
+    monthly = _compact(monthly.drop(columns=["Y", "M"]), ["City", "Jahr_Monat"])
+
+    yearly = df.groupby([df["City"].astype(object), year.rename("Jahr")])[POLLUTANTS].mean().reset_index()
+    yearly = _compact(yearly, ["City", "Jahr"])
+
+    quartiles = {col: float(df[col].quantile(0.75)) for col in POLLUTANTS if df[col].notna().any()}
+
+    sha = hashlib.sha256()
+    for cube in (monthly, yearly):
+        sha.update(pd.util.hash_pandas_object(cube, index=False).to_numpy().tobytes())
+    return DashboardCubes(monthly, yearly, quartiles, sha.hexdigest()[:16])
+
+def write_cubes(cubes, cube_folder=CUBE_FOLDER):
+    os.makedirs(cube_folder, exist_ok=True)
+    cubes.monthly.to_parquet(os.path.join(cube_folder, MONTHLY_FILE), engine="pyarrow", index=False)
+    cubes.yearly.to_parquet(os.path.join(cube_folder, YEARLY_FILE), engine="pyarrow", index=False)
+    # meta.json zuletzt: sein Zeitstempel zeigt einen vollständigen Würfel an
+    with open(os.path.join(cube_folder, META_FILE), 'w', encoding='utf-8') as file:
+        json.dump({"version": cubes.version, "quartiles": cubes.quartiles}, file, indent=2)
+    print(f"✅ Dashboard-Würfel gespeichert: {cube_folder}")
+    return cube_folder
+
+def cube_version(cube_folder=CUBE_FOLDER):
+    """Änderungszeit von meta.json (None ohne Würfel), billig genug für jeden Rerun"""
+    path = os.path.join(cube_folder, META_FILE)
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+def load_cubes(cube_folder=CUBE_FOLDER, source_csv=DASHBOARD_CSV):
+    """
+    Lädt die Würfel; fehlen sie, werden sie einmal aus source_csv (Tagesdaten) aufgebaut und gespeichert
+    """
+    if cube_version(cube_folder) is None:
+        cubes = build_cubes(pd.read_csv(source_csv))
+        write_cubes(cubes, cube_folder)
+        return cubes
+
+    with open(os.path.join(cube_folder, META_FILE), 'r', encoding='utf-8') as file:
+        meta = json.load(file)
+    return DashboardCubes(
+        pd.read_parquet(os.path.join(cube_folder, MONTHLY_FILE), engine="pyarrow"),
+        pd.read_parquet(os.path.join(cube_folder, YEARLY_FILE), engine="pyarrow"),
+        meta.get("quartiles", {}),
+        meta.get("version", ""),
+    )
@@ -1,30 +1,250 @@
 import os
+import re
+import time
+import hashlib
+import numpy as np
 import pandas as pd
 import json
 import requests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from email.utils import formatdate
+from requests.adapters import HTTPAdapter
 from meteostat import Daily, Stations
-from datetime import datetime
-
-def download_files(files, output_folder):
+from datetime import datetime, timezone
+from gazetteer import load_gazetteer, join_gazetteer, normalize_city
+from geo_index import GeoIndex
+from population import load_population
+from storage import dataset_path, read_dataset, write_dataset
+from weather_cache import WeatherCache
+
+@dataclass
+class DownloadResult:
+    """Ergebnis eines einzelnen Downloads aus download_files"""
+    filename: str
+    url: str
+    status: str                     # "downloaded", "not_modified" oder "failed"
+    http_status: int | None = None
+    bytes_written: int = 0
+    attempts: int = 0
+    etag: str | None = None
+    last_modified: str | None = None
+    error: str | None = None
+
+    @property
+    def ok(self):
+        return self.status != "failed"
+
+# HTTP-Status, bei denen ein erneuter Versuch sinnvoll ist
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+def _make_session(max_workers):
+    """Eine gemeinsame Session mit Connection-Pool für alle Threads"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip"})
+    return session
+
+def _conditional_headers(output_path, validator):
+    """ETag / If-Modified-Since nur senden, wenn die Datei lokal schon existiert"""
+    if not os.path.exists(output_path):
+        return {}
+
+    validator = validator or {}
+    headers = {}
+    if validator.get("etag"):
+        headers["If-None-Match"] = validator["etag"]
+    if validator.get("last_modified"):
+        headers["If-Modified-Since"] = validator["last_modified"]
+    else:
+        headers["If-Modified-Since"] = formatdate(os.path.getmtime(output_path), usegmt=True)
+    return headers
+
+def _download_one(session, filename, url, output_path, validator, retries, backoff, timeout, chunk_size):
+    """Lädt eine Datei gestreamt herunter, mit Retry und exponentiellem Backoff"""
+    result = DownloadResult(filename=filename, url=url, status="failed")
+    headers = _conditional_headers(output_path, validator)
+
+    for attempt in range(1, retries + 1):
+        result.attempts = attempt
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                result.http_status = response.status_code
+
+                if response.status_code == 304:
+                    result.status = "not_modified"
+                    result.error = None
+                    result.etag = (validator or {}).get("etag")
+                    result.last_modified = (validator or {}).get("last_modified")
+                    return result
+
+                if response.status_code == 200:
+                    # Erst in eine temporäre Datei schreiben, damit kein halber Download liegen bleibt
+                    tmp_path = output_path + ".part"
+                    size = 0
+                    try:
+                        with open(tmp_path, 'wb') as file:
+                            for chunk in response.iter_content(chunk_size=chunk_size):
+                                file.write(chunk)
+                                size += len(chunk)
+                        os.replace(tmp_path, output_path)
+                    except BaseException:
+                        # Abbruch mitten im Body (Verbindung, Platte voll, ...): angefangene Datei entfernen
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+                        raise
+
+                    result.status = "downloaded"
+                    result.error = None
+                    result.bytes_written = size
+                    result.etag = response.headers.get("ETag")
+                    result.last_modified = response.headers.get("Last-Modified")
+                    return result
+
+                result.error = f"HTTP {response.status_code}"
+                if response.status_code not in RETRY_STATUS:
+                    return result
+        except requests.RequestException as e:
+            result.error = str(e)
+        except OSError as e:
+            result.error = str(e)
+            return result
+
+        if attempt < retries:
+            time.sleep(backoff * 2 ** (attempt - 1))
+
+    return result
+
+def download_files(files, output_folder, max_workers=8, retries=3, backoff=1.0, timeout=60,
+                   chunk_size=1024 * 1024, validators=None):
     """lädt die benötigten Dateien herunter und 
-    speichert sie im angegebenen Verzeichnis"""
+    speichert sie im angegebenen Verzeichnis
+    - parallel über einen Thread-Pool mit einer gemeinsamen Session
+    - Antworten werden in Blöcken auf die Platte gestreamt
+    - vorhandene Dateien werden nur neu geladen, wenn sie sich geändert haben
+      (ETag aus validators bzw. If-Modified-Since)
+    - gibt ein Dict {Dateiname: DownloadResult} zurück
+    """
     
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    for filename, url in files.items():
-        output_path = os.path.join(output_folder, filename)
+    validators = validators or {}
+    max_workers = max(1, min(max_workers, len(files)))
+    session = _make_session(max_workers)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                filename: pool.submit(
+                    _download_one, session, filename, url, os.path.join(output_folder, filename),
+                    validators.get(filename), retries, backoff, timeout, chunk_size)
+                for filename, url in files.items()
+            }
+            results = {filename: future.result() for filename, future in futures.items()}
+    finally:
+        session.close()
+
+    for filename, result in results.items():
+        if result.status == "downloaded":
+            print(f"Downloaded: {filename}")
+        elif result.status == "not_modified":
+            print(f"Unchanged: {filename}")
+        else:
+            print(f"Failed to download {filename}: {result.error}")
+
+    return results
+
+# Manifest über alle bereits geladenen Rohdateien (liegt im Datenverzeichnis)
+MANIFEST_FILE = "manifest.json"
+
+# Abgeschlossene Halbjahre/Quartale ändern sich nicht mehr, nur die laufende Jahresdatei
+HISTORIC_PATTERN = re.compile(r"^waqi-covid-\d{4}(H[12]|Q[1-4])\.csv$")
+
+def load_manifest(output_folder):
+    """Lädt das Manifest {Dateiname: Eintrag}, leer falls noch keins existiert"""
+    manifest_path = os.path.join(output_folder, MANIFEST_FILE)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest, output_folder):
+    """Schreibt das Manifest atomar (erst .tmp, dann umbenennen)"""
+    os.makedirs(output_folder, exist_ok=True)
+    manifest_path = os.path.join(output_folder, MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    """SHA-256 einer Datei, blockweise gelesen"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def _is_current(filename, entry, output_folder):
+    """Historische Datei liegt bereits unverändert vor und muss nicht angefragt werden"""
+    if not HISTORIC_PATTERN.match(filename):
+        return False
+    path = os.path.join(output_folder, filename)
+    return os.path.exists(path) and os.path.getsize(path) == entry.get("size")
+
+def sync_files(files, output_folder, refresh_all=False, **download_kwargs):
+    """Inkrementeller Abgleich der Rohdaten über das Manifest
+    - historische Zeiträume, die schon vorliegen, werden gar nicht erst angefragt
+      (außer mit refresh_all=True)
+    - alle anderen Dateien werden bedingt über download_files geladen
+    - das Manifest speichert Größe, Prüfsumme, Abrufzeit und Quell-URL je Datei
+    - gibt die Liste der Dateien zurück, deren Prüfsumme sich geändert hat
+      (z. B. für data_import(file_names=...))
+    """
+    manifest = load_manifest(output_folder)
+
+    to_fetch = {
+        filename: url for filename, url in files.items()
+        if refresh_all or not _is_current(filename, manifest.get(filename, {}), output_folder)
+    }
+    skipped = len(files) - len(to_fetch)
+    if skipped:
+        print(f"Übersprungen (historisch, unverändert): {skipped} Dateien")
+
+    results = download_files(files=to_fetch, output_folder=output_folder,
+                             validators=manifest, **download_kwargs) if to_fetch else {}
+
+    changed = []
+    now = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    for filename, result in results.items():
+        entry = manifest.get(filename, {})
+        if result.status == "downloaded":
+            path = os.path.join(output_folder, filename)
+            checksum = file_checksum(path)
+            if checksum != entry.get("sha256"):
+                changed.append(filename)
+            manifest[filename] = {
+                "url": result.url,
+                "size": os.path.getsize(path),
+                "sha256": checksum,
+                "fetched_at": now,
+                "checked_at": now,
+                "etag": result.etag,
+                "last_modified": result.last_modified,
+            }
+        elif result.status == "not_modified" and entry:
+            entry["checked_at"] = now
+
+    save_manifest(manifest, output_folder)
+    print(f"✅ Manifest aktualisiert, geänderte Dateien: {len(changed)}")
+
+    return changed
 
-        try:
-            response = requests.get(url, headers={"Accept-Encoding": "gzip"})
-            if isinstance(response.status_code, int) and response.status_code == 200:
-                with open(output_path, 'wb') as file:
-                    file.write(response.content)
-                print(f"Downloaded: {filename}")
-            else:
-                print(f"Failed to download {filename}: HTTP {response.status_code}")
-        except Exception as e:
-            print(f"Error downloading {filename}: {e}")
 # Nutzung
 files = {
     "waqi-covid-2025.csv": "https://aqicn.org/data-platform/covid19/report/45108-d76dd600/2025",
@@ -56,241 +276,642 @@ files = {
     "population.csv": "https://datahub.io/core/population-city/r/unsd-citypopulation-year-both.csv"}
 output_folder = "data"
 
-def data_import():
+# Explizites Schema der WAQI-Rohdaten
+RAW_DTYPES = {
+    "Country": "category",
+    "City": "category",
+    "Specie": "category",
+    "count": "Int32",      # nullable: leere Anzahlen kommen in den Dateien vor
+    "min": "float32",
+    "max": "float32",
+    "median": "float32",
+    "variance": "float32",
+}
+CATEGORY_COLUMNS = ["Country", "City", "Specie"]
+
+# Uneinheitliche Schreibweisen der Messgrößen
+SPECIE_ALIASES = {"wind gust": "wind-gust", "wind speed": "wind-speed"}
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+def _comment_lines(file_path):
+    """Anzahl der Kommentarzeilen (#) am Dateianfang"""
+    count = 0
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if not line.startswith('#'):
+                    break
+                count += 1
+    except OSError:
+        pass  # Fehler meldet read_csv
+    return count
+
+def _normalize_species(specie):
+    """Vereinheitlicht die Specie-Namen; bei Kategorien nur auf den Kategorien selbst"""
+    if not isinstance(specie.dtype, pd.CategoricalDtype):
+        return specie.replace(SPECIE_ALIASES)
+
+    categories = specie.cat.categories.map(lambda c: SPECIE_ALIASES.get(c, c))
+    new_categories = categories.unique()
+    if len(new_categories) == len(categories):
+        return specie.cat.rename_categories(categories)
+
+    # zwei Schreibweisen fallen zusammen -> Codes umschlüsseln
+    recode = new_categories.get_indexer(categories)
+    codes = specie.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, recode[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(codes, new_categories), index=specie.index, name=specie.name)
+
+def read_raw_file(file_path, engine=None):
+    """Liest eine WAQI-Datei mit festem Schema, schnellem Parser und Kategorien"""
+    engine = engine or CSV_ENGINE
+    if engine == "pyarrow":
+        # pyarrow kennt kein comment=, daher Kopfzeile direkt angeben
+        df = pd.read_csv(file_path, engine=engine, header=_comment_lines(file_path),
+                         dtype=RAW_DTYPES, parse_dates=["Date"])
+    else:
+        df = pd.read_csv(file_path, engine=engine, comment='#', dtype=RAW_DTYPES, parse_dates=["Date"])
+
+    if "Specie" in df.columns:
+        df["Specie"] = _normalize_species(df["Specie"])
+    return df
+
+def iter_raw_file(file_path, chunk_rows):
+    """Liest eine WAQI-Datei blockweise (je chunk_rows Zeilen), gleiches Schema wie read_raw_file"""
+    with pd.read_csv(file_path, engine="c", comment='#', dtype=RAW_DTYPES, parse_dates=["Date"],
+                     chunksize=chunk_rows) as reader:
+        for df in reader:
+            if "Specie" in df.columns:
+                df["Specie"] = _normalize_species(df["Specie"])
+            yield df
+
+def _import_file(file_path):
+    """Worker für data_import: gibt (DataFrame, None) oder (None, Meldung) zurück"""
+    file = os.path.basename(file_path)
+    try:
+        df = read_raw_file(file_path)
+
+        if "Specie" not in df.columns:
+            return None, f"Spalte 'Specie' fehlt in {file}"
+
+        df = df.drop_duplicates()
+
+        if df.empty:
+            return None, f"{file} enthält nach Duplikat-Entfernung keine Daten mehr."
+
+        return df, None
+    except Exception as e:
+        return None, f"Fehler beim Verarbeiten von {file}: {e}"
+
+def _concat_categorical(dataframes):
+    """concat, bei dem Kategorie-Spalten Kategorien bleiben (gemeinsame Kategorien)"""
+    for col in CATEGORY_COLUMNS:
+        if not all(col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype) for df in dataframes):
+            continue
+        categories = dataframes[0][col].cat.categories
+        for df in dataframes[1:]:
+            categories = categories.union(df[col].cat.categories)
+        for df in dataframes:
+            df[col] = df[col].cat.set_categories(categories)
+
+    return pd.concat(dataframes, ignore_index=True)
+
+def import_files(file_paths, max_workers=None):
+    """
+    Liest die Dateien (parallel in einem Prozess-Pool, max_workers=1: seriell)
+    Gibt {Dateiname: DataFrame} der gültigen Dateien zurück, Fehler werden ausgegeben.
+    """
+    if not file_paths:
+        return {}
+    max_workers = min(max_workers or os.cpu_count() or 1, len(file_paths))
+
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_import_file, file_paths))
+    else:
+        results = [_import_file(file_path) for file_path in file_paths]
+
+    dataframes = {}
+    for file_path, (df, message) in zip(file_paths, results):
+        if message:
+            print(message)
+        else:
+            dataframes[os.path.basename(file_path)] = df
+    return dataframes
+
+# Parquet-Ablage der Rohdaten (partitioniert nach Jahr/Land) und Größe/Änderungszeit der enthaltenen Dateien
+RAW_DATASET = "raw_data"
+RAW_SOURCES_FILE = "_sources.json"     # beginnt mit "_", wird von pyarrow beim Lesen ignoriert
+# Spalten, die reshape_species aus den Rohdaten braucht
+RESHAPE_COLUMNS = ["Date", "Country", "City", "Specie", "median"]
+
+def _file_signature(file_path):
+    stat = os.stat(file_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def import_raw(file_paths, data_folder='./data/', columns=None, max_workers=None):
+    """
+    Wie import_files, aber mit Parquet-Ablage der Rohdaten (RAW_DATASET in data_folder)
+    - Dateien mit unveränderter Größe und Änderungszeit werden aus der Ablage gelesen, nur mit columns
+    - neue oder geänderte Dateien werden geparst, danach wird die Ablage neu geschrieben
+    Gibt ein DataFrame (Spalte 'Source' = Dateiname) oder None zurück.
+    """
+    sources_path = os.path.join(dataset_path(RAW_DATASET, data_folder), RAW_SOURCES_FILE)
+    try:
+        with open(sources_path, encoding="utf-8") as file:
+            stored = json.load(file)
+    except (OSError, ValueError):
+        stored = {}
+
+    signatures = {os.path.basename(file_path): _file_signature(file_path) for file_path in file_paths}
+    unchanged = [name for name, signature in signatures.items() if stored.get(name) == signature]
+    changed = [file_path for file_path in file_paths if os.path.basename(file_path) not in unchanged]
+    filters = [("Source", "in", unchanged)]
+    # Year ist nur Partitionsspalte, die Rohdaten selbst haben kein Jahr
+    columns = list(dict.fromkeys(list(columns or ["Date", *RAW_DTYPES]) + ["Source"]))
+
+    if not changed:
+        print(f"✅ Rohdaten aus {RAW_DATASET} gelesen ({len(unchanged)} Dateien unverändert)")
+        return read_dataset(RAW_DATASET, columns=columns, filters=filters, data_folder=data_folder)
+
+    dataframes = []
+    if unchanged:
+        kept = read_dataset(RAW_DATASET, filters=filters, data_folder=data_folder).drop(columns="Year")
+        dataframes.append(kept.assign(Source=kept["Source"].astype(str)))
+    parsed = import_files(changed, max_workers)
+    dataframes += [df.assign(Source=name) for name, df in parsed.items()]
+    if not dataframes:
+        return None
+
+    df = _concat_categorical(dataframes)
+    df["Source"] = df["Source"].astype("category")
+    write_dataset(df, RAW_DATASET, data_folder=data_folder)
+    with open(sources_path, "w", encoding="utf-8") as file:
+        json.dump({name: signatures[name] for name in unchanged + list(parsed)}, file)
+
+    return df[columns]
+
+def data_import(file_names=None, data_folder='./data/', max_workers=None, store=False, columns=None):
     """
     Import der Daten aus allen Dateien, die mit 'waqi-covid-' anfangen.
     Entfernen von Kommentaren, Duplikaten und Umbenennung bestimmter Spaltenwerte.
     Zusammenführung der DataFrames.
+    Mit file_names (z. B. Rückgabe von sync_files) werden nur diese Dateien gelesen.
+    Mehrere Dateien werden parallel in einem Prozess-Pool gelesen (max_workers=1: seriell),
+    mit festem Schema und Country/City/Specie als Kategorien.
+    Mit store=True werden die Rohdaten zusätzlich als Parquet abgelegt (import_raw); unveränderte Dateien
+    werden danach von dort gelesen, columns wählt nur diese Spalten.
     """
-    data_folder = './data/'
     all_files = [f for f in os.listdir(data_folder) if f.startswith('waqi-covid-') and f.endswith('.csv') or f == 'airquality-covid19-cities.json']
-    dataframes = []
+    if file_names is not None:
+        all_files = [f for f in all_files if f in set(file_names)]
 
     if not all_files:
         print("Keine Dateien gefunden.")
         return None
 
-    for file in all_files:
-        file_path = os.path.join(data_folder, file)
-        try:
-            df = pd.read_csv(file_path, comment='#')
-
-            if "Specie" not in df.columns:
-                print(f"Spalte 'Specie' fehlt in {file}")
-                continue
+    if store:
+        file_paths = [os.path.join(data_folder, file) for file in all_files if file.endswith('.csv')]
+        df = import_raw(file_paths, data_folder, columns, max_workers) if file_paths else None
+        if df is None:
+            print("Keine gültigen Daten vorhanden.")
+            return None
+        return df.drop(columns="Source")
 
-            df["Specie"] = df["Specie"].replace("wind gust", "wind-gust")
-            df["Specie"] = df["Specie"].replace("wind speed", "wind-speed")
-            df = df.drop_duplicates()
-
-            if df.empty:
-                print(f"{file} enthält nach Duplikat-Entfernung keine Daten mehr.")
-                continue
-
-            dataframes.append(df)
-        except Exception as e:
-            print(f"Fehler beim Verarbeiten von {file}: {e}")
+    dataframes = list(import_files([os.path.join(data_folder, file) for file in all_files], max_workers).values())
 
     if not dataframes:
         print("Keine gültigen Daten vorhanden.")
         return None
 
-    return pd.concat(dataframes, ignore_index=True)
+    return _concat_categorical(dataframes)
 
-def data_cleaning(df):
-    """Bereinigung der Daten
-    - nicht benötigte Spalten löschen
-    - Zusammenfassung der Daten nach Datum, Land, Stadt und Spezies, so dass nur ein Messwert je Species (Median) pro Tag/ Stadt verbleibt
-    - Spalte Species aufteilen
-    - df als csv speichern im Datenverzeichnis
+# Messgrößen, die nach der finalen Spaltenauswahl in data_cleaning übrig bleiben
+SPECIES_COLUMNS = ["co", "dew", "humidity", "no2", "o3", "pm10", "pm25", "so2"]
+
+def aggregate_species(df, species=SPECIES_COLUMNS):
+    """
+    Summen und Anzahlen der Mediane je Datum/Land/Stadt und Specie
+    - Schlüssel als Integer-Codes (Tagesnummer, Land, Stadt, Specie)
+    - Summen und Anzahlen per np.bincount direkt in die Zielmatrix
+    Gibt (keys, sums, counts) zurück: keys mit Date, Country, City (sortiert), sums/counts als
+    (Zeilen x Species)-Arrays, oder None ohne gültige Werte. Teilergebnisse (z. B. je Datei)
+    lassen sich durch Addition zusammenführen.
     """
-    df = df.copy()
+    if "Specie" not in df.columns or "median" not in df.columns:
+        return None
+
+    specie_codes = pd.Categorical(df["Specie"], categories=species).codes
+    day = pd.to_datetime(df["Date"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+    country_codes, countries = pd.factorize(df["Country"], sort=True)
+    city_codes, cities = pd.factorize(df["City"], sort=True)
+    values = df["median"].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    valid = (specie_codes >= 0) & (country_codes >= 0) & (city_codes >= 0) & ~np.isnan(values)
+    valid &= day != np.iinfo(np.int64).min   # NaT
+    if not valid.any():
+        return None
 
-    df = df.drop(columns=['variance', 'min', 'max'], errors='ignore')
+    day, country_codes, city_codes = day[valid], country_codes[valid], city_codes[valid]
+    specie_codes, values = specie_codes[valid].astype(np.int64), values[valid]
+
+    # ein sortierbarer Schlüssel je (Tag, Land, Stadt)
+    day_min = day.min()
+    row_key = ((day - day_min) * len(countries) + country_codes) * len(cities) + city_codes
+    row_keys, row_index = np.unique(row_key, return_inverse=True)
+
+    n_species = len(species)
+    cell = row_index * n_species + specie_codes
+    size = len(row_keys) * n_species
+    sums = np.bincount(cell, weights=values, minlength=size).reshape(len(row_keys), n_species)
+    counts = np.bincount(cell, minlength=size).reshape(len(row_keys), n_species)
+
+    city_key = row_keys % len(cities)
+    country_key = (row_keys // len(cities)) % len(countries)
+    day_key = row_keys // (len(cities) * len(countries)) + day_min
+
+    keys = pd.DataFrame({
+        "Date": day_key.astype("datetime64[D]").astype("datetime64[ns]"),
+        "Country": np.asarray(countries)[country_key],
+        "City": np.asarray(cities)[city_key],
+    })
+    return keys, sums, counts
+
+def species_means(keys, sums, counts, species=SPECIES_COLUMNS):
+    """Breites Format aus Summen und Anzahlen: Mittelwert je Specie, NaN ohne Messwert"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+
+    result = keys.reset_index(drop=True)
+    for i, specie in enumerate(species):
+        result[specie] = means[:, i]
+    return result
+
+def reshape_species(df, species=SPECIES_COLUMNS):
+    """
+    Mittelwert der Mediane je Datum/Land/Stadt/Specie und Umformung ins breite Format in einem Durchgang
+    (aggregate_species + species_means), nur die Spalten aus species, Date bleibt datetime64
+    Ergebnis wie groupby(...).agg(mean) + pivot, sortiert nach Date, Country, City.
+    """
+    aggregated = aggregate_species(df, species)
+    if aggregated is None:
+        return pd.DataFrame(columns=["Date", "Country", "City"] + list(species))
+
+    return species_means(*aggregated, species=species)
+
+# Spalten des bereinigten Datensatzes
+# Redundante Wetter-Spalten aus air_quality (Pressure, Temperature, Wind-gust, Wind-speed, ...)
+# werden gar nicht erst umgeformt, siehe SPECIES_COLUMNS
+FINAL_COLUMNS = ['Year', 'Month', 'Day', 'Country', 'City', 'Latitude', 'Longitude', 'Population', 'Co', 'No2', 'O3', 'Pm10', 'Pm25',
+       'So2', 'Dew', 'Humidity', 'Tavg', 'Tmin', 'Tmax', 'Prcp', 'Wdir', 'Wspd', 'Pres',
+        ]
+
+# Kompaktes Schema (data_cleaning(compact=True)): Orte als Kategorien, Messwerte float32,
+# Datumsteile als kleine Ganzzahlen; Population bleibt float64 (Einwohnerzahlen > 2^24 wären in float32 ungenau)
+LOCATION_COLUMNS = ["Country", "City"]
+DATE_PART_DTYPES = {"Year": np.int16, "Month": np.int8, "Day": np.int8}
+EXACT_COLUMNS = ["Population"]
+
+def compact_frame(df):
+    """
+    df im kompakten Schema: Country/City als Kategorien, Fließkommaspalten als float32,
+    Year/Month/Day (auch klein geschrieben) als int16/int8; bereits passende Spalten bleiben unverändert
+    """
+    dtypes = {}
+    for col, dtype in df.dtypes.items():
+        if col in LOCATION_COLUMNS:
+            if not isinstance(dtype, pd.CategoricalDtype):
+                dtypes[col] = "category"
+        elif str(col).capitalize() in DATE_PART_DTYPES:
+            if pd.api.types.is_integer_dtype(dtype) and dtype != DATE_PART_DTYPES[str(col).capitalize()]:
+                dtypes[col] = DATE_PART_DTYPES[str(col).capitalize()]
+        elif pd.api.types.is_float_dtype(dtype) and dtype != np.float32 and col not in EXACT_COLUMNS:
+            dtypes[col] = np.float32
+    return df.astype(dtypes) if dtypes else df
+
+def map_names(names, func):
+    """
+    Textfunktion (z. B. str.lower) auf Stadt-/Ländernamen anwenden
+    Bei Kategorien nur auf die Kategorien, gleiche Ergebnisse werden zusammengelegt, das Ergebnis bleibt kategorial.
+    """
+    if not isinstance(names.dtype, pd.CategoricalDtype):
+        return func(names)
+    mapped_codes, categories = pd.factorize(func(names.cat.categories.to_series()))
+    codes = names.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, mapped_codes[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(codes, categories), index=names.index, name=names.name)
+
+# Ausreißer-Regeln aus 1_eda_exploration.ipynb
+# Werte < Lower oder > Upper werden NaN, mit UpperInclusive=True bereits Werte >= Upper
+OUTLIER_RULES = pd.DataFrame.from_records([
+    # Column,     Lower,  Upper,  UpperInclusive
+    ("Pm25",      np.nan, 814,    True),
+    ("Pm10",      np.nan, 867,    True),
+    ("Co",        np.nan, 300,    True),
+    ("No2",       np.nan, 300,    True),
+    ("So2",       np.nan, 352,    True),
+    ("O3",        np.nan, 323.5,  True),
+    ("Tmax",      np.nan, 60,     False),   # über weltweit beobachteten Temperaturen
+    ("Humidity",  0,      100,    False),   # physikalisch unmöglich / Platzhalter
+    ("Wspd",      np.nan, 150,    False),   # Orkangrenze
+    ("Pres",      np.nan, 1100,   False),   # vermutlich technisches Problem
+    ("Prcp",      np.nan, 400,    False),   # für Modelle ungünstig, nicht repräsentativ
+    ("Dew",       -40,    32,     False),
+], columns=["Column", "Lower", "Upper", "UpperInclusive"])
+
+def remove_outliers(df, rules=OUTLIER_RULES):
+    """
+    Ersetzt Ausreißer laut Regeltabelle (Column, Lower, Upper, UpperInclusive) durch NaN
+    - alle Regeln in einem Durchgang über eine float32-Matrix der betroffenen Spalten
+    - die Anzahl ersetzter Werte je Spalte ergibt sich aus derselben Maske
+    - Regeln für fehlende Spalten werden übersprungen; zeilenweise, daher auch je Partition anwendbar
+    Gibt (df, replaced) zurück, replaced: ersetzte Werte je Spalte.
+    """
+    rules = rules[rules["Column"].isin(df.columns)]
+    columns = rules["Column"].tolist()
+    if not columns or df.empty:
+        return df, pd.Series(0, index=columns, dtype=np.int64)
+
+    values = df[columns].to_numpy(dtype=np.float32, na_value=np.nan)
+    lower = rules["Lower"].fillna(-np.inf).to_numpy(dtype=np.float32)
+    upper = rules["Upper"].fillna(np.inf).to_numpy(dtype=np.float32)
+    inclusive = rules["UpperInclusive"].to_numpy(dtype=bool)
+
+    outliers = (values < lower) | (values > upper) | (inclusive & (values == upper))
+    replaced = pd.Series(np.count_nonzero(outliers, axis=0), index=columns, dtype=np.int64)
+
+    if replaced.any():
+        # flache Kopie genügt, die Spalten werden ersetzt und nicht in-place geändert
+        df = df.copy(deep=False)
+        df[columns] = df[columns].mask(outliers)
+    return df, replaced
+
+def finalize(df, columns=FINAL_COLUMNS):
+    """
+    Finale Spaltenauswahl, Spalten mit mehr als 90% NaNs löschen
+    Fehlende Spalten werden als NaN ergänzt (und damit verworfen); ein leerer df behält alle columns.
+    """
+    df = df.reindex(columns=list(columns))
+    if df.empty:
+        return df
 
-    df = df.groupby(["Date", "Country", "City", "Specie"], as_index=False).agg({"median": "mean"})  
+    return df.loc[:, df.isnull().mean() < 0.9]
 
-    df = df.pivot(index=["Date", "Country", "City"], columns="Specie", values='median').reset_index()
+def clean_steps(df, weather_cache=None, compact=False, max_workers=8, start=None, end=None):
+    """
+    Die gemeinsamen Schritte von data_cleaning und incremental.clean_rows
+    - reshape_species, Städtenamen, Geo-, Wetter- und Einwohnerdaten, Datumsspalten, Ausreißer (OUTLIER_RULES)
+    - Wetterdaten für [start, end] (Standard: WEATHER_START bis WEATHER_END)
+    - compact=True: nach jedem Schritt compact_frame (Copy-on-Write schaltet der Aufrufer ein)
+    Gibt (df, ersetzte Werte je Spalte) zurück; finale Spaltenauswahl und Speichern übernimmt der Aufrufer.
+    """
+    shrink = compact_frame if compact else lambda frame: frame
+    df = shrink(reshape_species(df))
 
-    df["City"] = df["City"].str.lower().str.strip()
-    df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
+    df["City"] = map_names(df["City"], lambda city: city.str.lower().str.strip())
 
-    df = geo_data(df)
+    df = shrink(geo_data(df))
 
-    df = weather_data(df)
+    df = shrink(weather_data(df, max_workers=max_workers, cache=weather_cache or WeatherCache(),
+                             start=start or WEATHER_START, end=end or WEATHER_END, compact=compact))
 
     df = convert_date(df)
 
-    df['City'] = df['City'].str.capitalize()
+    df['City'] = map_names(df['City'], lambda city: city.str.capitalize())
 
-    df = population_data(df)
+    df = shrink(population_data(df))
 
-    df = df[['Year', 'Month', 'Day', 'Country', 'City', 'Latitude', 'Longitude', 'Population', 'Co', 'No2', 'O3', 'Pm10', 'Pm25',
-       'Pressure', 'So2', 'Temperature', 'Wind-gust', 'Wind-speed', 'Dew', 'Humidity', 'Tavg', 'Tmin', 'Tmax', 'Prcp', 'Wdir', 'Wspd', 'Pres',
-        ]]
+    return remove_outliers(df)
 
-    #Redundante Wetter-Spalten löschen
-    df = df.drop(columns=['Precipitation', 'Pressure', 'Uvi', 'Wd'], errors='ignore')  #Datenspalten aus air_quality
-    df = df.drop(columns=['Temperature', 'Wind-gust', 'Wind-speed'], errors='ignore')  #Datenspalten aus Wetterdaten
-    
-    #Spalten mit mehr als 90% NaNs löschen
-    df = df.loc[:, df.isnull().mean() < 0.9]
+def data_cleaning(df, csv=False, weather_cache=None, compact=False):
+    """Bereinigung der Daten
+    - Zusammenfassung der Daten nach Datum, Land, Stadt und Spezies, so dass nur ein Messwert je Species (Median) pro Tag/ Stadt verbleibt
+    - Spalte Species aufteilen (beides in einem Schritt über reshape_species)
+    - Wetterdaten über den Stations-Cache (weather_cache, Standard ./data/weather_cache/)
+    - Ausreißer laut OUTLIER_RULES durch NaN ersetzen
+    - df als Parquet (nach Jahr/Land partitioniert) speichern im Datenverzeichnis,
+      mit csv=True zusätzlich als cleaned_data.csv
+    - compact=True: mit pandas Copy-on-Write (Schritte teilen die Daten, bis eine Spalte ersetzt wird) und
+      nach jedem Schritt im kompakten Schema (compact_frame), Wetterdaten schon je Station als float32
+    """
+    with pd.option_context("mode.copy_on_write", True) if compact else nullcontext():
+        df, replaced = clean_steps(df, weather_cache, compact)
+        print(f"✅ Ausreißer ersetzt: {int(replaced.sum())} Werte")
 
-    output_path = './data/cleaned_data.csv'
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_csv(output_path, index=False)
-    print(f"✅ Datei wurde gespeichert: {output_path}")
+        df = finalize(df)
+
+        write_dataset(df, "cleaned_data", csv=csv)
 
     return df
 
 def geo_data(df):
     """
     Fügt die Geodaten zu den Städten hinzu
+    Join über den Gazetteer (Land, Stadt) -> jede Zeile behält genau eine Zeile
     """
-    df = df.copy()
+    # flache Kopie: Spalten werden nur ersetzt, df des Aufrufers bleibt unverändert
+    df = df.copy(deep=False)
 
-    # JSON-Datei laden mit Fehlerbehandlung
+    # Gazetteer laden mit Fehlerbehandlung
     try:
-        with open('./data/airquality-covid19-cities.json', 'r', encoding='utf-8') as file:
-            geodata = json.load(file)
+        gazetteer = load_gazetteer()
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"Fehler beim Laden der JSON-Datei: {e}")
         return df
 
-    geodata = geodata.get("data", [])
-
-    # Erstellen eines DataFrames mit Städten und Geokoordinaten
-    df_places = pd.DataFrame([
-        {
-            "City": entry.get("Place", {}).get("name"),
-            "Latitude": entry.get("Place", {}).get("geo", [None, None])[0],
-            "Longitude": entry.get("Place", {}).get("geo", [None, None])[1]
-        }
-        for entry in geodata if "Place" in entry and "geo" in entry.get("Place", {})
-    ])
-
-    # Entferne Zeilen mit fehlenden Stadtnamen
-    df_places.dropna(subset=["City"], inplace=True)
-
     # Standardisiere Stadtnamen
-    df_places["City"] = df_places["City"].str.lower().str.strip()
-    df["City"] = df["City"].str.lower().str.strip()
+    df["City"] = map_names(df["City"], normalize_city)
 
-    # Zusammenführen der beiden DataFrames über "City"
-    df = df.merge(df_places, on="City", how="left")
+    df, report = join_gazetteer(df, gazetteer)
+    print(f"Geodaten: {report['matched']} von {report['rows']} Zeilen zugeordnet, "
+          f"{report['gazetteer_duplicates']} doppelte Orte im Gazetteer ignoriert")
 
     # Überprüfung auf fehlende Geodaten
-    fehlende_staedte = df[df["Latitude"].isna()]["City"].unique()
-    if fehlende_staedte.size > 0:
-        print(f"Keine Geodaten gefunden für: {', '.join(fehlende_staedte)}")
+    if report["ambiguous_cities"]:
+        print(f"Mehrdeutige Städte ohne passendes Land: {', '.join(report['ambiguous_cities'])}")
+    if report["missing_cities"]:
+        print(f"Keine Geodaten gefunden für: {', '.join(report['missing_cities'])}")
 
     return df
 
-def weather_data(df):
-    """
-    Ruft Wetterdaten für Städte im DataFrame ab und integriert sie.
-    """
-    df = df.copy()
-
-    # Städte extrahieren und Duplikate entfernen
-    cities = df[['City', 'Latitude', 'Longitude']].drop_duplicates()
-
-    # Zeitspanne festlegen
-    start = datetime(2015, 1, 1)
-    end = datetime(2024, 12, 31)
-
-    # DataFrame für alle Städte vorbereiten
-    all_data = pd.DataFrame()
-
-    # Wetterdaten für jede Stadt abrufen und hinzufügen
-    for _, city in cities.iterrows():
-        try:
-            # Nächste Wetterstation suchen
-            stations = Stations().nearby(city['Latitude'], city['Longitude'])
-            station = stations.fetch(1)
+# Zeitspanne der Wetterdaten
+WEATHER_START = datetime(2015, 1, 1)
+WEATHER_END = datetime(2024, 12, 31)
 
-            if not station.empty:
-                station_id = station.index[0]
+# Schlüssel der Zuordnung Stadt -> Station: gleiche Städtenamen in verschiedenen Ländern sind verschiedene Orte
+STATION_KEYS = ["Country", "City"]
 
-                # Tägliche Wetterdaten abrufen
-                data = Daily(station_id, start, end).fetch()
+def _station_keys(df):
+    """Vorhandene Schlüsselspalten (ohne Country nur City)"""
+    return [col for col in STATION_KEYS if col in df.columns]
 
-                # NaN-Daten rausfiltern
-                data.dropna(how='all', inplace=True)
-
-                if not data.empty:
-                    # Stadtname hinzufügen
-                    data["City"] = city["City"]
+def _nearest_stations(cities):
+    """
+    Nächste Wetterstation je Stadt, eine Abfrage über den räumlichen Index des Stationskatalogs
+    Gibt {(Country, City): Station} zurück (ohne Spalte Country: {(City,): Station}).
+    """
+    try:
+        catalog = Stations().fetch()
+    except Exception as e:
+        print(f"⚠️ Fehler beim Laden des Stationskatalogs: {e}")
+        return {}
 
-                    # Daten in den Gesamtdaten-Frame einfügen
-                    all_data = pd.concat([all_data, data])
+    if catalog.empty:
+        return {}
 
-        except Exception as e:
-            print(f"⚠️ Fehler beim Abrufen der Daten für {city['City']}: {e}")
+    index = GeoIndex.from_frame(catalog, lat_col='latitude', lon_col='longitude')
+    station_ids, _ = index.nearest(cities['Latitude'], cities['Longitude'])
 
-    # Index zurücksetzen
-    all_data.reset_index(inplace=True)
+    keys = cities[_station_keys(cities)].itertuples(index=False, name=None)
+    return {key: station_id for key, station_id in zip(keys, station_ids[:, 0]) if station_id is not None}
 
-    # Spalte 'time' umbenennen in 'Date'
-    all_data.rename(columns={'time': 'Date'}, inplace=True)
+def _fetch_station(station_id, start, end, cache=None):
+    """Tägliche Wetterdaten einer Station, ohne komplett leere Tage
+    Mit cache (WeatherCache) werden nur die noch fehlenden Tage bei Meteostat angefragt.
+    """
+    if cache is None:
+        data = Daily(station_id, start, end).fetch()
+    else:
+        data = cache.get(station_id, start, end, lambda gap_start, gap_end: Daily(station_id, gap_start, gap_end).fetch())
+    data = data.dropna(how='all')
+    if 'time' not in data.columns:
+        data = data.reset_index()
+    return data.rename(columns={'time': 'Date'})
+
+def _fetch_stations(station_ids, start, end, max_workers, cache=None):
+    """Lädt jede Station genau einmal, parallel in einem begrenzten Thread-Pool"""
+    station_data = {}
+    if not station_ids:
+        return station_data
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(station_ids)))) as pool:
+        futures = {station_id: pool.submit(_fetch_station, station_id, start, end, cache) for station_id in station_ids}
+        for station_id, future in futures.items():
+            try:
+                data = future.result()
+            except Exception as e:
+                print(f"⚠️ Fehler beim Abrufen der Daten für Station {station_id}: {e}")
+                continue
+            if not data.empty:
+                station_data[station_id] = data
+    if cache is not None:
+        cache.flush()
+    return station_data
+
+def nearest_stations(cities):
+    """Zuordnung Stadt -> nächste Wetterstation als DataFrame (Country, City, Station; ohne Country nur City, Station)"""
+    keys = _station_keys(cities)
+    city_station = _nearest_stations(cities)
+    stations = pd.DataFrame(list(city_station), columns=keys, dtype=object)
+    stations['Station'] = pd.Series(list(city_station.values()), dtype=object)
+    return stations
+
+def station_weather(stations, max_workers=8, cache=None, start=WEATHER_START, end=WEATHER_END, max_missing=80,
+                    compact=False):
+    """
+    Tägliche Wetterdaten je Station (Station, Date, ...) für die Zuordnung aus nearest_stations
+    - jede Station wird nur einmal geladen, auch wenn mehrere Städte sie teilen
+    - nur der Zeitraum [start, end]
+    - Spalten mit mehr als max_missing % NaN (gewichtet mit der Anzahl Städte je Station) fallen weg
+    - compact=True: Messwerte je Station als float32 vor dem concat
+    """
+    station_ids = list(dict.fromkeys(stations['Station']))
+    station_data = _fetch_stations(station_ids, start, end, max_workers, cache)
+    if compact:
+        station_data = {station_id: compact_frame(data) for station_id, data in station_data.items()}
+
+    if not station_data:
+        print("⚠️ Keine Wetterdaten gefunden")
+        return pd.DataFrame(columns=['Station', 'Date'])
+
+    n_cities = stations['Station'].isin(station_data.keys()).sum()
+    print(f"✅ Wetterdaten gesammelt für {n_cities} Städte ({len(station_data)} Stationen)")
+
+    # Station als Spalte vorn, aus den Längen der Stationstabellen statt über einen MultiIndex
+    frames = list(station_data.values())
+    station = pd.Categorical.from_codes(np.repeat(np.arange(len(frames)), [len(frame) for frame in frames]),
+                                        categories=list(station_data))
+    all_data = pd.concat(frames, ignore_index=True)
+    all_data.insert(0, 'Station', station if compact else np.asarray(station))
+    all_data['Date'] = pd.to_datetime(all_data['Date'])
+
+    # Anteil der NaN-Werte pro Spalte, gewichtet mit der Anzahl Städte je Station
+    # (spaltenweise, ohne gewichtete Kopie der ganzen Tabelle)
+    cities_per_station = stations['Station'].value_counts()
+    weights = all_data['Station'].map(cities_per_station)
+    missing_percentage = pd.Series({col: weights[all_data[col].isna().to_numpy()].sum()
+                                    for col in all_data.columns}, dtype=np.float64) / weights.sum() * 100
+    # Lösche Spalten mit mehr als max_missing % NaN-Werten
+    return all_data.loc[:, missing_percentage <= max_missing]
+
+def merge_weather(df, stations, all_data):
+    """Zusammenführen der Wetterdaten über Station und Datum, die Station je (Country, City) aus stations"""
+    if all_data.empty:
+        return df
 
-    # Standardisiere den Stadtnamen
-    all_data["City"] = all_data["City"].str.lower().str.strip()
+    df['Date'] = pd.to_datetime(df['Date'])
+    # Station je Zeile über (Country, City), ohne Zuordnung (Position -1) None
+    keys = _station_keys(stations)
+    position = pd.MultiIndex.from_frame(stations[keys].astype(object)).get_indexer(
+        pd.MultiIndex.from_frame(df[keys].astype(object)))
+    station_ids = np.append(stations['Station'].to_numpy(dtype=object), None)
+    df['Station'] = station_ids[position]
+    df = pd.merge(df, all_data, on=['Station', 'Date'], how="left")
 
-    print(f"✅ Wetterdaten gesammelt für {all_data['City'].nunique()} Städte")
+    return df.drop(columns='Station')
 
-    # Konvertiere die 'Date'-Spalte in beiden DataFrames zu String-Format
-    # df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
-    all_data['Date'] = pd.to_datetime(all_data['Date']).dt.strftime('%Y-%m-%d')
+def weather_data(df, max_workers=8, cache=None, start=WEATHER_START, end=WEATHER_END, max_missing=80, compact=False):
+    """
+    Ruft Wetterdaten für Städte im DataFrame ab und integriert sie.
+    - zuerst wird für alle Städte die nächste Station bestimmt
+    - jede Station wird nur einmal geladen, auch wenn mehrere Städte sie teilen
+    - mit cache (WeatherCache) nur die Tage, die noch nicht auf der Platte liegen
+    - ein einziges concat über die Stationen, Zuordnung zu den Städten per merge
+    - nur der Zeitraum [start, end], Spalten mit mehr als max_missing % NaN fallen weg
+    - compact=True: Wetterdaten als float32 (siehe station_weather)
+    """
+    # flache Kopie: merge_weather ersetzt nur Spalten, df des Aufrufers bleibt unverändert
+    df = df.copy(deep=False)
 
-    # Berechne den Anteil der NaN-Werte pro Spalte
-    missing_percentage = all_data.isna().mean() * 100
-    # Lösche Spalten mit mehr als 80% NaN-Werten
-    all_data = all_data.loc[:, missing_percentage <= 80]
+    # Städte (je Land) extrahieren und Duplikate entfernen
+    cities = df[_station_keys(df) + ['Latitude', 'Longitude']].drop_duplicates(subset=_station_keys(df))
 
-    # Zusammenführen der beiden DataFrames über "City" und "Date"
-    df = pd.merge(df, all_data, on=["City", 'Date'], how="left")
+    stations = nearest_stations(cities)
+    all_data = station_weather(stations, max_workers, cache, start, end, max_missing, compact)
 
-    return df
+    return merge_weather(df, stations, all_data)
 
-def population_data(df):
+def population_data(df, lookup=None, output_path=None):
     '''
     Fügt jeder Stadt Einwohner hinzu
-    Merge über Kalenderjahr
+    Zuordnung über das nächstgelegene Kalenderjahr (letztes Jahr davor, sonst das erste danach)
+    - die UN-Tabelle wird nur einmal geladen (lookup, siehe population.load_population)
+    - gesucht wird nur je eindeutigem (City, Year)-Paar, nicht je Tageszeile
+    - mit output_path wird das Ergebnis zusätzlich als CSV gespeichert
     '''
-    df = df.copy()
-    
-    df_population = pd.read_csv(
-                    './data/population.csv',
-                    sep=',', 
-                    header=0,
-                    engine='python',  # Hilft oft bei Parsing-Problemen
-                    on_bad_lines='skip',  # Methode zum Überspringen von fehlerhaften Zeilen
-                    encoding='utf-8')  # Falls Sonderzeichen vorhanden sind
-
-    df_population = df_population[['City', 'Value', 'Year']]
-    df_population.rename(columns={'Value': 'Population'}, inplace=True)
-    df_population.dropna(inplace=True)
-    df_population['Population'] = df_population['Population'].astype(int)
+    # flache Kopie: Spaltennamen und Spalten werden ersetzt, df des Aufrufers bleibt unverändert
+    df = df.copy(deep=False)
+
+    lookup = lookup or load_population()
 
     # Spaltennamen anpassen
     df.columns = df.columns.str.capitalize()
     df['Year'] = df['Year'].astype(int)
-    df_population['Year'] = df_population['Year'].astype(int)
-
-    # **Sortieren nach "City" & "Year"**
-    df = df.sort_values(by=['City', 'Year']).reset_index(drop=True)
-    df_population = df_population.sort_values(by=['City', 'Year']).reset_index(drop=True)
 
-    # Merge mit dem nächstgelegenen Jahr
-    df = df.merge(df_population, on=['City', 'Year'], how='left')
-    df['Population'] = df.groupby('City')['Population'].fillna(method='ffill').fillna(method='bfill')   #soon to be deprecated
+    pair_codes, pairs = pd.factorize(pd.MultiIndex.from_arrays([df['City'].astype(object), df['Year']]))
+    population = lookup.lookup(pairs.get_level_values(0), pairs.get_level_values(1))
+    df['Population'] = population[pair_codes]
 
     # Datei speichern
-    output_path = './data/population_data.csv'
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_csv(output_path, index=False)
-    print(f"✅ Datei wurde gespeichert: {output_path}")
+    if output_path:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        df.to_csv(output_path, index=False)
+        print(f"✅ Datei wurde gespeichert: {output_path}")
 
     return df
 
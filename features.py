@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+from storage import DATA_FOLDER, dataset_path, load_cleaned
+
+# Merkmale für die Regression PM2.5 ~ Wetter aus 3_feature_engineering.ipynb, für alle Städte auf einmal
+# - Log_Prcp, Tavg_squared, Humidity_low/-high (Knick bei 80%), Tavg_Humidity, Season
+# - Season über eine Nachschlagetabelle Monat -> Jahreszeit statt apply(get_season) je Zeile
+# - optional fehlende Werte je Stadt ersetzen (gruppierter transform statt fillna für eine Stadt)
+# - Ergebnis kompakt als float32, City und Season als Kategorien
+
+WEATHER_FEATURES = ['Tavg', 'Humidity', 'Prcp', 'Wspd', 'Pres']
+POLLUTANT_FEATURES = ['No2', 'O3', 'So2']
+TARGET = 'Pm25'
+
+# Jahreszeiten wie get_season im Notebook; Kategorien alphabetisch wie pd.get_dummies (Frühling = Referenz)
+SEASONS = ['Frühling', 'Herbst', 'Sommer', 'Winter']
+SEASON_OF_MONTH = np.array([-1, 3, 3, 0, 0, 0, 2, 2, 2, 1, 1, 1, 3], dtype=np.int8)   # Index = Monat
+SEASON_DUMMIES = SEASONS[1:]
+
+HUMIDITY_KNEE = 80
+
+def season(month):
+    """Jahreszeit je Monat als Kategorie (Nachschlagen statt apply)"""
+    codes = SEASON_OF_MONTH[np.asarray(month, dtype=np.int64)]
+    return pd.Categorical.from_codes(codes, categories=SEASONS)
+
+def impute_by_city(df, columns, how="median"):
+    """Fehlende Werte je Stadt mit Median (bzw. how) der Stadt ersetzen, in einem gruppierten transform"""
+    filled = df[columns].fillna(df.groupby('City', observed=True)[columns].transform(how))
+    return df.assign(**{col: filled[col] for col in columns})
+
+def build_features(df, impute=None, extra=POLLUTANT_FEATURES, dtype=np.float32):
+    """
+    Vollständiger Merkmalssatz für alle Städte in df
+    - impute: None oder Aggregation je Stadt ("median", "mean") für Ziel, Wetter und extra
+    - extra: zusätzlich übernommene Schadstoffe (No2, O3, So2 wie in model_final)
+    - Season als Kategorie plus Dummy-Spalten Herbst, Sommer, Winter (Frühling = Referenz)
+    Alle Zahlenspalten als dtype (Standard float32).
+    """
+    extra = [col for col in extra if col in df.columns]
+    numeric = [TARGET] + WEATHER_FEATURES + extra
+    if impute:
+        df = impute_by_city(df, [col for col in numeric if col in df.columns], impute)
+
+    # von finalize verworfene Wetterspalten (>90% NaN) als leere Spalten
+    values = {col: df[col].to_numpy(dtype=dtype, na_value=np.nan) if col in df.columns
+              else np.full(len(df), np.nan, dtype=dtype) for col in numeric}
+    tavg, humidity = values['Tavg'], values['Humidity']
+    seasons = season(df['Month'])
+
+    features = {
+        'Year': df['Year'].to_numpy(dtype=np.int16),
+        'Month': df['Month'].to_numpy(dtype=np.int8),
+        'Day': df['Day'].to_numpy(dtype=np.int8),
+        'City': pd.Categorical(df['City']),
+        **values,
+        'Log_Prcp': np.log1p(values['Prcp']),
+        'Tavg_squared': tavg * tavg,
+        'Humidity_low': np.minimum(humidity, dtype(HUMIDITY_KNEE)),
+        'Humidity_high': np.maximum(humidity - dtype(HUMIDITY_KNEE), dtype(0)),
+        'Tavg_Humidity': tavg * humidity,
+        'Season': seasons,
+    }
+    for i, name in enumerate(SEASONS):
+        if name in SEASON_DUMMIES:
+            features[name] = (seasons.codes == i).astype(dtype)
+
+    return pd.DataFrame(features, index=df.index)
+
+def load_features(cities=None, years=None, impute=None, data_folder=DATA_FOLDER):
+    """Merkmale direkt aus cleaned_data, nur die benötigten Spalten (optional Städte/Jahre)"""
+    available = ds.dataset(dataset_path("cleaned_data", data_folder), partitioning="hive").schema.names
+    columns = [col for col in ['Year', 'Month', 'Day', 'City', TARGET] + WEATHER_FEATURES + POLLUTANT_FEATURES
+               if col in available]
+    df = load_cleaned(columns, cities=cities, years=years, data_folder=data_folder)
+    return build_features(df, impute=impute)
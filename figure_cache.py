@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+
+# LRU-Cache für gerenderte Diagramme (PNG-Bytes), geteilt zwischen allen Sitzungen des Dashboards.
+# Schlüssel enthalten Auswahl und Datenstand, z. B. ("monthly", stadt_a, stadt_b, schadstoff, modus, version).
+# Wird ein Schlüssel gerade von einer anderen Sitzung gerendert, wird auf dieses Ergebnis gewartet
+# statt ein zweites Mal zu zeichnen.
+
+class FigureCache:
+    """
+    Begrenzter LRU-Cache: höchstens max_entries Bilder und (optional) max_bytes insgesamt
+    Zähler hits/misses/evictions für die Anzeige im Dashboard
+    """
+
+    def __init__(self, max_entries=64, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._images = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._rendering = {}
+
+    def __len__(self):
+        return len(self._images)
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._images),
+            "bytes": self._bytes,
+            "hit_rate": self.hits / requests if requests else 0.0,
+        }
+
+    def get(self, key, render):
+        """Bild zum Schlüssel; render() -> bytes wird nur bei einem Fehlschlag aufgerufen"""
+        while True:
+            with self._lock:
+                if key in self._images:
+                    self._images.move_to_end(key)
+                    self.hits += 1
+                    return self._images[key]
+                event = self._rendering.get(key)
+                if event is None:
+                    # diese Sitzung rendert
+                    self.misses += 1
+                    event = self._rendering[key] = threading.Event()
+                    break
+            # andere Sitzung rendert bereits: warten und erneut nachsehen
+            event.wait()
+
+        try:
+            image = render()
+            with self._lock:
+                self._store(key, image)
+            return image
+        finally:
+            with self._lock:
+                self._rendering.pop(key).set()
+
+    def _store(self, key, image):
+        if key in self._images:
+            self._bytes -= len(self._images.pop(key))
+        self._images[key] = image
+        self._bytes += len(image)
+        while len(self._images) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes
+                                                        and len(self._images) > 1):
+            _, old = self._images.popitem(last=False)
+            self._bytes -= len(old)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._bytes = 0
@@ -0,0 +1,118 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# Ortsverzeichnis (Gazetteer) aus airquality-covid19-cities.json
+# - wird einmal geparst und als Parquet neben der JSON-Datei abgelegt
+# - Schlüssel (Land, normalisierter Stadtname) ist eindeutig, dadurch kann der
+#   Join in geo_data keine Zeilen vervielfachen
+
+CITIES_JSON = './data/airquality-covid19-cities.json'
+GAZETTEER_FILE = './data/gazetteer.parquet'
+
+# bereits geladene Verzeichnisse je (Pfad, Änderungszeit)
+_loaded = {}
+
+def normalize_city(city):
+    """Einheitliche Stadtnamen: klein geschrieben, ohne Leerzeichen am Rand"""
+    return city.str.lower().str.strip()
+
+def normalize_country(country):
+    return country.str.upper().str.strip()
+
+def parse_cities_json(json_path=CITIES_JSON):
+    """Liest die Orte aus der JSON-Datei (Land, Stadt, Koordinaten), Duplikate bleiben erhalten"""
+    with open(json_path, 'r', encoding='utf-8') as file:
+        geodata = json.load(file)
+
+    places = [entry.get("Place", {}) for entry in geodata.get("data", []) if "Place" in entry]
+    places = [place for place in places if "geo" in place and place.get("name") is not None]
+
+    return pd.DataFrame({
+        "Country": pd.Series([place.get("country") for place in places], dtype=object),
+        "City": pd.Series([place.get("name") for place in places], dtype=object),
+        "Latitude": pd.Series([(place.get("geo") or [None, None])[0] for place in places], dtype=float),
+        "Longitude": pd.Series([(place.get("geo") or [None, None])[1] for place in places], dtype=float),
+    })
+
+def build_gazetteer(places):
+    """Eindeutiger Index über (Land, Stadt); bei doppelten Einträgen gewinnt der erste"""
+    gazetteer = places.copy()
+    gazetteer["City"] = normalize_city(gazetteer["City"])
+    gazetteer["Country"] = normalize_country(gazetteer["Country"])
+    gazetteer = gazetteer.dropna(subset=["City"])
+
+    duplicated = gazetteer.duplicated(subset=["Country", "City"])
+    gazetteer = gazetteer[~duplicated].reset_index(drop=True)
+    gazetteer.attrs["duplicates"] = int(duplicated.sum())
+    return gazetteer
+
+def load_gazetteer(json_path=CITIES_JSON, gazetteer_path=GAZETTEER_FILE):
+    """
+    Gazetteer laden: aus dem Speicher, aus der Parquet-Datei oder (falls die JSON neuer ist) neu aufbauen.
+    Wirft FileNotFoundError / json.JSONDecodeError wie beim direkten Lesen der JSON.
+    """
+    json_exists = os.path.exists(json_path)
+    key = (json_path, os.path.getmtime(json_path) if json_exists else None)
+    if json_exists and key in _loaded:
+        return _loaded[key]
+
+    if json_exists and os.path.exists(gazetteer_path) and os.path.getmtime(gazetteer_path) >= key[1]:
+        gazetteer = pd.read_parquet(gazetteer_path, engine="pyarrow")
+        gazetteer.attrs["duplicates"] = int(gazetteer.attrs.get("duplicates", 0))
+    else:
+        gazetteer = build_gazetteer(parse_cities_json(json_path))
+        if json_exists:
+            os.makedirs(os.path.dirname(gazetteer_path) or '.', exist_ok=True)
+            gazetteer.to_parquet(gazetteer_path, engine="pyarrow", index=False)
+
+    if json_exists:
+        _loaded[key] = gazetteer
+    return gazetteer
+
+def _positions(keys, lookup_keys, rows):
+    """Gazetteer-Zeile je Schlüssel (-1 = nicht gefunden), plus -1 am Ende für fehlende Codes (-1)"""
+    found = pd.Index(lookup_keys).get_indexer(keys) if len(keys) else np.empty(0, dtype=np.int64)
+    rows = np.append(np.asarray(rows, dtype=np.int64), -1)
+    return np.append(rows[found], -1)
+
+def join_gazetteer(df, gazetteer):
+    """
+    Ergänzt Latitude/Longitude über Integer-Codes, garantiert 1:1 (Zeilenanzahl bleibt gleich)
+    - zuerst über (Country, City)
+    - sonst über City allein, aber nur wenn der Name im Gazetteer eindeutig ist
+    Gibt (df, report) zurück, report zählt Treffer, fehlende und mehrdeutige Zeilen.
+    """
+    city = normalize_city(df["City"].astype(object))
+    city_codes, cities = pd.factorize(city)
+    position = np.full(len(df), -1, dtype=np.int64)
+
+    if "Country" in df.columns:
+        keys = pd.MultiIndex.from_arrays([normalize_country(df["Country"].astype(object)), city])
+        key_codes, unique_keys = pd.factorize(keys)
+        gazetteer_keys = pd.MultiIndex.from_arrays([gazetteer["Country"], gazetteer["City"]])
+        position = _positions(unique_keys, gazetteer_keys, np.arange(len(gazetteer)))[key_codes]
+
+    # Rückfall: Stadtname allein, nur wenn er im Gazetteer genau einmal vorkommt
+    name_counts = gazetteer["City"].value_counts()
+    unique_name = (gazetteer["City"].map(name_counts) == 1).to_numpy()
+    fallback = _positions(cities, gazetteer["City"][unique_name], np.flatnonzero(unique_name))[city_codes]
+    position = np.where(position >= 0, position, fallback)
+
+    # letzter Eintrag (NaN) für nicht gefundene Zeilen
+    df["Latitude"] = np.append(gazetteer["Latitude"].to_numpy(dtype=float), np.nan)[position]
+    df["Longitude"] = np.append(gazetteer["Longitude"].to_numpy(dtype=float), np.nan)[position]
+
+    matched = position >= 0
+    unmatched_cities = pd.unique(city[~matched].dropna())
+    ambiguous = set(name_counts.index[name_counts > 1])
+    report = {
+        "rows": len(df),
+        "matched": int(matched.sum()),
+        "unmatched": int((~matched).sum()),
+        "gazetteer_duplicates": int(gazetteer.attrs.get("duplicates", 0)),
+        "ambiguous_cities": sorted(c for c in unmatched_cities if c in ambiguous),
+        "missing_cities": sorted(c for c in unmatched_cities if c not in ambiguous),
+    }
+    return df, report
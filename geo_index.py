@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+# Räumlicher Index (BallTree mit Haversine-Distanz) für Nächste-Nachbarn-Abfragen,
+# z. B. Stadt -> Wetterstation oder Stadt -> benachbarte Städte.
+# Der Baum wird einmal aufgebaut, Abfragen laufen für alle Punkte in einem Aufruf.
+
+EARTH_RADIUS_KM = 6371.0
+
+def _to_radians(latitudes, longitudes):
+    """(n, 2)-Array in Bogenmaß und Maske der Punkte mit gültigen Koordinaten"""
+    points = np.radians(np.column_stack([
+        np.asarray(latitudes, dtype=np.float64),
+        np.asarray(longitudes, dtype=np.float64),
+    ]))
+    valid = ~np.isnan(points).any(axis=1)
+    return points, valid
+
+class GeoIndex:
+    """Haversine-BallTree über Punkte mit IDs (z. B. Stations-IDs oder Städtenamen)"""
+
+    def __init__(self, latitudes, longitudes, ids=None):
+        points, valid = _to_radians(latitudes, longitudes)
+        ids = np.arange(len(points)) if ids is None else np.asarray(ids, dtype=object)
+
+        # Punkte ohne Koordinaten können nicht gefunden werden; ohne gültige Punkte kein Baum
+        self.ids = ids[valid]
+        self._tree = BallTree(points[valid], metric="haversine") if valid.any() else None
+
+    @classmethod
+    def from_frame(cls, df, lat_col="Latitude", lon_col="Longitude", id_col=None):
+        """Index aus einem DataFrame, IDs aus id_col oder dem DataFrame-Index"""
+        ids = df.index if id_col is None else df[id_col]
+        return cls(df[lat_col], df[lon_col], ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nearest(self, latitudes, longitudes, k=1):
+        """
+        Die k nächsten Punkte für alle Abfragepunkte
+        Gibt (ids, distanzen_km) als (n, k)-Arrays zurück, None/NaN bei fehlenden Koordinaten
+        und in den Spalten, für die der Index zu wenige (oder keine) Punkte hat.
+        """
+        points, valid = _to_radians(latitudes, longitudes)
+        ids = np.full((len(points), k), None, dtype=object)
+        distances = np.full((len(points), k), np.nan)
+
+        found = min(k, len(self.ids))
+        if found > 0 and valid.any():
+            dist, pos = self._tree.query(points[valid], k=found)
+            ids[valid, :found] = self.ids[pos]
+            distances[valid, :found] = dist * EARTH_RADIUS_KM
+
+        return ids, distances
+
+    def within(self, latitudes, longitudes, radius_km):
+        """
+        Alle Punkte im Umkreis radius_km, sortiert nach Entfernung
+        Gibt je Abfragepunkt ein Array IDs und ein Array Distanzen (km) zurück.
+        """
+        points, valid = _to_radians(latitudes, longitudes)
+        ids = [np.array([], dtype=object) for _ in range(len(points))]
+        distances = [np.array([]) for _ in range(len(points))]
+
+        if len(self.ids) and valid.any():
+            pos, dist = self._tree.query_radius(points[valid], r=radius_km / EARTH_RADIUS_KM,
+                                                return_distance=True, sort_results=True)
+            for i, p, d in zip(np.flatnonzero(valid), pos, dist):
+                ids[i] = self.ids[p]
+                distances[i] = d * EARTH_RADIUS_KM
+
+        return ids, distances
+
+def match_nearest(df, index, lat_col="Latitude", lon_col="Longitude", k=1):
+    """
+    Ordnet jeder Zeile von df die k nächsten Punkte des Index zu
+    Ergebnis: DataFrame mit Spalten match_1..k und distance_1..k (km), gleicher Index wie df
+    """
+    ids, distances = index.nearest(df[lat_col], df[lon_col], k=k)
+    result = pd.DataFrame(index=df.index)
+    for i in range(ids.shape[1]):
+        result[f"match_{i + 1}"] = ids[:, i]
+        result[f"distance_{i + 1}"] = distances[:, i]
+    return result
+
+def city_points(df, lat_col="Latitude", lon_col="Longitude", crs="EPSG:4326"):
+    """GeoDataFrame mit Punkt-Geometrien, vektorisiert statt Point() je Zeile"""
+    import geopandas as gpd
+
+    return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df[lon_col], df[lat_col]), crs=crs)
@@ -0,0 +1,178 @@
+import os
+import numpy as np
+import pandas as pd
+from data_preparation import FINAL_COLUMNS, SPECIES_COLUMNS, clean_steps, finalize, import_files
+from gazetteer import normalize_city
+from storage import DATA_FOLDER, dataset_path, upsert_dataset
+from weather_cache import WeatherCache
+
+# Inkrementelle Aktualisierung des bereinigten Datensatzes
+# - je Quelldatei und (Date, Country, City) wird ein Hash über die Messwerte gespeichert,
+#   die in cleaned_data eingehen (Specie, median)
+# - beim Update werden nur die Schlüssel neu berechnet, deren Hash neu, geändert oder
+#   weggefallen ist; Geo-, Wetter- und Einwohnerdaten nur für diese Zeilen
+# - die Ergebnisse ersetzen im Parquet-Datensatz nur die betroffenen Partitionen
+
+DIGEST_FILE = "cleaned_keys.parquet"
+KEY_COLUMNS = ["Date", "Country", "City"]
+CLEANED_KEY_COLUMNS = ["Year", "Month", "Day", "Country", "City"]
+
+def _keys(raw):
+    """Schlüssel wie nach reshape_species + Kleinschreibung in data_cleaning"""
+    return pd.DataFrame({
+        "Date": pd.to_datetime(raw["Date"]).dt.normalize(),
+        "Country": raw["Country"].astype(object),
+        "City": normalize_city(raw["City"].astype(object)),
+    }, index=raw.index)
+
+def _relevant(raw):
+    """Nur Zeilen, die reshape_species verwendet"""
+    return raw[raw["Specie"].isin(SPECIES_COLUMNS) & raw["median"].notna()
+               & raw["Date"].notna() & raw["Country"].notna() & raw["City"].notna()]
+
+def _raw_files(data_folder):
+    return sorted(f for f in os.listdir(data_folder) if f.startswith('waqi-covid-') and f.endswith('.csv'))
+
+def _empty_digests():
+    return pd.DataFrame({"Date": pd.Series(dtype="datetime64[ns]"), "Country": pd.Series(dtype=object),
+                         "City": pd.Series(dtype=object), "Source": pd.Series(dtype=object),
+                         "Digest": pd.Series(dtype=np.uint64)})
+
+def key_digests(raw, source):
+    """
+    Ein Hash je (Date, Country, City) über alle Zeilen (Specie, median) der Datei source
+    Summe der Zeilen-Hashes (mod 2^64), dadurch unabhängig von der Zeilenreihenfolge
+    """
+    raw = _relevant(raw)
+    if raw.empty:
+        return _empty_digests()
+
+    row_hash = pd.util.hash_pandas_object(
+        pd.DataFrame({"Specie": raw["Specie"].astype(object), "median": raw["median"].astype(float)}),
+        index=False).to_numpy()
+    codes, unique_keys = pd.factorize(pd.MultiIndex.from_frame(_keys(raw)))
+
+    order = np.argsort(codes, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+
+    result = unique_keys.to_frame(index=False, name=KEY_COLUMNS)
+    result["Source"] = source
+    result["Digest"] = np.add.reduceat(row_hash[order], starts)
+    return result
+
+def file_digests(raw_files):
+    """Hashes aller Dateien aus {Dateiname: Rohdaten}"""
+    frames = [key_digests(df, file) for file, df in raw_files.items()]
+    return pd.concat(frames, ignore_index=True) if frames else _empty_digests()
+
+def load_digests(data_folder=DATA_FOLDER):
+    path = os.path.join(data_folder, DIGEST_FILE)
+    if not os.path.exists(path):
+        return _empty_digests()
+    return pd.read_parquet(path, engine="pyarrow")
+
+def save_digests(digests, data_folder=DATA_FOLDER):
+    os.makedirs(data_folder, exist_ok=True)
+    digests.to_parquet(os.path.join(data_folder, DIGEST_FILE), engine="pyarrow", index=False)
+
+def record_digests(file_names=None, data_folder=DATA_FOLDER, max_workers=None, raw=None):
+    """
+    Merkt sich den aktuellen Stand der Rohdaten, z. B. nach einem vollständigen data_cleaning-Lauf
+    - raw: bereits gelesene Rohdaten mit Spalte 'Source' (Dateiname), z. B. aus data_preparation.import_raw
+    - sonst werden die Dateien gelesen, immer nur so viele wie gleichzeitig verarbeitet werden
+    """
+    if raw is not None:
+        digests = file_digests(dict(tuple(raw.groupby("Source", observed=True))))
+    else:
+        paths = [os.path.join(data_folder, file) for file in file_names or _raw_files(data_folder)]
+        batch = max_workers or os.cpu_count() or 1
+        frames = [file_digests(import_files(paths[i:i + batch], max_workers)) for i in range(0, len(paths), batch)]
+        digests = pd.concat(frames, ignore_index=True) if frames else _empty_digests()
+    save_digests(digests, data_folder)
+    print(f"✅ Hashes für {digests['Source'].nunique()} Rohdatei(en) gespeichert")
+    return digests
+
+def changed_keys(new, stored):
+    """
+    Vergleicht die Hashes der neu gelesenen Dateien mit den gespeicherten
+    Gibt (Hashes nach dem Update, Schlüssel zum Neuberechnen, Schlüssel zum Löschen) zurück.
+    """
+    sources = set(new["Source"])
+    old = stored[stored["Source"].isin(sources)]
+    kept = stored[~stored["Source"].isin(sources)]
+    digests = pd.concat([kept, new], ignore_index=True) if not kept.empty else new.reset_index(drop=True)
+
+    # Zeilen (Schlüssel, Datei, Hash), die nur auf einer Seite vorkommen: neu, geändert oder weggefallen
+    columns = KEY_COLUMNS + ["Source", "Digest"]
+    new_rows = pd.MultiIndex.from_frame(new[columns])
+    old_rows = pd.MultiIndex.from_frame(old[columns])
+    touched = pd.concat([new.loc[~new_rows.isin(old_rows), KEY_COLUMNS],
+                         old.loc[~old_rows.isin(new_rows), KEY_COLUMNS]]).drop_duplicates()
+
+    # ein Schlüssel bleibt, solange er noch in irgendeiner Datei vorkommt
+    alive = pd.MultiIndex.from_frame(touched).isin(pd.MultiIndex.from_frame(digests[KEY_COLUMNS]))
+    return digests, touched[alive].reset_index(drop=True), touched[~alive].reset_index(drop=True)
+
+def _cleaned_keys(keys):
+    """(Date, Country, City) -> Schlüssel im bereinigten Datensatz"""
+    return pd.DataFrame({
+        "Year": keys["Date"].dt.year,
+        "Month": keys["Date"].dt.month,
+        "Day": keys["Date"].dt.day,
+        "Country": keys["Country"],
+        "City": keys["City"].str.capitalize(),
+    })
+
+def clean_rows(raw, weather_cache=None, max_workers=8):
+    """
+    Die Schritte aus data_cleaning (clean_steps) für einen Ausschnitt der Rohdaten
+    Wetterdaten mit demselben Zeitraum wie data_cleaning (WEATHER_START bis WEATHER_END, aus dem
+    WeatherCache), damit Zeilen und Spaltenauswahl nicht vom Weg abhängen; die Spaltenauswahl
+    übernimmt der bestehende Datensatz beim Einfügen.
+    """
+    df, _ = clean_steps(raw, weather_cache, max_workers=max_workers)
+    return df.reindex(columns=FINAL_COLUMNS)
+
+def update_cleaned(file_names=None, data_folder=DATA_FOLDER, weather_cache=None, max_workers=None):
+    """
+    Aktualisiert cleaned_data nur für neue oder geänderte Tage
+    - file_names: neu geladene Dateien (z. B. Rückgabe von sync_files), Standard: alle waqi-covid-Dateien
+    - Dateien ohne gespeicherte Hashes werden einmal komplett übernommen
+      (nach einem vollständigen data_cleaning-Lauf vorher record_digests aufrufen)
+    Gibt die neu berechneten Zeilen zurück.
+    """
+    file_names = _raw_files(data_folder) if file_names is None else file_names
+    raw_files = import_files([os.path.join(data_folder, file) for file in file_names], max_workers)
+    stored = load_digests(data_folder)
+    new = file_digests(raw_files)
+    digests, update, remove = changed_keys(new, stored)
+
+    if update.empty and remove.empty:
+        print("✅ Keine neuen oder geänderten Tage")
+        save_digests(digests, data_folder)
+        return pd.DataFrame(columns=FINAL_COLUMNS)
+
+    # Schlüssel, die auch in nicht geänderten Dateien vorkommen, brauchen deren Zeilen ebenfalls
+    update_index = pd.MultiIndex.from_frame(update)
+    in_update = pd.MultiIndex.from_frame(digests[KEY_COLUMNS]).isin(update_index)
+    other_files = sorted(set(digests.loc[in_update, "Source"]) - set(raw_files))
+    raw_files.update(import_files([os.path.join(data_folder, file) for file in other_files], max_workers))
+
+    rows = []
+    for df in raw_files.values():
+        df = _relevant(df)
+        rows.append(df[pd.MultiIndex.from_frame(_keys(df)).isin(update_index)])
+    raw = pd.concat(rows, ignore_index=True) if rows else None
+
+    weather_cache = weather_cache or WeatherCache(os.path.join(data_folder, "weather_cache"))
+    cleaned = clean_rows(raw, weather_cache) if raw is not None and not raw.empty else pd.DataFrame(columns=FINAL_COLUMNS)
+    if not cleaned.empty and not os.path.exists(dataset_path("cleaned_data", data_folder)):
+        cleaned = finalize(cleaned)
+
+    inserted, replaced = upsert_dataset(cleaned, "cleaned_data", CLEANED_KEY_COLUMNS,
+                                        remove=_cleaned_keys(remove), data_folder=data_folder)
+    # Hashes erst nach erfolgreichem Schreiben merken
+    save_digests(digests, data_folder)
+    print(f"✅ cleaned_data aktualisiert: {len(update)} Tage/Städte neu berechnet, "
+          f"{len(remove)} entfernt ({inserted} Zeilen eingefügt, {replaced} ersetzt/gelöscht)")
+    return cleaned
@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import cProfile
+import threading
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+import pandas as pd
+import requests
+import data_preparation
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+# Messung der Pipeline-Stufen ohne Änderung am Code der Stufen
+# - je Aufruf: Wall- und CPU-Zeit, Speicherspitze (tracemalloc), Zeilen/Spalten rein und raus,
+#   gelesene/geschriebene Bytes (/proc/self/io), optional ein cProfile-Dump
+# - jeder Meteostat-Abruf (Stations/Daily.fetch) und jede HTTP-Anfrage (requests) wird mit Dauer protokolliert
+# - Ergebnis als JSON-Laufbericht in REPORT_DIR
+# Speicher und Bytes sind Prozesswerte: laufen Stufen parallel, enthalten sie auch die gleichzeitig laufenden
+# Stufen (Obergrenze, siehe "overlapping" im Bericht).
+
+REPORT_DIR = './data/run_reports/'
+
+# Funktionen aus data_preparation, die im Block active() gemessen werden (data_cleaning und seine Schritte)
+INSTRUMENTED_FUNCTIONS = ["data_import", "data_cleaning", "reshape_species", "geo_data", "weather_data",
+                          "convert_date", "population_data", "remove_outliers", "finalize", "write_dataset"]
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+def _io_counters():
+    """Gelesene und geschriebene Bytes des Prozesses (rchar/wchar aus /proc/self/io), sonst None"""
+    try:
+        with open("/proc/self/io", encoding="ascii") as file:
+            values = dict(line.split(": ") for line in file.read().splitlines())
+        return int(values["rchar"]), int(values["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def _children_cpu():
+    """CPU-Zeit beendeter Kindprozesse (z. B. Prozess-Pools innerhalb einer Stufe)"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def _shape(value):
+    """(Zeilen, Spalten) eines DataFrames, bei Tupeln (df, ...) des ersten DataFrames, sonst None"""
+    if isinstance(value, pd.DataFrame):
+        return len(value), len(value.columns)
+    if isinstance(value, pd.Series):
+        return len(value), 1
+    if isinstance(value, tuple):
+        return next((_shape(item) for item in value if isinstance(item, pd.DataFrame)), None)
+    return None
+
+def _describe(result):
+    """Kurzinfo zum Ergebnis eines externen Aufrufs: HTTP-Status bzw. Anzahl Zeilen"""
+    if isinstance(result, requests.Response):
+        return {"status": result.status_code}
+    if isinstance(result, pd.DataFrame):
+        return {"rows": len(result)}
+    return {}
+
+class _LoggedSource:
+    """Ersetzt Stations/Daily: jedes fetch() der erzeugten Objekte wird protokolliert"""
+
+    def __init__(self, instrumentation, name, source):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.source = source
+
+    def __call__(self, *args, **kwargs):
+        query = self.source(*args, **kwargs)
+        target = f"{self.name}({', '.join(str(arg) for arg in args)})"
+        fetch = query.fetch
+        query.fetch = lambda *fetch_args, **fetch_kwargs: self.instrumentation.external(
+            "meteostat", target, fetch, *fetch_args, **fetch_kwargs)
+        return query
+
+class Instrumentation:
+    """
+    Sammelt Messwerte je Stufe und externe Aufrufe eines Laufs
+    - call(name, func, ...) misst einen einzelnen Aufruf (Pipeline._run_stage nutzt das)
+    - active() misst zusätzlich INSTRUMENTED_FUNCTIONS und protokolliert Meteostat/HTTP
+    - profile_dir: je Stufe ein cProfile-Dump (<Stufe>-<Nr>.prof); verschachtelte Stufen stecken im Dump der äußeren
+    """
+
+    def __init__(self, trace_memory=True, profile_dir=None):
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.stages = []
+        self.calls = []
+        # weitere Angaben für den Bericht (z. B. Cache-Status der Pipeline-Stufen)
+        self.context = {}
+        self.started = _now()
+        self._start = time.perf_counter()
+        self._active = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _fold_peak(self):
+        """Speicherspitze seit dem letzten Ereignis allen laufenden Stufen gutschreiben (mit self._lock)"""
+        if not tracemalloc.is_tracing():
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        for record in self._active:
+            record["_peak"] = max(record["_peak"], peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def call(self, name, func, /, *args, **kwargs):
+        """func(*args, **kwargs) ausführen und messen; Ausnahmen werden vermerkt und weitergereicht"""
+        stack = self._local.__dict__.setdefault("stack", [])
+        inputs = {f"arg{i}": _shape(arg) for i, arg in enumerate(args)}
+        inputs.update({key: _shape(value) for key, value in kwargs.items()})
+        inputs = {key: shape for key, shape in inputs.items() if shape is not None}
+        record = {
+            "stage": name,
+            "parent": stack[-1]["stage"] if stack else None,
+            "thread": threading.current_thread().name,
+            "started": _now(),
+            "inputs": {key: {"rows": rows, "columns": columns} for key, (rows, columns) in inputs.items()},
+            "rows_in": sum(rows for rows, _ in inputs.values()),
+        }
+
+        with self._lock:
+            record["overlapping"] = sorted({other["stage"] for other in self._active
+                                            if other["thread"] != record["thread"]})
+            record["_start_memory"] = self._fold_peak()
+            record["_peak"] = record["_start_memory"] or 0
+            self._active.append(record)
+        io_start = _io_counters()
+        children_start = _children_cpu()
+        cpu_start, process_start, wall_start = time.thread_time(), time.process_time(), time.perf_counter()
+
+        profiler = None
+        if self.profile_dir and not stack:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:     # anderer Profiler aktiv
+                profiler = None
+
+        stack.append(record)
+        try:
+            result = func(*args, **kwargs)
+            shape = _shape(result)
+            record["rows_out"], record["cols_out"] = shape if shape else (None, None)
+            return result
+        except Exception as e:
+            record["error"] = repr(e)
+            raise
+        finally:
+            stack.pop()
+            if profiler is not None:
+                profiler.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                record["profile"] = os.path.join(self.profile_dir, f"{name}-{len(self.stages)}.prof")
+                profiler.dump_stats(record["profile"])
+
+            record["wall_seconds"] = time.perf_counter() - wall_start
+            record["cpu_seconds"] = time.thread_time() - cpu_start
+            record["process_cpu_seconds"] = time.process_time() - process_start
+            record["children_cpu_seconds"] = _children_cpu() - children_start
+            io_end = _io_counters()
+            record["bytes_read"] = io_end[0] - io_start[0] if io_start and io_end else None
+            record["bytes_written"] = io_end[1] - io_start[1] if io_start and io_end else None
+            with self._lock:
+                self._fold_peak()
+                self._active = [other for other in self._active if other is not record]
+                start_memory = record.pop("_start_memory")
+                peak = record.pop("_peak")
+                record["peak_mb"] = (peak - start_memory) / 1024 ** 2 if start_memory is not None else None
+                self.stages.append(record)
+
+    def external(self, kind, target, func, /, *args, **kwargs):
+        """Externen Aufruf (Meteostat, HTTP) ausführen und mit Dauer und Ergebnis protokollieren"""
+        with self._lock:
+            stages = [record["stage"] for record in self._active]
+        entry = {"kind": kind, "target": target, "started": _now(), "stages": stages}
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            entry.update(_describe(result))
+            return result
+        except Exception as e:
+            entry["error"] = repr(e)
+            raise
+        finally:
+            entry["seconds"] = time.perf_counter() - start
+            with self._lock:
+                self.calls.append(entry)
+
+    def wrap(self, name, func):
+        """func so ersetzen, dass jeder Aufruf gemessen wird"""
+        def instrumented(*args, **kwargs):
+            return self.call(name, func, *args, **kwargs)
+        instrumented.__wrapped__ = func
+        return instrumented
+
+    @contextmanager
+    def active(self, module=data_preparation, functions=INSTRUMENTED_FUNCTIONS):
+        """
+        Während des Blocks: Speicher verfolgen, functions in module messen,
+        Meteostat-Abfragen (module.Stations/Daily) und requests-Anfragen protokollieren
+        """
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+
+        original_request = requests.Session.request
+
+        def request(session, method, url, *args, **kwargs):
+            return self.external("http", f"{method} {url}", original_request, session, method, url, *args, **kwargs)
+
+        replaced = {name: getattr(module, name) for name in functions if hasattr(module, name)}
+        replaced.update({name: getattr(module, name) for name in ("Stations", "Daily") if hasattr(module, name)})
+        with ExitStack() as stack:
+            stack.callback(setattr, requests.Session, "request", original_request)
+            for name, original in replaced.items():
+                stack.callback(setattr, module, name, original)
+            if started_tracing:
+                stack.callback(tracemalloc.stop)
+
+            requests.Session.request = request
+            for name, original in replaced.items():
+                if name in ("Stations", "Daily"):
+                    setattr(module, name, _LoggedSource(self, name, original))
+                else:
+                    setattr(module, name, self.wrap(name, original))
+            yield self
+
+    def report(self, **extra):
+        """Laufbericht als dict (Stufen in der Reihenfolge ihres Endes, externe Aufrufe, Zusammenfassung)"""
+        calls = pd.DataFrame(self.calls, columns=["kind", "seconds"])
+        return {
+            "started": self.started,
+            "finished": _now(),
+            "wall_seconds": time.perf_counter() - self._start,
+            "trace_memory": self.trace_memory,
+            "summary": {
+                "stages": len(self.stages),
+                "errors": [record["stage"] for record in self.stages if "error" in record],
+                "slowest": max(self.stages, key=lambda record: record["wall_seconds"])["stage"] if self.stages else None,
+                "external_calls": calls["kind"].value_counts().to_dict(),
+                "external_seconds": calls.groupby("kind")["seconds"].sum().to_dict(),
+            },
+            "stages": self.stages,
+            "external_calls": self.calls,
+            **self.context,
+            **extra,
+        }
+
+    def write_report(self, path=None, **extra):
+        """Laufbericht als JSON speichern (Standard: REPORT_DIR/run-<Zeitstempel>.json), gibt den Pfad zurück"""
+        path = path or os.path.join(REPORT_DIR, f"run-{datetime.now():%Y%m%d-%H%M%S}.json")
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.report(**extra), file, indent=2, default=str)
+        print(f"✅ Laufbericht gespeichert: {path}")
+        return path
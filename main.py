@@ -1,10 +1,100 @@
-# File not in use yet!
-# This is a placeholder for the main entry point of the air-quality pipeline.
-# It will be used to run the pipeline and orchestrate the different components.
+# Main entry point of the air-quality pipeline.
+# Runs the cached stage pipeline (pipeline.py); only stages whose code, parameters or
+# input files changed are executed again.
 
+import argparse
+from data_preparation import files, sync_files
+from incremental import record_digests, update_cleaned
+from instrumentation import Instrumentation
+from model_evaluation import evaluate_models, load_city_features, summarize
+from pipeline import PIPELINE_CACHE_DIR, build_pipeline
+from streaming import MEMORY_BUDGET, stream_cleaning
 
-def main():
-    print("Hello from air-quality!")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Air-quality data pipeline")
+    parser.add_argument("--targets", nargs="+", default=None,
+                        help="Stufen, die berechnet werden sollen (Standard: alle Endstufen)")
+    parser.add_argument("--force", nargs="+", default=[],
+                        help="Stufen, die trotz Cache neu berechnet werden (inkl. Nachfolger)")
+    parser.add_argument("--workers", type=int, default=4, help="parallel laufende Stufen")
+    parser.add_argument("--weather-workers", type=int, default=8, help="parallele Meteostat-Abrufe")
+    parser.add_argument("--csv", action="store_true", help="cleaned_data zusätzlich als CSV speichern")
+    parser.add_argument("--sync", action="store_true", help="Quelldateien vorher aktualisieren")
+    parser.add_argument("--update", action="store_true",
+                        help="nur neue/geänderte Tage in cleaned_data übernehmen (statt der ganzen Pipeline)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Import und Bereinigung Datei für Datei mit begrenztem Speicher")
+    parser.add_argument("--memory-budget", type=int, default=MEMORY_BUDGET // 1024 ** 2,
+                        help="Speicherbudget des Streaming-Modus in MB")
+    parser.add_argument("--evaluate", action="store_true",
+                        help="Klassifikationsmodelle auf allen Kernen vergleichen (Modelle x Merkmale x CV-Folds)")
+    parser.add_argument("--report", nargs="?", const="", default=None, metavar="PATH",
+                        help="Laufbericht (JSON) mit Zeit, Speicher, Zeilen und I/O je Stufe schreiben")
+    parser.add_argument("--profile", default=None, metavar="DIR",
+                        help="zusätzlich je Stufe einen cProfile-Dump in DIR ablegen")
+    parser.add_argument("--data-folder", default="./data/")
+    parser.add_argument("--cache-dir", default=PIPELINE_CACHE_DIR)
+    return parser.parse_args(argv)
+
+
+def _call(instrumentation, name, func, *args, **kwargs):
+    if instrumentation is None:
+        return func(*args, **kwargs)
+    return instrumentation.call(name, func, *args, **kwargs)
+
+
+def run(args, instrumentation=None):
+    changed = None
+    if args.sync or args.update:
+        changed = sync_files(files, args.data_folder)
+        print(f"✅ {len(changed)} Datei(en) aktualisiert")
+
+    if args.update:
+        changed = [file for file in changed if file.startswith('waqi-covid-')]
+        return {"cleaned": _call(instrumentation, "update", update_cleaned, changed, data_folder=args.data_folder)}
+
+    if args.stream:
+        path = _call(instrumentation, "stream", stream_cleaning, data_folder=args.data_folder,
+                     memory_budget=args.memory_budget * 1024 ** 2, max_workers=args.weather_workers)
+        if path is not None:
+            # Stand der Rohdaten merken, damit --update darauf aufsetzen kann
+            _call(instrumentation, "record_digests", record_digests, data_folder=args.data_folder)
+        return {"cleaned": path}
+
+    if args.evaluate:
+        features, version = load_city_features(args.data_folder)
+        metrics = _call(instrumentation, "evaluate", evaluate_models, features, version)
+        print(summarize(metrics).round(3).to_string())
+        return {"evaluation": metrics}
+
+    pipeline = build_pipeline(data_folder=args.data_folder, csv=args.csv,
+                              weather_workers=args.weather_workers, cache_dir=args.cache_dir,
+                              instrumentation=instrumentation)
+    results = pipeline.run(targets=args.targets, force=args.force, max_workers=args.workers)
+    if instrumentation is not None:
+        instrumentation.context["pipeline"] = dict(pipeline.last_run)
+
+    for name, status in pipeline.last_run.items():
+        print(f"{name}: {status}")
+    for name, df in results.items():
+        print(f"✅ {name}: {len(df)} Zeilen")
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.report is None and args.profile is None:
+        return run(args)
+
+    # Laufbericht auch bei Abbruch schreiben, damit die fehlgeschlagene Stufe sichtbar ist
+    instrumentation = Instrumentation(profile_dir=args.profile)
+    instrumentation.context["args"] = vars(args)
+    try:
+        with instrumentation.active():
+            return run(args, instrumentation)
+    finally:
+        instrumentation.write_report(args.report or None)
 
 
 if __name__ == "__main__":
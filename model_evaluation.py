@@ -0,0 +1,141 @@
+import os
+import json
+import hashlib
+import joblib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.base import clone
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from storage import DATA_FOLDER, dataset_version, load_cleaned
+
+# Vergleich der Klassifikationsmodelle aus 5_classification_models.ipynb
+# - Merkmale: Median je Stadt und Schadstoff, nur Städte mit allen Schadstoffen;
+#   Ziel AirQualityLabel = Pm25 über dem Median aller Städte
+# - Raster aus Modellen x Merkmalsmengen x CV-Folds, jede Kombination als eigene Aufgabe im Prozess-Pool
+# - Merkmale, angepasste Modelle und Kennzahlen liegen je Datenstand (storage.dataset_version) in
+#   EVALUATION_DIR; bereits berechnete Kombinationen werden geladen statt neu trainiert
+
+MODEL_POLLUTANTS = ['Co', 'No2', 'O3', 'Pm10', 'Pm25', 'So2']
+EVALUATION_DIR = './data/model_evaluation/'
+
+MODELS = {
+    "logistic_regression": LogisticRegression(max_iter=1000),
+    "random_forest": RandomForestClassifier(n_estimators=100, random_state=42),
+    "gradient_boosting": GradientBoostingClassifier(n_estimators=100, random_state=42),
+}
+
+# Merkmalsmengen aus dem Notebook (features_lr_pm10, features_lr bzw. features_rf)
+FEATURE_SETS = {
+    "mit_pm10": ['Co', 'No2', 'O3', 'Pm10', 'So2'],
+    "ohne_feinstaub": ['Co', 'No2', 'O3', 'So2'],
+}
+
+METRICS = ["accuracy", "precision", "recall", "f1", "roc_auc"]
+
+def city_features(df, pollutants=MODEL_POLLUTANTS):
+    """Median je Stadt und Schadstoff, vollständige Städte, AirQualityLabel = Pm25 > Median"""
+    features = df.groupby('City', observed=True)[list(pollutants)].median().dropna()
+    features['AirQualityLabel'] = (features['Pm25'] > features['Pm25'].median()).astype(int)
+    return features
+
+def load_city_features(data_folder=DATA_FOLDER, evaluation_dir=EVALUATION_DIR):
+    """
+    Merkmale aus cleaned_data, einmal je Datenstand berechnet und als Parquet abgelegt
+    Gibt (Merkmale, Datenstand) zurück.
+    """
+    version = dataset_version("cleaned_data", data_folder)
+    path = os.path.join(evaluation_dir, str(version), "features.parquet")
+    if version is not None and os.path.exists(path):
+        return pd.read_parquet(path), version
+
+    features = city_features(load_cleaned(["City"] + MODEL_POLLUTANTS, data_folder=data_folder))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    features.to_parquet(path)
+    return features, version
+
+def _task_key(model, features, fold, n_splits, random_state):
+    """Schlüssel einer Kombination aus Modellparametern, Merkmalen und Fold"""
+    settings = {"model": type(model).__name__, "params": model.get_params(), "features": list(features),
+                "fold": fold, "n_splits": n_splits, "random_state": random_state}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+def _scores(model, X_test, y_test):
+    y_pred = model.predict(X_test)
+    scores = {
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision_score(y_test, y_pred, zero_division=0),
+        "recall": recall_score(y_test, y_pred, zero_division=0),
+        "f1": f1_score(y_test, y_pred, zero_division=0),
+    }
+    scores["roc_auc"] = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1]) \
+        if len(np.unique(y_test)) > 1 else np.nan
+    return scores
+
+def _fit_task(model, X, y, train, test, path):
+    """Worker: ein Modell auf einem Fold trainieren, bewerten und mit den Kennzahlen speichern"""
+    model = clone(model).fit(X[train], y[train])
+    scores = _scores(model, X[test], y[test])
+    joblib.dump({"model": model, "scores": scores}, path)
+    return scores
+
+def evaluate_models(features, version, models=MODELS, feature_sets=FEATURE_SETS, n_splits=5, random_state=42,
+                    max_workers=None, evaluation_dir=EVALUATION_DIR):
+    """
+    Bewertet jedes Modell mit jeder Merkmalsmenge per StratifiedKFold
+    - alle noch nicht gespeicherten Kombinationen laufen parallel auf max_workers Prozessen
+    - Modelle liegen unter <evaluation_dir>/<version>/models/, die Kennzahlen in metrics.parquet
+    Gibt eine Tabelle mit einer Zeile je Modell, Merkmalsmenge und Fold zurück.
+    """
+    folder = os.path.join(evaluation_dir, str(version))
+    os.makedirs(os.path.join(folder, "models"), exist_ok=True)
+
+    y = features['AirQualityLabel'].to_numpy()
+    folds = list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+                 .split(np.zeros(len(y)), y))
+
+    rows, todo = [], []
+    for model_name, model in models.items():
+        for set_name, columns in feature_sets.items():
+            X = features[columns].to_numpy(dtype=np.float64)
+            for fold, (train, test) in enumerate(folds):
+                key = _task_key(model, columns, fold, n_splits, random_state)
+                path = os.path.join(folder, "models", f"{model_name}-{set_name}-{fold}-{key}.joblib")
+                row = {"model": model_name, "features": set_name, "fold": fold}
+                rows.append(row)
+                if os.path.exists(path):
+                    row.update(joblib.load(path)["scores"])
+                else:
+                    todo.append((row, (model, X, y, train, test, path)))
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(todo)) if todo else 1
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [(row, pool.submit(_fit_task, *args)) for row, args in todo]
+            for row, future in futures:
+                row.update(future.result())
+    else:
+        for row, args in todo:
+            row.update(_fit_task(*args))
+
+    metrics = pd.DataFrame(rows, columns=["model", "features", "fold"] + METRICS)
+    metrics.to_parquet(os.path.join(folder, "metrics.parquet"), index=False)
+    print(f"✅ Modellvergleich: {len(todo)} von {len(rows)} Kombinationen neu trainiert ({folder})")
+    return metrics
+
+def summarize(metrics):
+    """Mittelwert und Standardabweichung der Kennzahlen über die Folds, beste Kombination zuerst"""
+    summary = metrics.groupby(["model", "features"])[METRICS].agg(["mean", "std"])
+    return summary.sort_values(("f1", "mean"), ascending=False)
+
+def load_model(version, model_name, set_name, fold=0, evaluation_dir=EVALUATION_DIR):
+    """Zuletzt gespeichertes Modell einer Kombination laden"""
+    pattern = f"{model_name}-{set_name}-{fold}-"
+    folder = os.path.join(evaluation_dir, str(version), "models")
+    paths = [os.path.join(folder, file) for file in os.listdir(folder) if file.startswith(pattern)]
+    if not paths:
+        raise FileNotFoundError(f"Kein Modell für {model_name}/{set_name}/Fold {fold} in {folder}")
+    return joblib.load(max(paths, key=os.path.getmtime))["model"]
@@ -0,0 +1,423 @@
+import os
+import glob
+import json
+import hashlib
+import inspect
+import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import lru_cache
+from cube import write_cube
+from dashboard_data import build_cubes, write_cubes
+from data_preparation import (FINAL_COLUMNS, OUTLIER_RULES, RESHAPE_COLUMNS, convert_date, finalize, import_raw,
+                              merge_weather, nearest_stations, remove_outliers, reshape_species, station_weather)
+from gazetteer import join_gazetteer, load_gazetteer
+from incremental import DIGEST_FILE, record_digests
+from population import load_population
+from storage import dataset_path, write_dataset
+from trends import run_trends
+from weather_cache import WeatherCache
+
+# Pipeline als DAG aus Stufen (Stages)
+# - jede Stufe hat einen Schlüssel aus Code (inkl. der verwendeten Projektmodule), Parametern,
+#   Eingabedateien (Inhalt) und den Schlüsseln der vorgelagerten Stufen
+# - Ergebnisse werden als Parquet im Cache-Verzeichnis abgelegt; bei gleichem Schlüssel
+#   wird die Stufe nicht erneut ausgeführt, solange die Dateien, die sie schreibt (outputs),
+#   unverändert vorhanden sind
+# - Stufen, deren Eingaben fertig sind, laufen parallel in einem Thread-Pool
+
+PIPELINE_CACHE_DIR = './data/pipeline_cache/'
+# Module in diesem Verzeichnis gehen mit ihrem Quelltext in die Stufenschlüssel ein
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+@dataclass
+class Stage:
+    """Eine Stufe: func(**eingaben, **params) -> DataFrame"""
+    name: str
+    func: object
+    inputs: tuple = ()      # Namen der vorgelagerten Stufen
+    files: tuple = ()       # Eingabedateien oder Glob-Muster
+    params: dict = field(default_factory=dict)
+    outputs: tuple = ()     # Dateien/Verzeichnisse, die die Stufe schreibt (fehlen oder geändert: Stufe läuft neu)
+    cache: bool = True      # False: Ergebnis nicht im Cache ablegen, bei Bedarf neu ausführen
+
+def _path_signature(path):
+    """Größe und Änderungszeit einer Datei bzw. aller Dateien eines Verzeichnisses, None wenn nicht vorhanden"""
+    if not os.path.exists(path):
+        return None
+    if os.path.isfile(path):
+        files = [path]
+    else:
+        files = sorted(os.path.join(root, file) for root, _, names in os.walk(path) for file in names)
+
+    sha = hashlib.sha256()
+    for file_path in files:
+        stat = os.stat(file_path)
+        sha.update(f"{os.path.relpath(file_path, path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return sha.hexdigest()[:16]
+
+def _stable_json(value):
+    return json.dumps(value, sort_keys=True, default=str)
+
+def _project_module(value):
+    """Modul von value, falls es eine Datei dieses Projekts ist (keine Bibliothek), sonst None"""
+    module = value if inspect.ismodule(value) else inspect.getmodule(value)
+    path = getattr(module, "__file__", None)
+    if path and os.path.dirname(os.path.abspath(path)) == PROJECT_DIR:
+        return module
+    return None
+
+def _code_names(code):
+    """Globale Namen, die ein Code-Objekt (inkl. innerer Funktionen) verwendet"""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _code_names(const)
+    return names
+
+def _module_dependencies(func):
+    """
+    Projektmodule, deren Code func aufruft: die Module der verwendeten Funktionen/Klassen
+    und transitiv alles, was diese Module aus dem Projekt importieren
+    """
+    namespace = getattr(func, "__globals__", {})
+    code = getattr(func, "__code__", None)
+    todo = [namespace[name] for name in (_code_names(code) if code else ()) if name in namespace]
+    modules = {}
+    while todo:
+        module = _project_module(todo.pop())
+        if module is None or module.__name__ in modules:
+            continue
+        modules[module.__name__] = module
+        todo.extend(vars(module).values())
+    return modules
+
+@lru_cache(maxsize=None)
+def _file_digest(path, mtime_ns):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def _source_hash(func):
+    """
+    Hash des Quelltexts von func und der verwendeten Projektmodule (z. B. data_preparation.py, storage.py),
+    damit Codeänderungen auch in aufgerufenen Funktionen den Cache ungültig machen
+    """
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = getattr(func, "__qualname__", repr(func))
+
+    sha = hashlib.sha256(source.encode("utf-8"))
+    for name, module in sorted(_module_dependencies(func).items()):
+        sha.update(f"{name}:{_file_digest(module.__file__, os.stat(module.__file__).st_mtime_ns)}\n".encode())
+    return sha.hexdigest()
+
+class Pipeline:
+    """DAG von Stages mit inhaltsbasiertem Cache"""
+
+    def __init__(self, stages, cache_dir=PIPELINE_CACHE_DIR, instrumentation=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cache_dir = cache_dir
+        # optional instrumentation.Instrumentation: misst jede ausgeführte Stufe
+        self.instrumentation = instrumentation
+        self.last_run = {}
+        self._order = self._topological_order()
+
+    def _topological_order(self):
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Zyklus in der Pipeline: {' -> '.join(path + [name])}")
+            if name not in self.stages:
+                raise KeyError(f"Unbekannte Stufe: {name}")
+            state[name] = "visiting"
+            for dependency in self.stages[name].inputs:
+                visit(dependency, path + [name])
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    # --- Schlüssel -------------------------------------------------------------------
+
+    def _fingerprints_path(self):
+        return os.path.join(self.cache_dir, "file_hashes.json")
+
+    def _file_hash(self, path, fingerprints):
+        """SHA-256 des Dateiinhalts; neu berechnet nur, wenn sich Größe oder Änderungszeit ändern"""
+        stat = os.stat(path)
+        known = fingerprints.get(path)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                sha.update(chunk)
+        fingerprints[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha.hexdigest()}
+        return fingerprints[path]["sha256"]
+
+    def _stage_files(self, stage):
+        paths = []
+        for pattern in stage.files:
+            paths.extend(sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern])
+        return paths
+
+    def stage_keys(self):
+        """Schlüssel aller Stufen (Merkle-artig über die vorgelagerten Schlüssel)"""
+        try:
+            with open(self._fingerprints_path(), 'r', encoding='utf-8') as file:
+                fingerprints = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            fingerprints = {}
+
+        keys = {}
+        for name in self._order:
+            stage = self.stages[name]
+            files = {path: self._file_hash(path, fingerprints) if os.path.exists(path) else None
+                     for path in self._stage_files(stage)}
+            payload = {
+                "name": name,
+                "code": _source_hash(stage.func),
+                "params": stage.params,
+                "files": files,
+                "inputs": {dependency: keys[dependency] for dependency in stage.inputs},
+            }
+            keys[name] = hashlib.sha256(_stable_json(payload).encode("utf-8")).hexdigest()[:20]
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self._fingerprints_path(), 'w', encoding='utf-8') as file:
+            json.dump(fingerprints, file, indent=2, sort_keys=True)
+        return keys
+
+    # --- Cache -----------------------------------------------------------------------
+
+    def _output_path(self, name, key):
+        return os.path.join(self.cache_dir, f"{name}-{key}.parquet")
+
+    def _outputs_path(self, name, key):
+        return os.path.join(self.cache_dir, f"{name}-{key}.outputs.json")
+
+    def _store(self, name, key, df):
+        # ältere Ergebnisse derselben Stufe entfernen
+        for old in glob.glob(os.path.join(self.cache_dir, f"{name}-*.parquet")) + \
+                glob.glob(os.path.join(self.cache_dir, f"{name}-*.outputs.json")):
+            os.remove(old)
+        df.to_parquet(self._output_path(name, key), engine="pyarrow", index=False)
+        # Stand der geschriebenen Dateien merken
+        with open(self._outputs_path(name, key), 'w', encoding='utf-8') as file:
+            json.dump({path: _path_signature(path) for path in self.stages[name].outputs}, file, indent=2)
+
+    def _is_cached(self, name, key):
+        """Ergebnis im Cache und alle outputs der Stufe unverändert vorhanden"""
+        stage = self.stages[name]
+        if not stage.cache or not os.path.exists(self._output_path(name, key)):
+            return False
+        if not stage.outputs:
+            return True
+        try:
+            with open(self._outputs_path(name, key), 'r', encoding='utf-8') as file:
+                recorded = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        return all(recorded.get(path) is not None and recorded.get(path) == _path_signature(path)
+                   for path in stage.outputs)
+
+    def _load(self, name, key):
+        return pd.read_parquet(self._output_path(name, key), engine="pyarrow")
+
+    def _run_stage(self, name, inputs):
+        stage = self.stages[name]
+        if self.instrumentation is not None:
+            return self.instrumentation.call(name, stage.func, **inputs, **stage.params)
+        return stage.func(**inputs, **stage.params)
+
+    # --- Ausführung ------------------------------------------------------------------
+
+    def run(self, targets=None, force=(), max_workers=4):
+        """
+        Führt die Pipeline aus und gibt {Stufe: DataFrame} für die Ziel-Stufen zurück
+        - targets: gewünschte Stufen (Standard: alle ohne Nachfolger)
+        - force: Stufen, die trotz Cache neu laufen (ihre Nachfolger dann auch)
+        """
+        if targets is None:
+            downstream = {dependency for stage in self.stages.values() for dependency in stage.inputs}
+            targets = [name for name in self._order if name not in downstream]
+
+        # benötigte Stufen (Ziele und ihre Vorgänger)
+        needed, todo = set(), list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in needed:
+                needed.add(name)
+                todo.extend(self.stages[name].inputs)
+        order = [name for name in self._order if name in needed]
+
+        # force gilt auch für alle Nachfolger der erzwungenen Stufen
+        forced = set(force)
+        for name in order:
+            if any(dependency in forced for dependency in self.stages[name].inputs):
+                forced.add(name)
+
+        keys = self.stage_keys()
+        # rückwärts: Stufen ohne Cache laufen nur, wenn ein Ziel oder eine ausgeführte Stufe sie braucht
+        execute = set()
+        for name in reversed(order):
+            stage = self.stages[name]
+            if stage.cache:
+                stale = name in forced or not self._is_cached(name, keys[name])
+            else:
+                stale = name in targets or any(name in self.stages[other].inputs for other in execute)
+            if stale:
+                execute.add(name)
+
+        # zu ladende Ergebnisse: Ziele und Eingaben der auszuführenden Stufen
+        required = set(targets) | {dependency for name in execute for dependency in self.stages[name].inputs}
+        load = [name for name in order if name in required and name not in execute]
+
+        self.last_run = {name: "cached" for name in order}
+        results = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            running = {}
+            for name in load:
+                running[pool.submit(self._load, name, keys[name])] = name
+            pending = [name for name in order if name in execute]
+
+            while pending or running:
+                for name in list(pending):
+                    if all(dependency in results for dependency in self.stages[name].inputs):
+                        inputs = {dependency: results[dependency] for dependency in self.stages[name].inputs}
+                        print(f"▶️ Stufe {name}")
+                        running[pool.submit(self._run_stage, name, inputs)] = name
+                        pending.remove(name)
+
+                if not running:
+                    raise RuntimeError(f"Stufen können nicht ausgeführt werden: {', '.join(pending)}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+                    if name in execute:
+                        if self.stages[name].cache:
+                            self._store(name, keys[name], results[name])
+                        self.last_run[name] = "ran"
+                    else:
+                        self.last_run[name] = "loaded"
+                        print(f"⏭️ Stufe {name} aus dem Cache")
+
+        return {name: results[name] for name in targets}
+
+# --- Stufen der Luftqualitäts-Pipeline -------------------------------------------------
+
+def _raw(data_folder):
+    # unveränderte Dateien kommen aus raw_data.parquet, nur die Spalten für reshape_species;
+    # Source (Dateiname) bleibt für die Hashes von incremental erhalten
+    file_paths = sorted(glob.glob(os.path.join(data_folder, "waqi-covid-*.csv")))
+    return import_raw(file_paths, data_folder, RESHAPE_COLUMNS)
+
+def _reshaped(raw):
+    df = reshape_species(raw)
+    df["City"] = df["City"].str.lower().str.strip()
+    return df
+
+def _cities(reshaped, data_folder):
+    cities = reshaped[["Country", "City"]].drop_duplicates().reset_index(drop=True)
+    gazetteer = load_gazetteer(os.path.join(data_folder, "airquality-covid19-cities.json"),
+                               os.path.join(data_folder, "gazetteer.parquet"))
+    cities, report = join_gazetteer(cities, gazetteer)
+    print(f"Geodaten: {report['matched']} von {report['rows']} Städten zugeordnet")
+    return cities
+
+def _stations(cities):
+    cities = cities[["Country", "City", "Latitude", "Longitude"]].drop_duplicates(subset=["Country", "City"])
+    return nearest_stations(cities)
+
+def _weather(stations, max_workers, cache_dir):
+    return station_weather(stations, max_workers=max_workers, cache=WeatherCache(cache_dir))
+
+def _population(reshaped, data_folder):
+    pairs = pd.DataFrame({
+        "City": reshaped["City"].str.capitalize(),
+        "Year": reshaped["Date"].dt.year.astype(int),
+    }).drop_duplicates().reset_index(drop=True)
+    pairs["Population"] = load_population(os.path.join(data_folder, "population.csv")).lookup(pairs["City"], pairs["Year"])
+    return pairs
+
+def _merged(reshaped, cities, stations, weather, population):
+    df = reshaped.merge(cities, on=["Country", "City"], how="left")
+    df = merge_weather(df, stations, weather)
+    df = convert_date(df)
+    df["City"] = df["City"].str.capitalize()
+    df.columns = df.columns.str.capitalize()
+    return df.merge(population, on=["City", "Year"], how="left")
+
+def _cleaned(merged, raw, rules, columns, csv, data_folder):
+    # Regeln als Liste von Datensätzen, damit sie in den Stufenschlüssel eingehen
+    df, replaced = remove_outliers(merged, pd.DataFrame.from_records(rules))
+    print(f"✅ Ausreißer ersetzt: {int(replaced.sum())} Werte")
+    df = finalize(df, columns)
+
+    write_dataset(df, "cleaned_data", data_folder=data_folder, csv=csv)
+    # Stand der Rohdaten merken, damit main.py --update darauf aufsetzen kann
+    record_digests(data_folder=data_folder, raw=raw)
+    return df
+
+def _dashboard(cleaned, cube_folder):
+    cubes = build_cubes(cleaned)
+    write_cubes(cubes, cube_folder)
+    return cubes.monthly
+
+def _cube(cleaned, folder):
+    return write_cube(cleaned, folder)
+
+def _trends(dashboard, path, max_workers):
+    return run_trends(dashboard, path=path, max_workers=max_workers)
+
+def build_pipeline(data_folder='./data/', columns=None, csv=False, weather_workers=8, cache_dir=PIPELINE_CACHE_DIR,
+                   instrumentation=None, weather_cache_dir=None):
+    """
+    Die Schritte aus data_cleaning als DAG:
+    raw -> reshaped -> cities -> stations -> weather -+
+                    -> population --------------------+-> merged -> cleaned -> dashboard -> trends
+                                                                           -> cube
+    cleaned ersetzt Ausreißer laut OUTLIER_RULES, eine Regeländerung wiederholt nur cleaned und die Folgestufen;
+    außerdem merkt sich cleaned die Hashes der Rohdaten (raw) für incremental.update_cleaned
+    weather_cache_dir: Verzeichnis des WeatherCache (Standard: weather_cache/ im data_folder)
+    """
+    weather_cache_dir = weather_cache_dir or os.path.join(data_folder, "weather_cache")
+    return Pipeline([
+        # raw liegt schon als raw_data.parquet vor (import_raw), keine zweite Kopie im Cache
+        Stage("raw", _raw, files=(os.path.join(data_folder, "waqi-covid-*.csv"),),
+              params={"data_folder": data_folder}, cache=False),
+        Stage("reshaped", _reshaped, inputs=("raw",)),
+        Stage("cities", _cities, inputs=("reshaped",),
+              files=(os.path.join(data_folder, "airquality-covid19-cities.json"),),
+              params={"data_folder": data_folder}),
+        Stage("stations", _stations, inputs=("cities",)),
+        Stage("weather", _weather, inputs=("stations",),
+              params={"max_workers": weather_workers, "cache_dir": weather_cache_dir}),
+        Stage("population", _population, inputs=("reshaped",),
+              files=(os.path.join(data_folder, "population.csv"),),
+              params={"data_folder": data_folder}),
+        Stage("merged", _merged, inputs=("reshaped", "cities", "stations", "weather", "population")),
+        Stage("cleaned", _cleaned, inputs=("merged", "raw"),
+              params={"rules": OUTLIER_RULES.to_dict("records"), "columns": list(columns or FINAL_COLUMNS),
+                      "csv": csv, "data_folder": data_folder},
+              outputs=(dataset_path("cleaned_data", data_folder), os.path.join(data_folder, DIGEST_FILE))
+              + ((os.path.join(data_folder, "cleaned_data.csv"),) if csv else ())),
+        Stage("dashboard", _dashboard, inputs=("cleaned",),
+              params={"cube_folder": os.path.join(data_folder, "dashboard")},
+              outputs=(os.path.join(data_folder, "dashboard"),)),
+        Stage("cube", _cube, inputs=("cleaned",), params={"folder": os.path.join(data_folder, "cube")},
+              outputs=(os.path.join(data_folder, "cube"),)),
+        Stage("trends", _trends, inputs=("dashboard",),
+              params={"path": os.path.join(data_folder, "trends.parquet"), "max_workers": None},
+              outputs=(os.path.join(data_folder, "trends.parquet"),)),
+    ], cache_dir=cache_dir, instrumentation=instrumentation)
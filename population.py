@@ -0,0 +1,85 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Einwohnerzahlen aus der UN-Tabelle (population.csv) als kompakte Jahres-Arrays je Stadt.
+# Abfragen laufen vektorisiert über alle (Stadt, Jahr)-Paare: genommen wird das letzte
+# Jahr <= Abfragejahr, sonst das erste Jahr danach (wie ffill + bfill je Stadt).
+
+POPULATION_CSV = './data/population.csv'
+
+# Jahre werden mit der Stadt in einen Schlüssel gepackt: Stadt-Code * YEAR_SPAN + Jahr
+YEAR_SPAN = 10000
+
+# bereits geladene Tabellen je (Pfad, Änderungszeit)
+_loaded = {}
+
+class PopulationLookup:
+    """Sortierte (Stadt, Jahr) -> Einwohner-Arrays mit Suche nach dem nächstgelegenen Jahr"""
+
+    def __init__(self, cities, years, values):
+        cities = pd.Series(cities, dtype=object).reset_index(drop=True)
+        years = np.asarray(years, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+
+        city_codes, self.cities = pd.factorize(cities, sort=True)
+        keys = city_codes * YEAR_SPAN + years
+        order = np.argsort(keys, kind="stable")
+
+        # je (Stadt, Jahr) nur ein Wert: der erste in Dateireihenfolge
+        keys, values = keys[order], values[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        self._keys = keys[first]
+        self._values = values[first]
+
+    def __len__(self):
+        return len(self.cities)
+
+    def lookup(self, cities, years):
+        """Einwohner je (Stadt, Jahr), NaN wenn die Stadt unbekannt ist"""
+        city_codes = self.cities.get_indexer(pd.Index(cities, dtype=object))
+        years = np.asarray(years, dtype=np.int64)
+        result = np.full(len(city_codes), np.nan)
+
+        known = city_codes >= 0
+        if not known.any() or not len(self._keys):
+            return result
+
+        codes = city_codes[known]
+        query = codes * YEAR_SPAN + years[known]
+
+        # letztes Jahr <= Abfragejahr
+        before = np.searchsorted(self._keys, query, side="right") - 1
+        before_ok = (before >= 0) & (self._keys[np.maximum(before, 0)] // YEAR_SPAN == codes)
+        # sonst erstes Jahr danach
+        after = np.minimum(before + 1, len(self._keys) - 1)
+        after_ok = self._keys[after] // YEAR_SPAN == codes
+
+        position = np.where(before_ok, np.maximum(before, 0), after)
+        result[known] = np.where(before_ok | after_ok, self._values[position], np.nan)
+        return result
+
+def load_population(path=POPULATION_CSV):
+    """Liest die UN-Tabelle einmal (nur City, Year, Value) und baut den PopulationLookup"""
+    exists = os.path.exists(path)
+    key = (path, os.path.getmtime(path) if exists else None)
+    if exists and key in _loaded:
+        return _loaded[key]
+
+    df_population = pd.read_csv(
+                    path,
+                    sep=',',
+                    header=0,
+                    usecols=lambda col: col in ('City', 'Value', 'Year'),
+                    on_bad_lines='skip',  # Methode zum Überspringen von fehlerhaften Zeilen
+                    encoding='utf-8')  # Falls Sonderzeichen vorhanden sind
+
+    df_population = df_population[['City', 'Value', 'Year']].dropna()
+    lookup = PopulationLookup(df_population['City'],
+                              df_population['Year'].astype(int),
+                              df_population['Value'].astype(int))
+
+    if exists:
+        _loaded[key] = lookup
+    return lookup
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+from features import TARGET
+
+# Lineare Regression PM2.5 ~ Wetter je Stadt, für alle Städte in einer Rechnung statt sm.OLS je Stadt
+# - Zeilen nach Stadt sortiert, Summen je Stadt per np.add.reduceat
+# - Normalgleichungen je Stadt auf zentrierten Daten (besser konditioniert), gelöst als Stapel von p x p Systemen
+# - Ergebnis wie statsmodels OLS mit Konstante: Koeffizienten, Standardfehler, t, p, R² je Stadt
+# Die Spezifikationen entsprechen den Modellen aus 3_feature_engineering.ipynb.
+
+SPECIFICATIONS = {
+    "ols": ['Tavg', 'Humidity', 'Prcp', 'Wspd', 'Pres'],
+    "reduced": ['Tavg', 'Humidity', 'Prcp', 'Wspd'],
+    "log": ['Tavg', 'Humidity', 'Log_Prcp', 'Wspd'],
+    "quad": ['Tavg', 'Tavg_squared', 'Humidity', 'Log_Prcp', 'Wspd'],
+    "split": ['Tavg', 'Tavg_squared', 'Humidity_low', 'Humidity_high', 'Log_Prcp', 'Wspd'],
+    "inter": ['Tavg', 'Tavg_squared', 'Humidity_low', 'Humidity_high', 'Log_Prcp', 'Wspd', 'Tavg_Humidity'],
+    "season": ['Tavg', 'Tavg_squared', 'Humidity', 'Log_Prcp', 'Wspd', 'Herbst', 'Sommer', 'Winter'],
+    "final": ['Tavg', 'Tavg_squared', 'Humidity', 'Log_Prcp', 'Wspd', 'No2', 'O3', 'So2', 'Herbst', 'Sommer', 'Winter'],
+}
+
+RESULT_COLUMNS = ["City", "Term", "Coef", "StdErr", "T", "PValue", "R2", "AdjR2", "NObs"]
+
+def _group_sums(values, starts):
+    """Spaltensummen je Gruppe (Zeilen nach Gruppe sortiert, starts = erste Zeile je Gruppe)"""
+    return np.add.reduceat(values, starts, axis=0)
+
+def fit_cities(features, regressors, target=TARGET, min_obs=None):
+    """
+    OLS target ~ const + regressors getrennt für jede Stadt
+    - Zeilen mit fehlenden Werten fallen weg (wie dropna im Notebook)
+    - Städte mit weniger als min_obs Zeilen (Standard: Anzahl Parameter + 1) oder singulärer Matrix fehlen
+    Gibt eine Tabelle mit einer Zeile je Stadt und Term (const zuerst) zurück.
+    """
+    regressors = list(regressors)
+    p = len(regressors)
+    min_obs = max(min_obs or 0, p + 2)
+
+    data = features[["City", target] + regressors]
+    data = data[data[[target] + regressors].notna().all(axis=1)]
+    codes, cities = pd.factorize(data["City"], sort=True)
+    if len(data) == 0:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    X = data[regressors].to_numpy(dtype=np.float64)[order]
+    y = data[target].to_numpy(dtype=np.float64)[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    group_cities = np.asarray(cities)[codes[starts]]
+    n = np.diff(np.r_[starts, len(codes)])
+
+    # je Stadt zentrieren
+    x_mean = _group_sums(X, starts) / n[:, None]
+    y_mean = _group_sums(y, starts) / n
+    row_group = np.repeat(np.arange(len(starts)), n)
+    Xc = X - x_mean[row_group]
+    yc = y - y_mean[row_group]
+
+    # Normalgleichungen je Stadt: Sxx (G x p x p), Sxy (G x p), Syy (G)
+    Sxx = np.stack([_group_sums(Xc[:, [i]] * Xc, starts) for i in range(p)], axis=1)
+    Sxy = _group_sums(Xc * yc[:, None], starts)
+    Syy = _group_sums(yc * yc, starts)
+
+    # nur Städte mit genug Zeilen und vollem Rang
+    ok = (n >= min_obs) & (np.linalg.matrix_rank(Sxx) == p) & (Syy > 0)
+    if not ok.any():
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    Sxx, Sxy, Syy, n, x_mean, y_mean = Sxx[ok], Sxy[ok], Syy[ok], n[ok], x_mean[ok], y_mean[ok]
+    group_cities = group_cities[ok]
+
+    Sxx_inv = np.linalg.inv(Sxx)
+    beta = np.einsum("gij,gj->gi", Sxx_inv, Sxy)
+    intercept = y_mean - np.einsum("gi,gi->g", x_mean, beta)
+
+    dof = n - p - 1
+    rss = np.maximum(Syy - np.einsum("gi,gi->g", beta, Sxy), 0)
+    sigma2 = rss / dof
+    se_beta = np.sqrt(np.diagonal(Sxx_inv, axis1=1, axis2=2) * sigma2[:, None])
+    se_intercept = np.sqrt(sigma2 * (1 / n + np.einsum("gi,gij,gj->g", x_mean, Sxx_inv, x_mean)))
+    r2 = 1 - rss / Syy
+    adj_r2 = 1 - (1 - r2) * (n - 1) / dof
+
+    coef = np.column_stack([intercept, beta])
+    se = np.column_stack([se_intercept, se_beta])
+    t = coef / se
+    p_value = 2 * stats.t.sf(np.abs(t), dof[:, None])
+
+    terms = ["const"] + regressors
+    k = len(terms)
+    return pd.DataFrame({
+        "City": np.repeat(group_cities, k),
+        "Term": np.tile(terms, len(group_cities)),
+        "Coef": coef.ravel(),
+        "StdErr": se.ravel(),
+        "T": t.ravel(),
+        "PValue": p_value.ravel(),
+        "R2": np.repeat(r2, k),
+        "AdjR2": np.repeat(adj_r2, k),
+        "NObs": np.repeat(n, k),
+    })
+
+def fit_specifications(features, specifications=SPECIFICATIONS, target=TARGET, min_obs=None):
+    """Alle Spezifikationen für alle Städte, Spalte Model mit dem Namen der Spezifikation"""
+    frames = [fit_cities(features, regressors, target, min_obs).assign(Model=name)
+              for name, regressors in specifications.items()]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=["Model"] + RESULT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[["Model"] + RESULT_COLUMNS]
+
+def compare_effects(results, term, model="final"):
+    """Koeffizient eines Terms über alle Städte (z. B. Wspd), sortiert nach Wirkung"""
+    effects = results[(results["Model"] == model) & (results["Term"] == term)]
+    return effects.drop(columns=["Model", "Term"]).sort_values("Coef").reset_index(drop=True)
@@ -0,0 +1,156 @@
+import os
+import hashlib
+import shutil
+import pandas as pd
+
+# Ablage der Pipeline-Daten als Parquet, partitioniert nach Jahr und Land.
+# Gelesen wird mit Spaltenauswahl (columns) und Filtern (filters), die pyarrow
+# bis auf Partitionen und Row Groups herunterreicht.
+
+DATA_FOLDER = './data/'
+PARTITION_COLS = ["Year", "Country"]
+
+def dataset_path(name, data_folder=DATA_FOLDER):
+    """Verzeichnis des Datensatzes, z. B. ./data/cleaned_data.parquet"""
+    return os.path.join(data_folder, f"{name}.parquet")
+
+def _with_partition_columns(df, partition_cols):
+    """Ergänzt 'Year' aus 'Date', falls der Datensatz (z. B. Rohdaten) noch kein Jahr hat"""
+    if "Year" in partition_cols and "Year" not in df.columns and "Date" in df.columns:
+        df = df.assign(Year=pd.to_datetime(df["Date"]).dt.year)
+    return df
+
+def write_dataset(df, name, data_folder=DATA_FOLDER, partition_cols=PARTITION_COLS, csv=False, overwrite=True):
+    """
+    Speichert df als partitioniertes Parquet-Verzeichnis
+    - Partitionen nach Jahr und Land (fehlende Partitionsspalten werden übersprungen)
+    - innerhalb der Partition nach Stadt sortiert, damit Filter auf City ganze Row Groups überspringen
+    - overwrite=False ersetzt nur die in df enthaltenen Partitionen
+    - csv=True schreibt zusätzlich <name>.csv wie bisher
+    """
+    df = _with_partition_columns(df, partition_cols)
+    partition_cols = [col for col in partition_cols if col in df.columns]
+    path = dataset_path(name, data_folder)
+
+    if overwrite and os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(data_folder, exist_ok=True)
+
+    sort_cols = [col for col in ["City", "Date", "Month", "Day"] if col in df.columns]
+    if sort_cols:
+        df = df.sort_values(sort_cols, kind="stable")
+
+    df.to_parquet(path, engine="pyarrow", index=False, partition_cols=partition_cols or None,
+                  existing_data_behavior="delete_matching")
+    print(f"✅ Datei wurde gespeichert: {path}")
+
+    if csv:
+        csv_path = os.path.join(data_folder, f"{name}.csv")
+        df.to_csv(csv_path, index=False)
+        print(f"✅ Datei wurde gespeichert: {csv_path}")
+
+    return path
+
+def read_dataset(name, columns=None, filters=None, data_folder=DATA_FOLDER):
+    """
+    Liest einen Parquet-Datensatz
+    - columns: nur diese Spalten lesen
+    - filters: pyarrow-Filter, z. B. [("City", "in", ["Hamburg", "Atlanta"]), ("Year", ">=", 2020)]
+    """
+    df = pd.read_parquet(dataset_path(name, data_folder), engine="pyarrow", columns=columns, filters=filters)
+
+    # Partitionsspalten kommen als Kategorien zurück, das Jahr wieder als Zahl
+    if "Year" in df.columns and isinstance(df["Year"].dtype, pd.CategoricalDtype):
+        df["Year"] = df["Year"].astype(df["Year"].cat.categories.dtype)
+
+    return df
+
+def dataset_version(name, data_folder=DATA_FOLDER):
+    """
+    Datenstand eines Datensatzes ohne ihn zu lesen: Hash über Pfad, Größe und Änderungszeit aller Dateien
+    None, falls der Datensatz nicht existiert
+    """
+    path = dataset_path(name, data_folder)
+    if not os.path.exists(path):
+        return None
+
+    sha = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for file in sorted(files):
+            file_path = os.path.join(root, file)
+            stat = os.stat(file_path)
+            sha.update(f"{os.path.relpath(file_path, path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return sha.hexdigest()[:16]
+
+def load_cleaned(columns=None, cities=None, countries=None, years=None, data_folder=DATA_FOLDER):
+    """
+    Lädt den bereinigten Datensatz, nur die gewünschten Spalten, Städte, Länder und Jahre.
+    Beispiel: load_cleaned(["Year", "Month", "Day", "City", "Pm25"], cities=["Hamburg", "Atlanta"])
+    """
+    filters = []
+    if cities is not None:
+        filters.append(("City", "in", list(cities)))
+    if countries is not None:
+        filters.append(("Country", "in", list(countries)))
+    if years is not None:
+        filters.append(("Year", "in", [int(year) for year in years]))
+
+    return read_dataset("cleaned_data", columns=columns, filters=filters or None, data_folder=data_folder)
+
+def _concat(frames):
+    """concat ohne leere Teile (die sonst die Spaltentypen verändern)"""
+    non_empty = [frame for frame in frames if not frame.empty]
+    return pd.concat(non_empty, ignore_index=True) if non_empty else frames[0].iloc[:0]
+
+def _key_index(df, key_cols):
+    return pd.MultiIndex.from_frame(df[key_cols].astype(object))
+
+def upsert_dataset(df, name, key_cols, remove=None, data_folder=DATA_FOLDER, partition_cols=PARTITION_COLS):
+    """
+    Fügt df in einen bestehenden Datensatz ein, vorhandene Zeilen mit gleichem Schlüssel werden ersetzt
+    - gelesen und neu geschrieben werden nur die betroffenen Partitionen (Jahr/Land)
+    - remove: weitere Schlüssel (DataFrame mit key_cols), deren Zeilen gelöscht werden
+    - Spalten werden an den bestehenden Datensatz angepasst
+    Gibt (eingefügte Zeilen, ersetzte/gelöschte Zeilen) zurück.
+    """
+    df = _with_partition_columns(df, partition_cols)
+    remove = df[key_cols].iloc[:0] if remove is None else remove
+    path = dataset_path(name, data_folder)
+
+    if not os.path.exists(path):
+        write_dataset(df, name, data_folder=data_folder, partition_cols=partition_cols)
+        return len(df), 0
+
+    partition_cols = [col for col in partition_cols if col in df.columns and col in remove.columns]
+    touched = _concat([df[partition_cols], remove[partition_cols]]).drop_duplicates()
+    if touched.empty:
+        return 0, 0
+
+    # je Partition ein Filter (Jahr = y und Land = c)
+    filters = [[(col, "=", value.item() if hasattr(value, "item") else value) for col, value in zip(partition_cols, row)]
+               for row in touched.itertuples(index=False)]
+    existing = read_dataset(name, filters=filters, data_folder=data_folder)
+    for col in partition_cols:
+        if isinstance(existing[col].dtype, pd.CategoricalDtype):
+            existing[col] = existing[col].astype(object)
+
+    replaced = _key_index(existing, key_cols).isin(_key_index(_concat([df[key_cols], remove[key_cols]]), key_cols))
+    df = df.reindex(columns=existing.columns)
+    merged = _concat([existing[~replaced], df])
+
+    write_dataset(merged, name, data_folder=data_folder, partition_cols=partition_cols, overwrite=False)
+
+    # Partitionen, die komplett gelöscht wurden, überschreibt write_dataset nicht
+    remaining = set(merged[partition_cols].drop_duplicates().itertuples(index=False, name=None))
+    for row in touched.itertuples(index=False, name=None):
+        if row not in remaining:
+            partition = os.path.join(path, *[f"{col}={value}" for col, value in zip(partition_cols, row)])
+            shutil.rmtree(partition, ignore_errors=True)
+            # leere übergeordnete Verzeichnisse (z. B. Year=2019) ebenfalls entfernen
+            parent = os.path.dirname(partition)
+            while os.path.normpath(parent) != os.path.normpath(path) and os.path.isdir(parent) and not os.listdir(parent):
+                os.rmdir(parent)
+                parent = os.path.dirname(parent)
+
+    return len(df), int(replaced.sum())
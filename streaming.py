@@ -0,0 +1,227 @@
+import os
+import glob
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from data_preparation import (FINAL_COLUMNS, SPECIES_COLUMNS, aggregate_species, convert_date, geo_data, iter_raw_file,
+                              merge_weather, nearest_stations, population_data, remove_outliers, species_means,
+                              station_weather)
+from storage import DATA_FOLDER, dataset_path, write_dataset
+from weather_cache import WeatherCache
+
+# Streaming-Modus für Import und Bereinigung mit begrenztem Speicher
+# Durchgang 1: jede Datei wird blockweise gelesen; je Block entstehen Teilaggregate
+#   (Summe und Anzahl der Mediane je Datum/Land/Stadt/Specie), abgelegt als Parquet je Jahr
+# Durchgang 2: je Jahr werden die Teilaggregate addiert, zu Mittelwerten gemacht,
+#   angereichert (Geo, Wetter, Einwohner) und als Partitionen von cleaned_data geschrieben
+# Im Speicher liegen damit höchstens ein Block Rohdaten bzw. ein Jahr Aggregate, nie die
+# ganze Historie. Spalten mit mehr als 90% NaN werden wie in finalize über alle Jahre bestimmt.
+
+MEMORY_BUDGET = 256 * 1024 ** 2
+# grobe Schätzung je Rohdatenzeile beim Einlesen (Parser-Puffer, Strings vor den Kategorien)
+ROW_BYTES = 512
+# Anteil des Budgets für die Hashes der bereits gelesenen Zeilen (Duplikatprüfung), der Rest für die Blöcke
+SEEN_SHARE = 0.25
+PARTIALS_FOLDER = "stream_partials"
+
+def chunk_rows(memory_budget=MEMORY_BUDGET):
+    """Zeilen je Block, so dass ein Block samt Aggregation ins Budget passt"""
+    return max(1000, int(memory_budget // ROW_BYTES))
+
+def _contains(sorted_hashes, hashes):
+    """Welche hashes in sorted_hashes (sortiert, auch memmap) vorkommen, per Binärsuche"""
+    if len(sorted_hashes) == 0 or len(hashes) == 0:
+        return np.zeros(len(hashes), dtype=bool)
+    position = np.minimum(np.searchsorted(sorted_hashes, hashes), len(sorted_hashes) - 1)
+    return np.asarray(sorted_hashes[position]) == hashes
+
+class SeenRows:
+    """
+    64-Bit-Hashes der bereits gelesenen Zeilen einer Datei, für drop_duplicates über die ganze Datei
+    - im Speicher als sortiertes Array, höchstens max_bytes (Teil des Speicherbudgets)
+    - darüber hinaus als sortierte Läufe (.npy) in spill_dir, geprüft per Binärsuche auf memmaps
+    """
+
+    def __init__(self, spill_dir, max_bytes):
+        self.spill_dir = spill_dir
+        self.max_bytes = max_bytes
+        self.memory = np.empty(0, dtype=np.uint64)
+        self.runs = []
+
+    def first_seen(self, df):
+        """Maske der Zeilen von df, die weder früher in df noch in einem früheren Block vorkamen"""
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        unique, first = np.unique(hashes, return_index=True)
+        new = ~_contains(self.memory, unique)
+        for run in self.runs:
+            new &= ~_contains(run, unique)
+        unique, first = unique[new], first[new]
+
+        # beide Arrays sind sortiert: Einfügen an der passenden Stelle hält self.memory sortiert
+        self.memory = np.insert(self.memory, np.searchsorted(self.memory, unique), unique)
+        if self.memory.nbytes > self.max_bytes:
+            self._spill()
+
+        mask = np.zeros(len(df), dtype=bool)
+        mask[first] = True
+        return mask
+
+    def _spill(self):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"seen-{len(self.runs):04d}.npy")
+        np.save(path, self.memory)
+        self.runs.append(np.load(path, mmap_mode="r"))
+        self.memory = np.empty(0, dtype=np.uint64)
+
+    def close(self):
+        """Läufe auf der Platte entfernen"""
+        self.runs = []
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+def partial_aggregates(df):
+    """Teilaggregate eines Blocks: Date, Country, City, <specie>_sum, <specie>_count"""
+    aggregated = aggregate_species(df)
+    if aggregated is None:
+        return None
+
+    keys, sums, counts = aggregated
+    partials = keys.copy()
+    for i, specie in enumerate(SPECIES_COLUMNS):
+        partials[f"{specie}_sum"] = sums[:, i]
+        partials[f"{specie}_count"] = counts[:, i]
+    return partials
+
+def merge_partials(partials):
+    """Addiert Teilaggregate und bildet die Mittelwerte (wie reshape_species über alle Zeilen)"""
+    merged = partials.groupby(["Date", "Country", "City"], sort=True).sum()
+    return species_means(merged.index.to_frame(index=False),
+                         merged[[f"{specie}_sum" for specie in SPECIES_COLUMNS]].to_numpy(),
+                         merged[[f"{specie}_count" for specie in SPECIES_COLUMNS]].to_numpy())
+
+def write_partials(file_paths, partials_dir, rows, seen_bytes=None):
+    """
+    Durchgang 1: Teilaggregate aller Dateien nach partials_dir/Year=<jahr>/
+    seen_bytes: Speicher für die Hashes der Duplikatprüfung (Standard: SEEN_SHARE des Budgets zu rows)
+    """
+    seen_bytes = seen_bytes or int(rows * ROW_BYTES * SEEN_SHARE / (1 - SEEN_SHARE))
+    part = 0
+    for file_path in file_paths:
+        file = os.path.basename(file_path)
+        seen = SeenRows(os.path.join(partials_dir, "seen"), seen_bytes)
+        written = []
+        try:
+            for df in iter_raw_file(file_path, rows):
+                if "Specie" not in df.columns:
+                    raise ValueError(f"Spalte 'Specie' fehlt in {file}")
+                df = df[seen.first_seen(df)]
+                partials = partial_aggregates(df)
+                if partials is None:
+                    continue
+
+                for year, group in partials.groupby(partials["Date"].dt.year):
+                    year_dir = os.path.join(partials_dir, f"Year={year}")
+                    os.makedirs(year_dir, exist_ok=True)
+                    path = os.path.join(year_dir, f"part-{part:06d}.parquet")
+                    group.to_parquet(path, engine="pyarrow", index=False)
+                    written.append(path)
+                    part += 1
+        except Exception as e:
+            # wie data_import: fehlerhafte Dateien werden komplett übersprungen
+            print(f"Fehler beim Verarbeiten von {file}: {e}")
+            for path in written:
+                os.remove(path)
+        finally:
+            seen.close()
+
+def _years(partials_dir):
+    return sorted(int(name.split("=", 1)[1]) for name in os.listdir(partials_dir) if name.startswith("Year="))
+
+def _read_year(partials_dir, year, columns=None):
+    return pd.read_parquet(os.path.join(partials_dir, f"Year={year}"), engine="pyarrow", columns=columns)
+
+def _city_table(partials_dir, years):
+    """
+    Alle (Country, City) mit Geodaten in der Reihenfolge ihres ersten Auftretens (Date, Country, City),
+    damit die Stationszuordnung dieselbe ist wie bei weather_data über den ganzen Datensatz
+    """
+    frames = [_read_year(partials_dir, year, ["Date", "Country", "City"]).groupby(["Country", "City"])["Date"].min()
+              for year in years]
+    cities = pd.concat(frames).groupby(level=["Country", "City"]).min().reset_index()
+    cities = cities.sort_values(["Date", "Country", "City"], kind="stable").reset_index(drop=True)
+    cities["City"] = cities["City"].str.lower().str.strip()
+    return geo_data(cities)
+
+def _drop_columns(path, columns):
+    """Entfernt Spalten aus allen Dateien eines partitionierten Datensatzes, Datei für Datei"""
+    for file_path in glob.glob(os.path.join(path, "**", "*.parquet"), recursive=True):
+        table = pq.read_table(file_path)
+        pq.write_table(table.drop_columns([col for col in columns if col in table.column_names]), file_path)
+
+def stream_cleaning(file_names=None, data_folder=DATA_FOLDER, memory_budget=MEMORY_BUDGET, weather_cache=None,
+                    max_workers=8):
+    """
+    Import und Bereinigung wie data_cleaning(data_import()), aber Datei für Datei und Jahr für Jahr
+    - memory_budget (Bytes) bestimmt die Blockgröße beim Lesen der Rohdaten
+    - cleaned_data wird partitionsweise geschrieben, zurückgegeben wird der Pfad
+    """
+    if file_names is None:
+        file_names = sorted(f for f in os.listdir(data_folder) if f.startswith('waqi-covid-') and f.endswith('.csv'))
+
+    partials_dir = os.path.join(data_folder, PARTIALS_FOLDER)
+    shutil.rmtree(partials_dir, ignore_errors=True)
+    os.makedirs(partials_dir)
+    path = dataset_path("cleaned_data", data_folder)
+    shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        # das Budget teilen sich die Blöcke und die Hashes der Duplikatprüfung
+        seen_bytes = int(memory_budget * SEEN_SHARE)
+        write_partials([os.path.join(data_folder, file) for file in file_names], partials_dir,
+                       chunk_rows(memory_budget - seen_bytes), seen_bytes)
+        years = _years(partials_dir)
+        if not years:
+            print("Keine gültigen Daten vorhanden.")
+            return None
+
+        # Wetter einmal für alle Städte (Stationstabelle statt Rohdaten im Speicher)
+        cities = _city_table(partials_dir, years)
+        stations = nearest_stations(cities[["Country", "City", "Latitude", "Longitude"]].drop_duplicates())
+        weather = station_weather(stations, max_workers, weather_cache or WeatherCache(os.path.join(data_folder, "weather_cache")))
+        weather_columns = [col for col in weather.columns if col not in ("Station", "Date")]
+
+        null_counts = pd.Series(0, index=FINAL_COLUMNS)
+        replaced = 0
+        rows = 0
+        for year in years:
+            df = merge_partials(_read_year(partials_dir, year))
+            df["City"] = df["City"].str.lower().str.strip()
+            df = geo_data(df)
+
+            if not weather.empty:
+                year_weather = weather[weather["Date"].dt.year == year]
+                if year_weather.empty:
+                    df = df.assign(**{col: np.nan for col in weather_columns})
+                else:
+                    df = merge_weather(df, stations, year_weather)
+
+            df = convert_date(df)
+            df["City"] = df["City"].str.capitalize()
+            df = population_data(df)
+            df, year_replaced = remove_outliers(df)
+            replaced += int(year_replaced.sum())
+            df = df[list(FINAL_COLUMNS)]
+
+            null_counts += df.isnull().sum()
+            rows += len(df)
+            write_dataset(df, "cleaned_data", data_folder=data_folder, overwrite=False)
+    finally:
+        shutil.rmtree(partials_dir, ignore_errors=True)
+
+    # wie finalize: Spalten mit mehr als 90% NaNs löschen, bezogen auf alle Jahre
+    dropped = [col for col in FINAL_COLUMNS if null_counts[col] / rows >= 0.9]
+    if dropped:
+        _drop_columns(path, dropped)
+    print(f"✅ cleaned_data im Streaming-Modus geschrieben: {rows} Zeilen, {len(years)} Jahre, "
+          f"{replaced} Ausreißer ersetzt")
+    return path
@@ -0,0 +1,153 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+
+# Synthetische Quelldaten im Format der echten Downloads, für Benchmarks und Tests ohne Netz
+# - waqi-covid-<Jahr>Q<n>.csv: Kommentarkopf, Langformat, doppelte Zeilen, uneinheitliche Specie-Namen
+# - airquality-covid19-cities.json (Gazetteer) und population.csv (UN-Tabelle)
+# - fake_meteostat(): ersetzt Stations/Daily in data_preparation durch erzeugte Stationen und Tageswerte
+# Größe über scale: 1x = BASE_CITIES Städte, 10x/100x entsprechend mehr Städte, Tage über n_days.
+
+BASE_CITIES = 30
+BASE_DAYS = 365
+START = "2019-01-01"
+
+# typische Wertebereiche der Mediane je Specie (inkl. Schreibvarianten wie in den echten Dateien)
+SPECIE_RANGES = {
+    "pm25": (5, 150), "pm10": (5, 200), "no2": (1, 60), "o3": (1, 80), "so2": (0.5, 20), "co": (0.1, 10),
+    "dew": (-10, 25), "humidity": (20, 100), "pressure": (990, 1040), "temperature": (-10, 35),
+    "wind speed": (0, 15), "wind-gust": (0, 30), "aqi": (10, 200),
+}
+COUNTRIES = ["DE", "FR", "US", "IN", "CN", "BR", "JP", "ZA", "AU", "MX"]
+
+def scale_size(scale=1, n_days=BASE_DAYS):
+    """(Städte, Tage) für einen Skalierungsfaktor"""
+    return BASE_CITIES * int(scale), n_days
+
+def city_table(n_cities, seed=0):
+    """Städte mit Land, Namen (wie nach capitalize) und Koordinaten"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Country": [COUNTRIES[i % len(COUNTRIES)] for i in range(n_cities)],
+        "City": [f"Ort{i}" for i in range(n_cities)],
+        "Latitude": rng.uniform(-50, 65, n_cities).round(4),
+        "Longitude": rng.uniform(-170, 170, n_cities).round(4),
+    })
+
+def _quarters(start, n_days):
+    dates = pd.date_range(start, periods=n_days, freq="D")
+    return [(f"{period.year}Q{period.quarter}", group) for period, group in
+            pd.Series(dates, index=dates).groupby(dates.to_period("Q"))]
+
+def write_raw_files(folder, cities, n_days, start=START, seed=0, duplicate_share=0.05, outlier_share=0.001):
+    """Eine WAQI-Datei je Quartal mit einzelnen Ausreißern (x20); gibt die Dateinamen zurück"""
+    rng = np.random.default_rng(seed)
+    species = list(SPECIE_RANGES)
+    low = np.array([SPECIE_RANGES[s][0] for s in species])
+    high = np.array([SPECIE_RANGES[s][1] for s in species])
+    # Niveau je Stadt, damit sich Städte unterscheiden
+    level = rng.uniform(0.5, 1.5, len(cities))
+
+    names = []
+    for period, dates in _quarters(start, n_days):
+        n = len(dates) * len(cities) * len(species)
+        city_idx = np.tile(np.repeat(np.arange(len(cities)), len(species)), len(dates))
+        specie_idx = np.tile(np.arange(len(species)), len(dates) * len(cities))
+        median = np.minimum(low[specie_idx] + (high - low)[specie_idx] * rng.random(n) * level[city_idx],
+                            high[specie_idx])
+        median[rng.random(n) < outlier_share] *= 20
+        df = pd.DataFrame({
+            "Date": np.repeat(dates.dt.strftime("%Y-%m-%d").to_numpy(), len(cities) * len(species)),
+            "Country": cities["Country"].to_numpy()[city_idx],
+            "City": cities["City"].to_numpy()[city_idx],
+            "Specie": np.asarray(species)[specie_idx],
+            "count": rng.integers(1, 48, n),
+            "min": (median * 0.5).round(1),
+            "max": (median * 1.5).round(1),
+            "median": median.round(1),
+            "variance": rng.uniform(0, 500, n).round(1),
+        })
+        # Stationen mit mehreren Einträgen pro Tag
+        df = pd.concat([df, df.sample(frac=duplicate_share, random_state=seed)], ignore_index=True)
+
+        name = f"waqi-covid-{period}.csv"
+        with open(os.path.join(folder, name), "w", encoding="utf-8") as file:
+            file.write("# Synthetische Daten im Format des World Air Quality Index Project\n")
+            file.write("# Zeitraum: " + period + "\n")
+            df.to_csv(file, index=False)
+        names.append(name)
+    return names
+
+def write_cities_json(folder, cities, duplicates=2):
+    """airquality-covid19-cities.json mit den Orten (plus einigen doppelten Einträgen)"""
+    places = [{"Place": {"geo": [row.Latitude, row.Longitude], "name": row.City, "country": row.Country}}
+              for row in cities.itertuples()]
+    places += places[:duplicates]
+    with open(os.path.join(folder, "airquality-covid19-cities.json"), "w", encoding="utf-8") as file:
+        json.dump({"count": len(places), "data": places}, file)
+
+def write_population_csv(folder, cities, years, seed=0):
+    """population.csv im Aufbau der UN-Tabelle, nicht jede Stadt in jedem Jahr"""
+    rng = np.random.default_rng(seed)
+    rows = [(row.Country, year, row.City, int(rng.integers(50_000, 5_000_000)))
+            for row in cities.itertuples() for year in years if rng.random() < 0.7]
+    pd.DataFrame(rows, columns=["Country or Area", "Year", "City", "Value"]).assign(
+        Area="Total", Sex="Both Sexes", **{"City type": "City proper", "Record Type": "Estimate - de jure"}
+    ).to_csv(os.path.join(folder, "population.csv"), index=False)
+
+def generate_sources(folder, scale=1, n_days=BASE_DAYS, n_cities=None, start=START, seed=0):
+    """
+    Schreibt alle Quelldateien nach folder und gibt die Städtetabelle zurück
+    n_cities überschreibt die Anzahl aus scale
+    """
+    n_cities = n_cities or scale_size(scale, n_days)[0]
+    os.makedirs(folder, exist_ok=True)
+    cities = city_table(n_cities, seed)
+    write_raw_files(folder, cities, n_days, start, seed)
+    write_cities_json(folder, cities)
+    years = sorted(set(pd.date_range(start, periods=n_days, freq="D").year))
+    write_population_csv(folder, cities, [years[0] - 2] + years, seed)
+    return cities
+
+class FakeMeteostat:
+    """Erzeugte Stationen und Tageswerte statt Meteostat-Abfragen, zählt die Aufrufe"""
+
+    def __init__(self, n_stations=200, seed=0):
+        rng = np.random.default_rng(seed)
+        self.catalog = pd.DataFrame({
+            "latitude": rng.uniform(-60, 70, n_stations),
+            "longitude": rng.uniform(-180, 180, n_stations),
+        }, index=pd.Index([f"{10000 + i}" for i in range(n_stations)], name="id"))
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def stations(self):
+        catalog = self.catalog
+        return type("Stations", (), {"fetch": lambda self: catalog})()
+
+    def daily(self, station_id, start, end):
+        with self._lock:
+            self.calls += 1
+        index = pd.date_range(start, end, freq="D", name="time")
+        rng = np.random.default_rng(int(station_id))
+        day = index.dayofyear.to_numpy()
+        tavg = 10 + 12 * np.sin(2 * np.pi * (day - 100) / 365) + rng.normal(0, 3, len(index))
+        data = pd.DataFrame({
+            "tavg": tavg, "tmin": tavg - 5, "tmax": tavg + 5,
+            "prcp": rng.exponential(2, len(index)), "snow": np.nan,
+            "wdir": rng.uniform(0, 360, len(index)), "wspd": rng.uniform(0, 40, len(index)),
+            "wpgt": np.nan, "pres": rng.normal(1013, 8, len(index)), "tsun": np.nan,
+        }, index=index)
+        return type("Daily", (), {"fetch": lambda self: data})()
+
+@contextmanager
+def fake_meteostat(n_stations=200, seed=0):
+    """Ersetzt Stations und Daily in data_preparation, liefert das FakeMeteostat-Objekt"""
+    fake = FakeMeteostat(n_stations, seed)
+    with patch("data_preparation.Stations", side_effect=lambda *args, **kwargs: fake.stations()), \
+         patch("data_preparation.Daily", side_effect=fake.daily):
+        yield fake
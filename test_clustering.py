@@ -0,0 +1,74 @@
+import sys
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+from sklearn.datasets import make_blobs
+from sklearn.preprocessing import StandardScaler
+sys.path.append('.')
+import clustering
+from clustering import CLUSTER_POLLUTANTS, city_matrix, cluster_cities, k_sweep, scale
+
+def _matrix(n=300, centers=4):
+    X, _ = make_blobs(n, n_features=len(CLUSTER_POLLUTANTS), centers=centers, random_state=0)
+    return pd.DataFrame(X, index=[f"Stadt{i}" for i in range(n)], columns=CLUSTER_POLLUTANTS)
+
+def test_city_matrix_matches_notebook():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'City': rng.choice(['A', 'B', 'C'], 300)})
+    for col in CLUSTER_POLLUTANTS:
+        df[col] = rng.uniform(0, 100, len(df))
+    df.loc[df['City'] == 'C', 'So2'] = np.nan
+
+    expected = df.groupby('City')[CLUSTER_POLLUTANTS].mean().dropna()
+    pd.testing.assert_frame_equal(city_matrix(df), expected)
+    assert city_matrix(df, exclude=['A']).index.tolist() == ['B']
+
+def test_scale_is_cached(tmp_path):
+    matrix = _matrix()
+    scaled = scale(matrix, str(tmp_path))
+    np.testing.assert_allclose(scaled.to_numpy(), StandardScaler().fit_transform(matrix))
+    with patch('clustering.StandardScaler') as scaler:
+        pd.testing.assert_frame_equal(scale(matrix, str(tmp_path)), scaled)
+        scaler.assert_not_called()
+
+def test_k_sweep_scores_and_cache(tmp_path):
+    matrix = _matrix()
+    result = k_sweep(matrix, k_range=range(1, 11), max_workers=1, cache_dir=str(tmp_path))
+
+    assert result.scores["k"].tolist() == list(range(1, 11))
+    assert np.isnan(result.scores.loc[0, "silhouette"])
+    assert result.best_k() == 4
+    assert result.scores["inertia"].iloc[0] > result.scores["inertia"].iloc[3]
+    assert result.models[4].n_clusters == 4
+
+    with patch('clustering._fit_block') as fit_block:
+        cached = k_sweep(matrix, k_range=range(1, 11), max_workers=1, cache_dir=str(tmp_path))
+        fit_block.assert_not_called()
+    pd.testing.assert_frame_equal(cached.scores, result.scores)
+
+    matrix.iloc[0, 0] += 1
+    assert k_sweep(matrix, k_range=range(1, 11), max_workers=1, cache_dir=str(tmp_path)).data_hash != result.data_hash
+
+def test_parallel_sweep_matches_serial():
+    matrix = _matrix()
+    serial = k_sweep(matrix, k_range=range(1, 13), max_workers=1, cache_dir=None)
+    parallel = k_sweep(matrix, k_range=range(1, 13), max_workers=3, cache_dir=None)
+    pd.testing.assert_frame_equal(serial.scores, parallel.scores)
+
+def test_minibatch_mode():
+    result = k_sweep(_matrix(2000), k_range=range(2, 7), mode="minibatch", max_workers=1, cache_dir=None,
+                     silhouette_sample=500)
+    assert result.best_k() == 4
+    assert type(result.models[4]).__name__ == "MiniBatchKMeans"
+
+def test_cluster_cities_drops_singletons():
+    matrix = _matrix(200, centers=3)
+    matrix.loc["Ausreisser"] = 1000.0
+
+    clustered, removed = cluster_cities(matrix, k=3)
+    assert removed == ["Ausreisser"]
+    assert "Ausreisser" not in clustered.index
+    assert sorted(clustered["Cluster"].value_counts()) == [66, 67, 67]
+
+    clustered, removed = cluster_cities(matrix, k=3, drop_singletons=False)
+    assert removed == [] and len(clustered) == 201
@@ -0,0 +1,60 @@
+import sys
+import numpy as np
+import pytest
+import pandas as pd
+sys.path.append('.')
+from cube import open_cube, write_cube
+
+def _cleaned():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2022-01-01', '2023-06-30')
+    df = pd.concat([pd.DataFrame({'Year': dates.year, 'Month': dates.month, 'Day': dates.day, 'Country': country,
+                                  'City': city, 'Latitude': 1.0, 'Population': 1000})
+                    for country, city in [('DE', 'Hamburg'), ('US', 'Atlanta'), ('VE', 'Valencia'),
+                                          ('ES', 'Valencia')]], ignore_index=True)
+    for col in ['Pm25', 'No2', 'Tavg']:
+        df[col] = rng.uniform(0, 50, len(df))
+    df.loc[df.sample(frac=0.05, random_state=1).index, 'Pm25'] = np.nan
+    # fehlende Tage
+    return df.drop(index=df.sample(frac=0.1, random_state=2).index).reset_index(drop=True)
+
+def _reference(df, city, country=None):
+    rows = df[(df['City'] == city) & ((country is None) | (df['Country'] == country))]
+    return rows.set_index(pd.to_datetime(rows[['Year', 'Month', 'Day']]))
+
+def test_cube_series_is_zero_copy_view(tmp_path):
+    df = _cleaned()
+    write_cube(df, str(tmp_path))
+    cube = open_cube(str(tmp_path))
+
+    assert cube.variables == ['Pm25', 'No2', 'Tavg']
+    assert cube.values.shape == (4, 546, 3)
+    series = cube.series('Hamburg', 'Pm25')
+    assert isinstance(series, np.memmap) and np.shares_memory(series, cube.values)
+
+    expected = _reference(df, 'Hamburg')['Pm25'].reindex(cube.dates)
+    np.testing.assert_array_equal(series, expected.to_numpy(dtype=np.float32))
+
+    frame = cube.frame('Valencia', country='ES')
+    pd.testing.assert_series_equal(frame['No2'], _reference(df, 'Valencia', 'ES')['No2'].reindex(cube.dates)
+                                   .astype(np.float32), check_names=False, check_freq=False)
+
+def test_ambiguous_city_requires_country(tmp_path):
+    write_cube(_cleaned(), str(tmp_path))
+    cube = open_cube(str(tmp_path))
+    with pytest.raises(KeyError):
+        cube.series('Valencia')
+    assert cube.city_code('Valencia', country='VE') != cube.city_code('Valencia', country='ES')
+
+def test_monthly_and_rolling_means(tmp_path):
+    df = _cleaned()
+    write_cube(df, str(tmp_path))
+    cube = open_cube(str(tmp_path))
+
+    monthly = cube.monthly_means('Pm25')
+    reference = _reference(df, 'Atlanta')['Pm25'].resample('MS').mean()
+    np.testing.assert_allclose(monthly.loc[('US', 'Atlanta')].to_numpy(), reference.to_numpy(), rtol=1e-5)
+
+    rolling = cube.rolling_mean('Atlanta', 'Pm25', 7)
+    expected = _reference(df, 'Atlanta')['Pm25'].reindex(cube.dates).astype(np.float64).rolling(7, min_periods=1).mean()
+    np.testing.assert_allclose(rolling.to_numpy(), expected.to_numpy(), rtol=1e-5)
@@ -0,0 +1,74 @@
+import sys
+import numpy as np
+import pandas as pd
+sys.path.append('.')
+from dashboard_data import build_cubes, write_cubes, load_cubes, cube_version, POLLUTANTS
+
+def _daily():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2022-11-01', '2024-02-28')
+    df = pd.concat([pd.DataFrame({'Year': dates.year, 'Month': dates.month, 'Day': dates.day, 'City': city})
+                    for city in ['Delhi', 'Tokyo', 'Osaka']], ignore_index=True)
+    for col in POLLUTANTS:
+        df[col] = rng.uniform(0, 100, len(df))
+    df.loc[df.sample(frac=0.1, random_state=1).index, 'Pm25'] = np.nan
+    return df
+
+def _dashboard_reference(df, auswahl):
+    """Berechnung wie bisher in app.py bei jeder Interaktion"""
+    df = df.copy()
+    df["Datum"] = pd.to_datetime(df[["Year", "Month", "Day"]])
+    df["Jahr_Monat"] = df["Datum"].dt.to_period("M")
+    df_grouped = df.groupby(["City", "Jahr_Monat"])[auswahl].mean().reset_index()
+    df_grouped["Jahr_Monat"] = pd.to_datetime(df_grouped["Jahr_Monat"].astype(str))
+    df["Jahr"] = df["Datum"].dt.year
+    jahresmittel = df.groupby(["City", "Jahr"])[auswahl].mean().reset_index()
+    return df_grouped, jahresmittel
+
+def test_build_cubes_matches_dashboard():
+    df = _daily()
+    cubes = build_cubes(df)
+
+    for auswahl in POLLUTANTS:
+        monthly, yearly = _dashboard_reference(df, auswahl)
+        expected = monthly[monthly["City"] == "Tokyo"][["Jahr_Monat", auswahl]].reset_index(drop=True)
+        pd.testing.assert_frame_equal(cubes.monthly_city("Tokyo", auswahl), expected, check_dtype=False, rtol=1e-6)
+
+        letztes_jahr, df_letztes_jahr = cubes.yearly_latest(auswahl)
+        expected = yearly[yearly["Jahr"] == yearly["Jahr"].max()][["City", auswahl]].reset_index(drop=True)
+        assert letztes_jahr == 2024
+        pd.testing.assert_frame_equal(df_letztes_jahr, expected, check_dtype=False, check_categorical=False, rtol=1e-6)
+
+    assert cubes.cities == ['Delhi', 'Osaka', 'Tokyo']
+    assert cubes.monthly['Pm25'].dtype == np.float32
+    assert cubes.threshold('Pm25', 'Offizieller Grenzwert') == 25
+    assert np.isclose(cubes.threshold('No2', 'Statistisch (oberes Quartil)'), df['No2'].quantile(0.75))
+
+def test_write_and_load_cubes(tmp_path):
+    cubes = build_cubes(_daily())
+    write_cubes(cubes, str(tmp_path))
+
+    loaded = load_cubes(str(tmp_path))
+    assert cube_version(str(tmp_path)) is not None
+    assert loaded.version == cubes.version
+    assert loaded.quartiles == cubes.quartiles
+    pd.testing.assert_frame_equal(loaded.monthly, cubes.monthly)
+    pd.testing.assert_frame_equal(loaded.yearly, cubes.yearly)
+
+def test_load_cubes_builds_from_csv_once(tmp_path):
+    source = tmp_path / 'daily.csv'
+    _daily().to_csv(source, index=False)
+    cube_folder = str(tmp_path / 'dashboard')
+
+    first = load_cubes(cube_folder, source_csv=str(source))
+    source.unlink()
+    second = load_cubes(cube_folder, source_csv=str(source))
+
+    assert first.version == second.version
+    assert len(second.monthly) == 3 * 16
+
+def test_version_changes_with_data():
+    df = _daily()
+    before = build_cubes(df).version
+    df.loc[0, 'O3'] += 1
+    assert build_cubes(df).version != before
@@ -1,64 +1,203 @@
 import pytest
 import os
+import numpy as np
 import pandas as pd
 import json
 import sys
 import meteostat
+import threading
 sys.path.append('.')
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime
-from unittest.mock import patch, mock_open
-from data_preparation import download_files, data_import, data_cleaning, geo_data, weather_data, population_data, convert_date  
+from unittest.mock import MagicMock, patch, mock_open
+from benchmarks import make_long_table, reshape_reference, measure
+from synthetic_data import generate_sources, fake_meteostat
+from weather_cache import WeatherCache
+from data_preparation import reshape_species, SPECIES_COLUMNS, download_files, sync_files, load_manifest, file_checksum, data_import, import_files, RESHAPE_COLUMNS, read_raw_file, iter_raw_file, data_cleaning, geo_data, weather_data, population_data, convert_date, remove_outliers, OUTLIER_RULES, FINAL_COLUMNS, compact_frame, map_names, finalize, station_weather, nearest_stations
+
+class _FileHandler(BaseHTTPRequestHandler):
+    """Lokaler Ersatz für aqicn.org: liefert Dateien mit ETag aus"""
+    content = {'/test_file.csv': b'test content'}
+    flaky = {}
+    truncated = set()
+
+    def do_GET(self):
+        if self.flaky.get(self.path, 0) > 0:
+            self.flaky[self.path] -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        if self.path not in self.content:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = self.content[self.path]
+        etag = f'"{len(body)}-{hash(body)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.path in self.truncated:
+            # Verbindung bricht nach der Hälfte des Bodys ab
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def file_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FileHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+def test_download_files(file_server, tmp_path):
+    files = {
+        'test_file.csv': f'{file_server}/test_file.csv'
+    }
+    output_folder = tmp_path / 'test_folder'
 
-@patch('requests.get')
-@patch('os.makedirs')
-@patch('os.path.exists', return_value=False)
-@patch('builtins.open', new_callable=mock_open)
-def test_download_files(mock_open, mock_makedirs, mock_get):
+    results = download_files(files, str(output_folder))
+
+    result = results['test_file.csv']
+    assert result.status == 'downloaded'
+    assert result.http_status == 200
+    assert result.bytes_written == len(b'test content')
+    assert result.etag is not None
+    assert (output_folder / 'test_file.csv').read_bytes() == b'test content'
+    assert not (output_folder / 'test_file.csv.part').exists()
+
+def test_download_files_not_modified(file_server, tmp_path):
     files = {
-        'test_file.csv': 'https://example.com/test_file.csv'
+        'test_file.csv': f'{file_server}/test_file.csv'
     }
-    output_folder = 'test_folder'
+    first = download_files(files, str(tmp_path))
+
+    validators = {'test_file.csv': {'etag': first['test_file.csv'].etag}}
+    second = download_files(files, str(tmp_path), validators=validators)
 
-    # Mock the response
-    mock_response = mock_get.return_value
-    mock_response.status_code = 200
-    mock_response.content = b'test content'
+    assert second['test_file.csv'].status == 'not_modified'
+    assert second['test_file.csv'].http_status == 304
+    assert second['test_file.csv'].bytes_written == 0
 
-    # Call the function
-    download_files(files, output_folder)
+def test_download_files_retry(file_server, tmp_path):
+    files = {
+        'test_file.csv': f'{file_server}/test_file.csv'
+    }
+    _FileHandler.flaky['/test_file.csv'] = 2
 
-    # Assertions
-    mock_makedirs.assert_called_once_with(output_folder)
-    mock_get.assert_called_once_with('https://example.com/test_file.csv', headers={"Accept-Encoding": "gzip"})
-    mock_open.assert_called_once_with(os.path.join(output_folder, 'test_file.csv'), 'wb')
-    mock_open().write.assert_called_once_with(b'test content')
+    results = download_files(files, str(tmp_path), retries=3, backoff=0)
 
-def test_download_files_failed_status_code(mock_get):
+    assert results['test_file.csv'].status == 'downloaded'
+    assert results['test_file.csv'].attempts == 3
+
+def test_download_files_failed_status_code(file_server, tmp_path):
     files = {
-        'test_file.csv': 'https://example.com/test_file.csv'
+        'missing.csv': f'{file_server}/missing.csv',
+        'test_file.csv': f'{file_server}/test_file.csv'
     }
-    output_folder = 'test_folder'
 
-    # Mock failed response
-    mock_response = mock_get.return_value
-    mock_response.status_code = 404
+    results = download_files(files, str(tmp_path), backoff=0)
+
+    assert results['missing.csv'].status == 'failed'
+    assert results['missing.csv'].http_status == 404
+    assert results['missing.csv'].attempts == 1
+    assert results['test_file.csv'].ok
+    assert not (tmp_path / 'missing.csv').exists()
 
-    with patch('requests.get', return_value=mock_response):
-        download_files(files, output_folder)
+def test_download_files_exception(tmp_path):
+    files = {
+        'test_file.csv': 'http://127.0.0.1:1/test_file.csv'
+    }
 
-    mock_get.assert_called_once_with('https://example.com/test_file.csv', headers={"Accept-Encoding": "gzip"})
+    results = download_files(files, str(tmp_path), retries=2, backoff=0)
 
-@patch('requests.get', side_effect=Exception('Download error'))
-def test_download_files_exception(mock_get):
+    assert results['test_file.csv'].status == 'failed'
+    assert results['test_file.csv'].attempts == 2
+    assert results['test_file.csv'].error
+
+def test_download_files_truncated_leaves_no_part(file_server, tmp_path):
+    files = {
+        'test_file.csv': f'{file_server}/test_file.csv'
+    }
+    _FileHandler.truncated.add('/test_file.csv')
+    try:
+        results = download_files(files, str(tmp_path), retries=2, backoff=0)
+    finally:
+        _FileHandler.truncated.discard('/test_file.csv')
+
+    assert results['test_file.csv'].status == 'failed'
+    assert results['test_file.csv'].attempts == 2
+    assert not (tmp_path / 'test_file.csv').exists()
+    assert not (tmp_path / 'test_file.csv.part').exists()
+
+def test_download_files_write_error_leaves_no_part(file_server, tmp_path):
     files = {
-        'test_file.csv': 'https://example.com/test_file.csv'
+        'test_file.csv': f'{file_server}/test_file.csv'
     }
-    output_folder = 'test_folder'
+    with patch('data_preparation.os.replace', side_effect=OSError('disk full')):
+        results = download_files(files, str(tmp_path), backoff=0)
 
-    download_files(files, output_folder)
+    assert results['test_file.csv'].status == 'failed'
+    assert results['test_file.csv'].error == 'disk full'
+    assert os.listdir(tmp_path) == []
+
+
+def test_sync_files_manifest(file_server, tmp_path):
+    files = {
+        'waqi-covid-2025.csv': f'{file_server}/test_file.csv'
+    }
+
+    changed = sync_files(files, str(tmp_path), backoff=0)
+
+    assert changed == ['waqi-covid-2025.csv']
+    manifest = load_manifest(str(tmp_path))
+    entry = manifest['waqi-covid-2025.csv']
+    assert entry['url'] == files['waqi-covid-2025.csv']
+    assert entry['size'] == len(b'test content')
+    assert entry['sha256'] == file_checksum(tmp_path / 'waqi-covid-2025.csv')
+    assert entry['fetched_at']
+
+    # Zweiter Lauf: ETag aus dem Manifest -> 304, nichts geändert
+    assert sync_files(files, str(tmp_path), backoff=0) == []
+
+def test_sync_files_skips_historic(file_server, tmp_path):
+    files = {
+        'waqi-covid-2019Q1.csv': f'{file_server}/test_file.csv'
+    }
+    sync_files(files, str(tmp_path), backoff=0)
+
+    # Historisches Quartal wird nicht mehr angefragt, selbst wenn der Server nicht erreichbar ist
+    files['waqi-covid-2019Q1.csv'] = 'http://127.0.0.1:1/test_file.csv'
+    with patch('data_preparation.download_files') as mock_download:
+        changed = sync_files(files, str(tmp_path), backoff=0)
+
+    mock_download.assert_not_called()
+    assert changed == []
+
+@patch('os.listdir')
+@patch('pandas.read_csv')
+def test_data_import_file_names(mock_read_csv, mock_listdir):
+    mock_listdir.return_value = ['waqi-covid-2019Q1.csv', 'waqi-covid-2025.csv']
+    mock_read_csv.return_value = pd.DataFrame({'Specie': ['pm25'], 'Value': [1]})
 
-    mock_get.assert_called_once_with('https://example.com/test_file.csv', headers={"Accept-Encoding": "gzip"})
+    result = data_import(file_names=['waqi-covid-2025.csv'])
 
+    assert len(result) == 1
+    mock_read_csv.assert_called_once()
+    assert mock_read_csv.call_args[0][0].endswith('waqi-covid-2025.csv')
 
 @patch('os.listdir')
 @patch('pandas.read_csv')
@@ -118,6 +257,111 @@ def test_data_import_empty_dataframe(mock_read_csv, mock_listdir):
     result = data_import()
     assert result is None
 
+RAW_CSV = """# Data source: aqicn.org
+# Kommentarzeile
+Date,Country,City,Specie,count,min,max,median,variance
+2020-01-01,DE,Berlin,pm25,24,1,50,12.5,30
+2020-01-01,DE,Berlin,wind gust,24,1,9,4,2
+2020-01-01,DE,Berlin,wind gust,24,1,9,4,2
+2020-01-02,DE,Hamburg,wind-speed,24,1,9,3,2
+"""
+
+RAW_CSV_2 = """# Data source: aqicn.org
+Date,Country,City,Specie,count,min,max,median,variance
+2021-01-01,FR,Paris,no2,24,1,50,20,30
+2021-01-01,DE,Berlin,wind speed,24,1,9,5,2
+"""
+
+def test_data_import_parallel_typed(tmp_path):
+    (tmp_path / 'waqi-covid-2020Q1.csv').write_text(RAW_CSV)
+    (tmp_path / 'waqi-covid-2021Q1.csv').write_text(RAW_CSV_2)
+
+    parallel = data_import(data_folder=str(tmp_path), max_workers=2)
+    serial = data_import(data_folder=str(tmp_path), max_workers=1)
+
+    assert len(parallel) == 5
+    for col in ['Country', 'City', 'Specie']:
+        assert isinstance(parallel[col].dtype, pd.CategoricalDtype)
+    assert parallel['median'].dtype == 'float32'
+    assert pd.api.types.is_datetime64_any_dtype(parallel['Date'])
+    assert set(parallel['Specie']) == {'pm25', 'wind-gust', 'wind-speed', 'no2'}
+    pd.testing.assert_frame_equal(
+        parallel.sort_values(['Date', 'City', 'Specie']).reset_index(drop=True),
+        serial.sort_values(['Date', 'City', 'Specie']).reset_index(drop=True))
+
+def test_data_import_store(tmp_path):
+    (tmp_path / 'waqi-covid-2020Q1.csv').write_text(RAW_CSV)
+    (tmp_path / 'waqi-covid-2021Q1.csv').write_text(RAW_CSV_2)
+    first = data_import(data_folder=str(tmp_path), max_workers=1, store=True)
+    assert (tmp_path / 'raw_data.parquet' / 'Year=2021' / 'Country=FR').is_dir()
+
+    # unveränderte Dateien werden nicht mehr geparst, nur die gewünschten Spalten gelesen
+    with patch('data_preparation.import_files') as mock_import:
+        stored = data_import(data_folder=str(tmp_path), max_workers=1, store=True, columns=RESHAPE_COLUMNS)
+    mock_import.assert_not_called()
+    assert list(stored.columns) == RESHAPE_COLUMNS
+    keys = ['Date', 'City', 'Specie']
+    pd.testing.assert_frame_equal(
+        stored.astype(str).sort_values(keys).reset_index(drop=True),
+        first[RESHAPE_COLUMNS].astype(str).sort_values(keys).reset_index(drop=True))
+
+    # nur die geänderte Datei wird neu gelesen
+    (tmp_path / 'waqi-covid-2021Q1.csv').write_text(RAW_CSV_2.replace('20,30', '40,30'))
+    with patch('data_preparation.import_files', wraps=import_files) as mock_import:
+        updated = data_import(data_folder=str(tmp_path), max_workers=1, store=True)
+    assert [os.path.basename(path) for path in mock_import.call_args.args[0]] == ['waqi-covid-2021Q1.csv']
+    assert len(updated) == 5
+    assert updated.loc[updated['City'] == 'Paris', 'median'].tolist() == [40]
+
+def test_read_raw_file_engines(tmp_path):
+    path = tmp_path / 'waqi-covid-2020Q1.csv'
+    path.write_text(RAW_CSV)
+
+    fast = read_raw_file(str(path))
+    c_engine = read_raw_file(str(path), engine='c')
+
+    pd.testing.assert_frame_equal(fast, c_engine)
+
+def test_read_raw_file_empty_count(tmp_path):
+    path = tmp_path / 'waqi-covid-2020Q1.csv'
+    path.write_text(RAW_CSV.replace('pm25,24,', 'pm25,,'))
+
+    fast = read_raw_file(str(path))
+    c_engine = read_raw_file(str(path), engine='c')
+    chunks = pd.concat(iter_raw_file(str(path), 2), ignore_index=True)
+
+    assert fast['count'].dtype == 'Int32'
+    assert fast['count'].isna().sum() == 1
+    pd.testing.assert_frame_equal(fast, c_engine)
+    pd.testing.assert_series_equal(chunks['count'], c_engine['count'])
+
+def test_reshape_species_matches_groupby_pivot():
+    df = make_long_table(n_cities=7, n_days=20)
+
+    result = reshape_species(df)
+    expected = reshape_reference(df)[['Date', 'Country', 'City'] + SPECIES_COLUMNS]
+
+    assert list(result.columns) == ['Date', 'Country', 'City'] + SPECIES_COLUMNS
+    pd.testing.assert_frame_equal(result, expected.astype({'Country': str, 'City': str}), check_names=False,
+                                  check_dtype=False, check_column_type=False, check_index_type=False)
+
+def test_reshape_species_strings_and_nan():
+    test_data = pd.DataFrame({
+        'Date': ['2025-01-02', '2025-01-01', '2025-01-01', '2025-01-01', '2025-01-01'],
+        'Country': ['DE', 'DE', 'DE', 'DE', 'DE'],
+        'City': ['Berlin', 'Berlin', 'Berlin', 'Berlin', 'Berlin'],
+        'Specie': ['pm25', 'pm25', 'pm25', 'pm25', 'wind-gust'],
+        'median': [5.0, 10.0, 20.0, np.nan, 3.0],
+    })
+
+    result = reshape_species(test_data)
+
+    assert len(result) == 2
+    assert result['Date'].tolist() == [pd.Timestamp('2025-01-01'), pd.Timestamp('2025-01-02')]
+    assert result['pm25'].tolist() == [15.0, 5.0]
+    assert 'wind-gust' not in result.columns
+    assert result['no2'].isna().all()
+
 @patch('builtins.open', new_callable=mock_open, read_data='{"data": [{"Place": {"name": "Berlin", "geo": [52.52, 13.405]}}]}')
 def test_geo_data_success(mock_file):
     test_data = pd.DataFrame({
@@ -165,10 +409,10 @@ def test_geo_data_missing_geo_fields(mock_file):
     assert result['Latitude'].isna().all()
     assert result['Longitude'].isna().all()
 
-@patch('meteostat.Stations')
-@patch('meteostat.Daily')
+@patch('data_preparation.Stations')
+@patch('data_preparation.Daily')
 def test_weather_data(mock_daily, mock_stations):
-    mock_stations().nearby().fetch.return_value = pd.DataFrame({'index': ['12345']})
+    mock_stations().fetch.return_value = pd.DataFrame({'latitude': [52.5], 'longitude': [13.4]}, index=['12345'])
     mock_daily().fetch.return_value = pd.DataFrame({
         'time': ['2025-01-01'],
         'tavg': [5.5]
@@ -186,6 +430,65 @@ def test_weather_data(mock_daily, mock_stations):
     assert 'tavg' in result.columns
     assert result.loc[0, 'tavg'] == 5.5
 
+@patch('data_preparation.Stations')
+@patch('data_preparation.Daily')
+def test_weather_data_shared_station(mock_daily, mock_stations):
+    # Hamburg und Altona teilen sich die Station 10147
+    mock_stations.return_value.fetch.return_value = pd.DataFrame({
+        'latitude': [53.63, 52.47, 48.35],
+        'longitude': [9.99, 13.40, 11.79]
+    }, index=['10147', '10384', '10870'])
+
+    def fetch_daily(station_id, start, end):
+        data = pd.DataFrame({'tavg': [1.0 if station_id == '10147' else 2.0, np.nan]},
+                            index=pd.DatetimeIndex(['2024-01-01', '2024-01-02'], name='time'))
+        return MagicMock(fetch=MagicMock(return_value=data))
+    mock_daily.side_effect = fetch_daily
+
+    test_df = pd.DataFrame({
+        'City': ['hamburg', 'altona', 'berlin', 'berlin'],
+        'Latitude': [53.55, 53.56, 52.52, 52.52],
+        'Longitude': [10.0, 9.93, 13.405, 13.405],
+        'Date': pd.to_datetime(['2024-01-01', '2024-01-01', '2024-01-01', '2024-01-02'])
+    })
+
+    result = weather_data(test_df, max_workers=2)
+
+    assert mock_stations.call_count == 1
+    assert sorted(call.args[0] for call in mock_daily.call_args_list) == ['10147', '10384']
+    assert len(result) == 4
+    assert 'Station' not in result.columns
+    assert result['tavg'].tolist()[:3] == [1.0, 1.0, 2.0]
+    assert np.isnan(result['tavg'].iloc[3])
+
+@patch('data_preparation.Stations')
+@patch('data_preparation.Daily')
+def test_weather_data_cache(mock_daily, mock_stations, tmp_path):
+    mock_stations().fetch.return_value = pd.DataFrame({'latitude': [52.5], 'longitude': [13.4]}, index=['10384'])
+    mock_daily.return_value.fetch.return_value = pd.DataFrame(
+        {'tavg': [5.5]}, index=pd.DatetimeIndex(['2024-01-01'], name='time'))
+
+    test_df = pd.DataFrame({'City': ['berlin'], 'Latitude': [52.52], 'Longitude': [13.405], 'Date': ['2024-01-01']})
+    cache = WeatherCache(str(tmp_path))
+
+    first = weather_data(test_df, cache=cache)
+    second = weather_data(test_df, cache=WeatherCache(str(tmp_path)))
+
+    assert mock_daily.call_count == 1
+    assert first.loc[0, 'tavg'] == 5.5
+    assert second.loc[0, 'tavg'] == 5.5
+
+@patch('data_preparation.Stations')
+@patch('data_preparation.Daily')
+def test_weather_data_no_station(mock_daily, mock_stations):
+    mock_stations.return_value.fetch.return_value = pd.DataFrame(columns=['latitude', 'longitude'])
+
+    test_df = pd.DataFrame({'City': ['nowhere'], 'Latitude': [0.0], 'Longitude': [0.0], 'Date': ['2024-01-01']})
+    result = weather_data(test_df)
+
+    mock_daily.assert_not_called()
+    assert list(result.columns) == ['City', 'Latitude', 'Longitude', 'Date']
+
 @patch('pandas.read_csv')
 def test_population_data(mock_read_csv):
     mock_read_csv.return_value = pd.DataFrame({
@@ -216,57 +519,202 @@ def test_convert_date():
     assert result.loc[0, 'month'] == 3
     assert result.loc[0, 'day'] == 5
 
-@patch('data_preparation.geo_data', side_effect=lambda x: x)
-@patch('data_preparation.weather_data', side_effect=lambda x: x)
-@patch('data_preparation.convert_date', side_effect=lambda x: x)
-@patch('data_preparation.population_data', side_effect=lambda x: x)
+def _with_coordinates(df):
+    return df.assign(Latitude=52.52, Longitude=13.405)
+
+def _with_population(df):
+    # wie population_data: Spaltennamen groß, Einwohner je Zeile
+    df = df.copy()
+    df.columns = df.columns.str.capitalize()
+    return df.assign(Population=3_600_000.0)
+
+@patch('data_preparation.geo_data', side_effect=_with_coordinates)
+@patch('data_preparation.weather_data', side_effect=lambda x, **kwargs: x)
+@patch('data_preparation.population_data', side_effect=_with_population)
+@patch('data_preparation.WeatherCache')
 @patch('os.makedirs')
+@patch('pandas.DataFrame.to_parquet')
 @patch('pandas.DataFrame.to_csv')
-def test_data_cleaning(mock_to_csv, mock_makedirs, mock_population, mock_convert, mock_weather, mock_geo):
+def test_data_cleaning(mock_to_csv, mock_to_parquet, mock_makedirs, mock_cache, mock_population, mock_weather, mock_geo):
     test_data = pd.DataFrame({
-        'Date': ['2025-01-01', '2025-01-01'],
-        'Country': ['Germany', 'Germany'],
-        'City': ['Berlin', 'Berlin'],
-        'Specie': ['pm25', 'pm10'],
-        'median': [12.5, 20.1],
-        'variance': [1.1, 1.5],
-        'min': [10, 18],
-        'max': [15, 22]
+        'Date': ['2025-01-01', '2025-01-01', '2025-01-02'],
+        'Country': ['Germany', 'Germany', 'Germany'],
+        'City': ['Berlin', 'Berlin', 'Berlin'],
+        'Specie': ['pm25', 'pm10', 'pm25'],
+        'median': [12.5, 900.0, 14.0],
+        'variance': [1.1, 1.5, 1.2],
+        'min': [10, 18, 11],
+        'max': [15, 22, 16]
     })
 
-    result = data_cleaning(test_data)
+    result = data_cleaning(test_data, csv=True)
 
-    assert 'variance' not in result.columns
-    assert 'min' not in result.columns
-    assert 'max' not in result.columns
-    assert 'pm25' in result.columns
-    assert 'pm10' in result.columns
-    assert result['City'].iloc[0] == 'Berlin'
-    assert result['Date'].iloc[0] == '2025-01-01'
+    # echte Umformung, Datumsaufteilung und Spaltenauswahl; Pm10 (>= 867 Ausreißer, dann nur NaN) fällt weg
+    assert list(result.columns) == ['Year', 'Month', 'Day', 'Country', 'City', 'Latitude', 'Longitude',
+                                    'Population', 'Pm25']
+    assert result[['Year', 'Month', 'Day']].values.tolist() == [[2025, 1, 1], [2025, 1, 2]]
+    assert result['City'].tolist() == ['Berlin', 'Berlin']
+    assert result['Pm25'].tolist() == [12.5, 14.0]
+    assert (result['Population'] == 3_600_000).all()
 
+    mock_to_parquet.assert_called_once()
     mock_makedirs.assert_called_once()
     mock_to_csv.assert_called_once_with('./data/cleaned_data.csv', index=False)
 
 @patch('data_preparation.geo_data', side_effect=lambda x: x)
-@patch('data_preparation.weather_data', side_effect=lambda x: x)
-@patch('data_preparation.convert_date', side_effect=lambda x: x)
+@patch('data_preparation.weather_data', side_effect=lambda x, **kwargs: x)
 @patch('data_preparation.population_data', side_effect=lambda x: x)
-def test_data_cleaning_empty_df(mock_population, mock_convert, mock_weather, mock_geo):
+@patch('data_preparation.WeatherCache')
+@patch('data_preparation.write_dataset')
+def test_data_cleaning_empty_df(mock_write, mock_cache, mock_population, mock_weather, mock_geo):
     test_data = pd.DataFrame(columns=['Date', 'Country', 'City', 'Specie', 'median'])
     result = data_cleaning(test_data)
     assert result.empty
+    assert list(result.columns) == FINAL_COLUMNS
+    mock_write.assert_called_once()
 
 @patch('data_preparation.geo_data', side_effect=lambda x: x)
-@patch('data_preparation.weather_data', side_effect=lambda x: x)
-@patch('data_preparation.convert_date', side_effect=lambda x: x)
+@patch('data_preparation.weather_data', side_effect=lambda x, **kwargs: x)
 @patch('data_preparation.population_data', side_effect=lambda x: x)
-@patch('os.makedirs')
-@patch('pandas.DataFrame.to_csv')
-def test_data_cleaning_missing_columns(mock_to_csv, mock_makedirs, mock_population, mock_convert, mock_weather, mock_geo):
+@patch('data_preparation.WeatherCache')
+@patch('data_preparation.write_dataset')
+def test_data_cleaning_missing_columns(mock_write, mock_cache, mock_population, mock_weather, mock_geo):
     test_data = pd.DataFrame({
         'Date': ['2025-01-01'],
         'Country': ['Germany'],
         'City': ['Berlin']
     })
     result = data_cleaning(test_data)
-    assert result.empty
\ No newline at end of file
+    assert result.empty
+    assert list(result.columns) == FINAL_COLUMNS
+
+def test_finalize_missing_columns():
+    df = pd.DataFrame({'Year': [2020, 2020], 'City': ['A', 'B'], 'Pm25': [1.0, np.nan], 'Extra': [1, 2]})
+    result = finalize(df, ['Year', 'City', 'Pm25', 'No2'])
+    assert list(result.columns) == ['Year', 'City', 'Pm25']
+
+def test_remove_outliers_matches_eda_rules():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'City': ['A'] * 200,
+        'Pm25': rng.uniform(700, 900, 200),
+        'O3': rng.uniform(300, 350, 200),
+        'Humidity': rng.uniform(-20, 120, 200),
+        'Dew': rng.uniform(-60, 40, 200),
+        'Tmax': np.r_[[60.0, 61.0], rng.uniform(0, 80, 198)],
+    })
+    df.loc[[0, 1], 'Pm25'] = [814.0, 813.5]
+    df.loc[5, 'Humidity'] = np.nan
+
+    # Anweisungen wie in 1_eda_exploration.ipynb
+    expected = df.copy()
+    expected.loc[expected["Pm25"] >= 814, "Pm25"] = np.nan
+    expected.loc[expected["O3"] >= 323.5, "O3"] = np.nan
+    expected.loc[expected["Tmax"] > 60, "Tmax"] = np.nan
+    expected.loc[(expected["Humidity"] < 0) | (expected["Humidity"] > 100), "Humidity"] = np.nan
+    expected.loc[(expected["Dew"] < -40) | (expected["Dew"] > 32), "Dew"] = np.nan
+
+    result, replaced = remove_outliers(df)
+    pd.testing.assert_frame_equal(result, expected)
+    assert np.isnan(result.loc[0, 'Pm25']) and result.loc[1, 'Pm25'] == 813.5
+    assert result.loc[0, 'Tmax'] == 60.0
+    # ersetzte Werte = zusätzliche NaNs je Spalte, Regeln für fehlende Spalten (z. B. Pres) übersprungen
+    pd.testing.assert_series_equal(replaced, (expected.isna().sum() - df.isna().sum())[replaced.index])
+    assert set(replaced.index) == {'Pm25', 'O3', 'Tmax', 'Humidity', 'Dew'}
+    # Original bleibt unverändert
+    assert df['Pm25'].max() > 814
+
+def test_remove_outliers_per_partition():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({'Year': np.repeat([2020, 2021], 50), 'Pm10': rng.uniform(800, 900, 100),
+                       'Prcp': rng.uniform(300, 500, 100)})
+    whole, replaced = remove_outliers(df)
+    parts = [remove_outliers(part) for _, part in df.groupby('Year')]
+    pd.testing.assert_frame_equal(pd.concat([part for part, _ in parts]), whole)
+    assert sum(counts for _, counts in parts).equals(replaced)
+    assert set(replaced.index) == {'Pm10', 'Prcp'}
+    assert set(OUTLIER_RULES['Column']) <= set(FINAL_COLUMNS)
+
+def test_compact_frame():
+    df = pd.DataFrame({'Year': np.array([2020, 2021]), 'month': np.array([1, 12], dtype=np.int32),
+                       'Country': ['DE', 'US'], 'City': ['Hamburg', 'Atlanta'], 'Pm25': [1.5, np.nan],
+                       'Population': [1.8e6, np.nan], 'Date': pd.to_datetime(['2020-01-01', '2021-12-01'])})
+    compact = compact_frame(df)
+    assert compact.dtypes.to_dict() == {'Year': np.int16, 'month': np.int8, 'Country': 'category', 'City': 'category',
+                                        'Pm25': np.float32, 'Population': np.float64, 'Date': df['Date'].dtype}
+    pd.testing.assert_frame_equal(compact, df, check_dtype=False, check_categorical=False)
+    # bereits kompakt: unverändert
+    assert compact_frame(compact) is compact
+
+def test_map_names_keeps_categories():
+    city = pd.Series(pd.Categorical([' Hamburg', 'hamburg', None, 'Atlanta']), name='City')
+    result = map_names(city, lambda names: names.str.lower().str.strip())
+    assert isinstance(result.dtype, pd.CategoricalDtype)
+    assert sorted(result.cat.categories) == ['atlanta', 'hamburg']
+    assert result.tolist()[:2] == ['hamburg', 'hamburg'] and pd.isna(result[2]) and result[3] == 'atlanta'
+    pd.testing.assert_series_equal(map_names(city.astype(object), lambda names: names.str.lower()),
+                                   city.astype(object).str.lower())
+
+def test_data_cleaning_compact(tmp_path, monkeypatch):
+    """Kompakter Modus: gleiche Werte, kompaktes Schema, Eingabe unverändert, geringere Speicherspitze"""
+    generate_sources(str(tmp_path / "data"), n_cities=30, n_days=365)
+    monkeypatch.chdir(tmp_path)
+    raw = data_import(data_folder='./data/', max_workers=1)
+    before = raw.copy()
+
+    with fake_meteostat(n_stations=50):
+        default, _, default_peak = measure(data_cleaning, raw, weather_cache=WeatherCache(str(tmp_path / "c1")))
+        compact, _, compact_peak = measure(data_cleaning, raw, weather_cache=WeatherCache(str(tmp_path / "c2")),
+                                           compact=True)
+
+    pd.testing.assert_frame_equal(raw, before)
+    pd.testing.assert_frame_equal(compact, default, check_dtype=False, check_categorical=False, rtol=1e-5)
+    assert compact['City'].dtype == 'category' and compact['Pm25'].dtype == np.float32
+    assert compact['Month'].dtype == np.int8 and compact['Year'].dtype == np.int16
+    assert compact_peak < 0.85 * default_peak
+    # Copy-on-Write gilt nur während data_cleaning
+    assert pd.get_option('mode.copy_on_write') is False
+
+def test_cleaning_steps_leave_input_unchanged():
+    df = pd.DataFrame({'City': ['hamburg'], 'Year': [2020], 'Population': [1.0]})
+    before = df.copy()
+    lookup = MagicMock()
+    lookup.lookup.return_value = np.array([1.8e6])
+    population_data(df, lookup=lookup)
+    pd.testing.assert_frame_equal(df, before)
+
+def test_station_weather_dtypes(tmp_path):
+    # der Cache speichert die Werte wie abgerufen, float32 nur mit compact=True
+    stations = pd.DataFrame({'City': ['a', 'b'], 'Station': ['10001', '10002']}, dtype=object)
+    cache = WeatherCache(str(tmp_path))
+    with fake_meteostat(n_stations=5):
+        default = station_weather(stations, max_workers=1, cache=cache)
+        compact = station_weather(stations, max_workers=1, cache=cache, compact=True)
+    assert default['tavg'].dtype == np.float64
+    assert compact['tavg'].dtype == np.float32
+    np.testing.assert_allclose(compact['tavg'], default['tavg'], rtol=1e-6)
+
+def test_weather_same_city_name_in_two_countries():
+    # Valencia in Spanien und in Venezuela: eigene Station und eigene Wetterdaten je Land
+    df = pd.DataFrame({'Country': ['ES', 'VE', 'ES'], 'City': ['valencia', 'valencia', 'valencia'],
+                       'Date': pd.to_datetime(['2020-01-01', '2020-01-01', '2020-01-02']),
+                       'Latitude': [39.47, 10.16, 39.47], 'Longitude': [-0.38, -68.0, -0.38]})
+    with fake_meteostat(n_stations=300):
+        stations = nearest_stations(df[['Country', 'City', 'Latitude', 'Longitude']].drop_duplicates())
+        result = weather_data(df, max_workers=1)
+
+    assert list(stations.columns) == ['Country', 'City', 'Station']
+    assert stations['Station'].nunique() == 2
+    assert len(result) == 3
+    spain, venezuela = result.iloc[0], result.iloc[1]
+    assert spain['tavg'] != venezuela['tavg']
+
+@patch('data_preparation.Stations')
+def test_nearest_stations_catalog_without_coordinates(mock_stations):
+    mock_stations.return_value.fetch.return_value = pd.DataFrame(
+        {'latitude': [np.nan], 'longitude': [np.nan]}, index=['10147'])
+    cities = pd.DataFrame({'Country': ['DE'], 'City': ['hamburg'], 'Latitude': [53.55], 'Longitude': [10.0]})
+
+    stations = nearest_stations(cities)
+    assert stations.empty
+    assert list(stations.columns) == ['Country', 'City', 'Station']
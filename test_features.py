@@ -0,0 +1,75 @@
+import sys
+import numpy as np
+import pandas as pd
+sys.path.append('.')
+from features import SEASON_DUMMIES, build_features, load_features, season
+from storage import write_dataset
+
+def get_season(month):
+    # aus 3_feature_engineering.ipynb
+    if month in [12, 1, 2]:
+        return 'Winter'
+    elif month in [3, 4, 5]:
+        return 'Frühling'
+    elif month in [6, 7, 8]:
+        return 'Sommer'
+    else:
+        return 'Herbst'
+
+def _cleaned():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2022-01-01', '2023-12-31')
+    df = pd.concat([pd.DataFrame({'Year': dates.year, 'Month': dates.month, 'Day': dates.day, 'Country': 'DE',
+                                  'City': city}) for city in ['Hamburg', 'Berlin', 'Atlanta']], ignore_index=True)
+    for col, (low, high) in {'Pm25': (0, 80), 'Tavg': (-10, 35), 'Humidity': (20, 100), 'Prcp': (0, 30),
+                             'Wspd': (0, 40), 'Pres': (990, 1040), 'No2': (0, 60), 'O3': (0, 90),
+                             'So2': (0, 10)}.items():
+        df[col] = rng.uniform(low, high, len(df))
+        df.loc[df.sample(frac=0.05, random_state=len(col)).index, col] = np.nan
+    return df
+
+def _notebook(df_city):
+    """Schritte des Notebooks für eine Stadt"""
+    df = df_city[['Year', 'Month', 'Day', 'Pm25', 'Tavg', 'Humidity', 'Prcp', 'Wspd', 'Pres']].copy()
+    df = df.fillna(df.median())
+    df['Log_Prcp'] = np.log(df['Prcp'] + 1)
+    df['Tavg_squared'] = df['Tavg'] ** 2
+    df['Humidity_low'] = df['Humidity'].clip(upper=80)
+    df['Humidity_high'] = (df['Humidity'] - 80).clip(lower=0)
+    df['Tavg_Humidity'] = df['Tavg'] * df['Humidity']
+    df['Season'] = df['Month'].apply(get_season)
+    return pd.concat([df, pd.get_dummies(df['Season'], drop_first=True, dtype=int)], axis=1)
+
+def test_season_lookup_matches_get_season():
+    months = np.arange(1, 13)
+    assert list(season(months)) == [get_season(month) for month in months]
+
+def test_build_features_matches_notebook_for_every_city():
+    df = _cleaned()
+    features = build_features(df, impute="median")
+
+    assert features['Tavg_squared'].dtype == np.float32
+    assert features['Season'].dtype == 'category'
+    for city in ['Hamburg', 'Atlanta']:
+        expected = _notebook(df[df['City'] == city])
+        result = features[features['City'] == city]
+        for col in ['Pm25', 'Tavg', 'Humidity', 'Log_Prcp', 'Tavg_squared', 'Humidity_low', 'Humidity_high',
+                    'Tavg_Humidity'] + SEASON_DUMMIES:
+            np.testing.assert_allclose(result[col], expected[col], rtol=1e-5, err_msg=col)
+        assert (result['Season'].astype(str) == expected['Season']).all()
+
+def test_build_features_without_imputation_keeps_nan():
+    df = _cleaned()
+    features = build_features(df)
+    assert features['Pm25'].isna().sum() == df['Pm25'].isna().sum()
+    assert features['Log_Prcp'].isna().sum() == df['Prcp'].isna().sum()
+    assert features.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum()
+
+def test_load_features_from_dataset(tmp_path):
+    df = _cleaned().drop(columns='Pres')
+    write_dataset(df, "cleaned_data", data_folder=str(tmp_path))
+
+    features = load_features(cities=['Hamburg'], data_folder=str(tmp_path))
+    assert set(features['City']) == {'Hamburg'}
+    assert len(features) == (df['City'] == 'Hamburg').sum()
+    assert features['Pres'].isna().all()
@@ -0,0 +1,77 @@
+import sys
+import time
+import threading
+import pandas as pd
+sys.path.append('.')
+from figure_cache import FigureCache
+from dashboard_charts import monthly_chart
+
+def test_hits_misses_and_lru_eviction():
+    cache = FigureCache(max_entries=2)
+    calls = []
+
+    def render(name):
+        def _render():
+            calls.append(name)
+            return name.encode()
+        return _render
+
+    cache.get(("a",), render("a"))
+    cache.get(("b",), render("b"))
+    assert cache.get(("a",), render("a")) == b"a"   # a wird zuletzt genutzt
+    cache.get(("c",), render("c"))                   # verdrängt b
+    cache.get(("b",), render("b"))
+
+    assert calls == ["a", "b", "c", "b"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 4, 2)
+    assert stats["entries"] == 2
+    assert stats["hit_rate"] == 0.2
+
+def test_max_bytes():
+    cache = FigureCache(max_entries=10, max_bytes=10)
+    for key in range(4):
+        cache.get(key, lambda: b"12345")
+    assert len(cache) == 2
+    assert cache.total_bytes == 10
+
+def test_concurrent_requests_render_once():
+    cache = FigureCache()
+    calls = []
+
+    def slow_render():
+        calls.append(1)
+        time.sleep(0.2)
+        return b"png"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("key", slow_render))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [b"png"] * 5
+    assert cache.stats()["misses"] == 1
+
+def test_failed_render_is_not_cached():
+    cache = FigureCache()
+
+    def broken():
+        raise ValueError("kaputt")
+
+    try:
+        cache.get("key", broken)
+    except ValueError:
+        pass
+    assert len(cache) == 0
+    assert cache.get("key", lambda: b"ok") == b"ok"
+
+def test_monthly_chart_png():
+    months = pd.to_datetime(['2024-01-01', '2024-02-01'])
+    df_a = pd.DataFrame({'Jahr_Monat': months, 'Pm25': [10.0, 30.0]})
+    df_b = pd.DataFrame({'Jahr_Monat': months, 'Pm25': [20.0, 5.0]})
+
+    image = monthly_chart(df_a, df_b, 'Delhi', 'Tokyo', 'Pm25', 25)
+    assert image[:8] == b'\x89PNG\r\n\x1a\n'
@@ -0,0 +1,59 @@
+import os
+import sys
+import json
+import pandas as pd
+sys.path.append('.')
+from gazetteer import load_gazetteer, join_gazetteer
+
+CITIES = {"data": [
+    {"Place": {"name": "Hamburg", "country": "DE", "geo": [53.55, 10.0]}},
+    {"Place": {"name": "Hamburg", "country": "US", "geo": [42.72, -78.83]}},
+    {"Place": {"name": "Hamburg ", "country": "DE", "geo": [0.0, 0.0]}},
+    {"Place": {"name": "Berlin", "country": "DE", "geo": [52.52, 13.405]}},
+    {"Place": {"name": "Ohne Geo", "country": "DE"}},
+]}
+
+def _write_json(tmp_path):
+    path = tmp_path / 'airquality-covid19-cities.json'
+    path.write_text(json.dumps(CITIES), encoding='utf-8')
+    return str(path)
+
+def test_join_does_not_multiply_rows(tmp_path):
+    gazetteer = load_gazetteer(_write_json(tmp_path), str(tmp_path / 'gazetteer.parquet'))
+    df = pd.DataFrame({
+        'Country': ['DE', 'US', 'DE', 'DE'],
+        'City': ['hamburg', 'hamburg', 'berlin', 'atlantis'],
+    })
+
+    result, report = join_gazetteer(df, gazetteer)
+
+    assert len(result) == 4
+    assert result['Latitude'].tolist()[:3] == [53.55, 42.72, 52.52]
+    assert pd.isna(result.loc[3, 'Latitude'])
+    assert report['matched'] == 3
+    assert report['unmatched'] == 1
+    assert report['gazetteer_duplicates'] == 1
+    assert report['missing_cities'] == ['atlantis']
+
+def test_join_ambiguous_city_without_country(tmp_path):
+    gazetteer = load_gazetteer(_write_json(tmp_path), str(tmp_path / 'gazetteer.parquet'))
+    df = pd.DataFrame({'City': ['Hamburg', 'Berlin']})
+
+    result, report = join_gazetteer(df, gazetteer)
+
+    assert pd.isna(result.loc[0, 'Latitude'])
+    assert result.loc[1, 'Latitude'] == 52.52
+    assert report['ambiguous_cities'] == ['hamburg']
+
+def test_gazetteer_is_persisted(tmp_path):
+    json_path = _write_json(tmp_path)
+    gazetteer_path = tmp_path / 'gazetteer.parquet'
+
+    first = load_gazetteer(json_path, str(gazetteer_path))
+    assert gazetteer_path.exists()
+
+    # Neuer Prozess: Parquet wird gelesen, solange die JSON nicht neuer ist
+    os.utime(gazetteer_path, (os.path.getmtime(json_path) + 10,) * 2)
+    stored = pd.read_parquet(gazetteer_path)
+    pd.testing.assert_frame_equal(first.reset_index(drop=True), stored)
+    assert len(first) == 3
@@ -0,0 +1,81 @@
+import sys
+import numpy as np
+import pandas as pd
+sys.path.append('.')
+from geo_index import GeoIndex, match_nearest, EARTH_RADIUS_KM
+
+def _haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def test_nearest_matches_brute_force():
+    rng = np.random.default_rng(1)
+    stations = pd.DataFrame({
+        'latitude': rng.uniform(-60, 70, 500),
+        'longitude': rng.uniform(-180, 180, 500),
+    }, index=[f'S{i}' for i in range(500)])
+    cities = pd.DataFrame({'Latitude': rng.uniform(-60, 70, 50), 'Longitude': rng.uniform(-180, 180, 50)})
+
+    index = GeoIndex.from_frame(stations, lat_col='latitude', lon_col='longitude')
+    ids, distances = index.nearest(cities['Latitude'], cities['Longitude'], k=3)
+
+    for i, city in cities.iterrows():
+        brute = _haversine(city['Latitude'], city['Longitude'], stations['latitude'], stations['longitude'])
+        expected = brute.sort_values().index[:3].tolist()
+        assert ids[i].tolist() == expected
+        np.testing.assert_allclose(distances[i], brute.sort_values().to_numpy()[:3])
+
+def test_nearest_across_dateline():
+    index = GeoIndex([0.0, 0.0], [179.5, 170.0], ids=['east', 'west'])
+    ids, distances = index.nearest([0.0], [-179.5])
+    assert ids[0, 0] == 'east'
+    assert distances[0, 0] < 120
+
+def test_nearest_missing_coordinates():
+    index = GeoIndex([53.55, np.nan], [10.0, 13.4], ids=['hamburg', 'unbekannt'])
+    ids, distances = index.nearest([53.5, np.nan], [10.0, 1.0])
+
+    assert len(index) == 1
+    assert ids[0, 0] == 'hamburg'
+    assert ids[1, 0] is None
+    assert np.isnan(distances[1, 0])
+
+def test_no_valid_points():
+    # z. B. Stationskatalog ohne Koordinaten: keine Treffer statt Fehler beim Aufbau des Baums
+    index = GeoIndex([np.nan], [np.nan], ids=['unbekannt'])
+    ids, distances = index.nearest([53.5, 52.5], [10.0, 13.4], k=2)
+
+    assert len(index) == 0
+    assert ids.shape == (2, 2) and (ids == None).all()  # noqa: E711
+    assert np.isnan(distances).all()
+    assert index.within([53.5], [10.0], radius_km=100)[0][0].size == 0
+
+def test_fewer_points_than_k():
+    ids, distances = GeoIndex([53.55], [10.0], ids=['hamburg']).nearest([52.5], [13.4], k=2)
+    assert ids.tolist() == [['hamburg', None]]
+    assert np.isnan(distances[0, 1])
+
+def test_within_radius():
+    cities = pd.DataFrame({
+        'City': ['hamburg', 'lübeck', 'berlin'],
+        'Latitude': [53.55, 53.87, 52.52],
+        'Longitude': [10.0, 10.69, 13.405],
+    })
+    index = GeoIndex.from_frame(cities, id_col='City')
+
+    ids, distances = index.within(cities['Latitude'], cities['Longitude'], radius_km=100)
+
+    assert ids[0].tolist() == ['hamburg', 'lübeck']
+    assert ids[2].tolist() == ['berlin']
+    assert distances[0][0] == 0
+
+def test_match_nearest():
+    stations = pd.DataFrame({'Latitude': [53.63, 52.47], 'Longitude': [9.99, 13.40]}, index=['10147', '10384'])
+    cities = pd.DataFrame({'Latitude': [52.52, 53.55], 'Longitude': [13.405, 10.0]}, index=['berlin', 'hamburg'])
+
+    result = match_nearest(cities, GeoIndex.from_frame(stations), k=2)
+
+    assert result.loc['berlin', 'match_1'] == '10384'
+    assert result.loc['hamburg', 'match_1'] == '10147'
+    assert result.loc['hamburg', 'distance_1'] < result.loc['hamburg', 'distance_2']
@@ -0,0 +1,182 @@
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+sys.path.append('.')
+from incremental import update_cleaned, clean_rows, changed_keys, key_digests, record_digests, load_digests
+from data_preparation import import_files, data_cleaning
+from storage import load_cleaned
+from pipeline import build_pipeline
+import gazetteer
+import population
+from synthetic_data import generate_sources, fake_meteostat
+
+HEADER = "# comment\nDate,Country,City,Specie,count,min,max,median,variance\n"
+
+def _rows(days, cities=(("DE", "Berlin"), ("FR", "Paris")), offset=0.0):
+    lines = []
+    for day in days:
+        for country, city in cities:
+            for i, specie in enumerate(["pm25", "no2", "o3"]):
+                lines.append(f"2025-01-{day:02d},{country},{city},{specie},3,1,9,{day + i + offset},1")
+    return "\n".join(lines) + "\n"
+
+def _write(path, days, **kwargs):
+    path.write_text(HEADER + _rows(days, **kwargs))
+
+def _geo(df):
+    return df.assign(Latitude=50.0, Longitude=10.0)
+
+def _population(df):
+    df = df.copy()
+    df.columns = df.columns.str.capitalize()
+    df['Population'] = 1000.0
+    return df
+
+@pytest.fixture
+def enrichment():
+    """Geo-, Wetter- und Einwohnerdaten ohne Netz; merkt sich die Tage, für die Wetter angefragt wurde"""
+    weather_days = []
+
+    def _weather(df, **kwargs):
+        weather_days.append(sorted(df['Date'].dt.day.unique()))
+        return df.assign(tavg=df['Date'].dt.day.astype(float))
+
+    with patch('data_preparation.geo_data', side_effect=_geo), \
+         patch('data_preparation.weather_data', side_effect=_weather), \
+         patch('data_preparation.population_data', side_effect=_population):
+        yield weather_days
+
+def _full(tmp_path):
+    """Neuberechnung aller Rohdaten als Vergleich"""
+    raw = pd.concat(import_files(sorted(str(p) for p in tmp_path.glob('waqi-covid-*.csv')), max_workers=1).values())
+    return clean_rows(raw)
+
+def _sorted(df):
+    columns = ['Year', 'Month', 'Day', 'Country', 'City']
+    return df[sorted(df.columns)].sort_values(columns).reset_index(drop=True)
+
+def test_update_only_new_and_changed_days(tmp_path, enrichment):
+    _write(tmp_path / 'waqi-covid-2025Q1.csv', [1, 2, 3])
+    update_cleaned(data_folder=str(tmp_path), max_workers=1)
+    assert enrichment == [[1, 2, 3]]
+
+    # neuer Tag in einer neuen Datei, geänderter Wert an Tag 2
+    (tmp_path / 'waqi-covid-2025Q1.csv').write_text(HEADER + _rows([1, 3]) + _rows([2], cities=(("DE", "Berlin"),), offset=5)
+                                                     + _rows([2], cities=(("FR", "Paris"),)))
+    _write(tmp_path / 'waqi-covid-2025Q2.csv', [4])
+    updated = update_cleaned(data_folder=str(tmp_path), max_workers=1)
+
+    assert enrichment[-1] == [2, 4]
+    assert sorted(zip(updated['Day'], updated['City'])) == [(2, 'Berlin'), (4, 'Berlin'), (4, 'Paris')]
+
+    stored = load_cleaned(data_folder=str(tmp_path))
+    pd.testing.assert_frame_equal(_sorted(stored), _sorted(_full(tmp_path)[stored.columns]),
+                                  check_dtype=False, check_categorical=False)
+
+def test_update_without_changes(tmp_path, enrichment):
+    _write(tmp_path / 'waqi-covid-2025Q1.csv', [1, 2])
+    update_cleaned(data_folder=str(tmp_path), max_workers=1)
+
+    # Zeilenreihenfolge spielt keine Rolle
+    lines = (tmp_path / 'waqi-covid-2025Q1.csv').read_text().splitlines()
+    (tmp_path / 'waqi-covid-2025Q1.csv').write_text("\n".join(lines[:2] + lines[2:][::-1]) + "\n")
+    updated = update_cleaned(data_folder=str(tmp_path), max_workers=1)
+
+    assert updated.empty
+    assert len(enrichment) == 1
+
+def test_update_removes_dropped_days(tmp_path, enrichment):
+    _write(tmp_path / 'waqi-covid-2025Q1.csv', [1, 2, 3])
+    update_cleaned(data_folder=str(tmp_path), max_workers=1)
+
+    _write(tmp_path / 'waqi-covid-2025Q1.csv', [1, 2])
+    update_cleaned(data_folder=str(tmp_path), max_workers=1)
+
+    stored = load_cleaned(data_folder=str(tmp_path))
+    assert sorted(stored['Day'].unique()) == [1, 2]
+    assert len(stored) == 4
+
+def test_update_reads_other_files_for_shared_days(tmp_path, enrichment):
+    # Berlin an Tag 2 steht in beiden Dateien, der Mittelwert braucht beide
+    _write(tmp_path / 'waqi-covid-2025Q1.csv', [1, 2], cities=(("DE", "Berlin"),))
+    _write(tmp_path / 'waqi-covid-2025Q2.csv', [2], cities=(("DE", "Berlin"),), offset=1)
+    update_cleaned(data_folder=str(tmp_path), max_workers=1)
+
+    _write(tmp_path / 'waqi-covid-2025Q2.csv', [2], cities=(("DE", "Berlin"),), offset=3)
+    update_cleaned(['waqi-covid-2025Q2.csv'], data_folder=str(tmp_path), max_workers=1)
+
+    stored = load_cleaned(data_folder=str(tmp_path))
+    pd.testing.assert_frame_equal(_sorted(stored), _sorted(_full(tmp_path)[stored.columns]),
+                                  check_dtype=False, check_categorical=False)
+
+def test_clean_rows_matches_data_cleaning(tmp_path, enrichment):
+    _write(tmp_path / 'waqi-covid-2025Q1.csv', [1, 2, 3])
+    raw = pd.concat(import_files([str(tmp_path / 'waqi-covid-2025Q1.csv')], max_workers=1).values())
+    with patch('data_preparation.write_dataset'):
+        full = data_cleaning(raw, weather_cache=object())
+    rows = clean_rows(raw, weather_cache=object())
+
+    pd.testing.assert_frame_equal(_sorted(rows[full.columns]), _sorted(full), check_dtype=False)
+    # beide Wege rufen die Wetterdaten genau einmal ab
+    assert enrichment == [[1, 2, 3], [1, 2, 3]]
+
+def test_changed_keys_exact_digest():
+    raw = pd.DataFrame({'Date': pd.to_datetime(['2025-01-01'] * 2), 'Country': 'DE', 'City': 'Berlin',
+                        'Specie': ['pm25', 'no2'], 'median': [1.0, 2.0]})
+    stored = key_digests(raw, 'a.csv')
+    raw.loc[1, 'median'] = np.nextafter(2.0, 3.0)
+
+    digests, update, remove = changed_keys(key_digests(raw, 'a.csv'), stored)
+    assert len(update) == 1 and remove.empty
+    assert digests['Digest'].dtype == np.uint64
+
+def test_record_digests_from_raw(tmp_path):
+    _write(tmp_path / 'waqi-covid-2025Q1.csv', [1, 2])
+    _write(tmp_path / 'waqi-covid-2025Q2.csv', [3])
+    from_files = record_digests(data_folder=str(tmp_path), max_workers=1)
+    raw = pd.concat([df.assign(Source=name) for name, df in
+                     import_files(sorted(str(p) for p in tmp_path.glob('waqi-covid-*.csv')), max_workers=1).items()])
+    from_raw = record_digests(data_folder=str(tmp_path), raw=raw)
+
+    columns = ['Date', 'Country', 'City', 'Source']
+    pd.testing.assert_frame_equal(from_raw.sort_values(columns).reset_index(drop=True),
+                                  from_files.sort_values(columns).reset_index(drop=True))
+    assert len(load_digests(str(tmp_path))) == 3 * 2
+
+def test_update_after_pipeline_run(tmp_path):
+    # nach einem vollständigen Pipeline-Lauf ist nichts neu zu berechnen
+    data_folder = str(tmp_path / "data")
+    generate_sources(data_folder, n_cities=3, n_days=10)
+    with fake_meteostat(n_stations=10):
+        build_pipeline(data_folder=data_folder, cache_dir=str(tmp_path / "cache")).run(targets=["cleaned"])
+    assert set(load_digests(data_folder)['Source']) == {'waqi-covid-2019Q1.csv'}
+
+    updated = update_cleaned(data_folder=data_folder, max_workers=1)
+    assert updated.empty
+    assert len(load_cleaned(data_folder=data_folder)) == 3 * 10
+
+def test_update_after_2024_matches_full_rebuild(tmp_path, monkeypatch):
+    # Wetterdaten enden mit WEATHER_END (2024): neue Tage 2025 bekommen auf beiden Wegen keine Wetterwerte
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(gazetteer, "_loaded", {})
+    monkeypatch.setattr(population, "_loaded", {})
+    generate_sources('./data/', n_cities=3, n_days=40, start="2024-12-01")
+    new_file = tmp_path / 'data' / 'waqi-covid-2025Q1.csv'
+    content = new_file.read_text()
+    new_file.unlink()
+
+    with fake_meteostat(n_stations=10):
+        update_cleaned(data_folder='./data/', max_workers=1)
+        new_file.write_text(content)
+        update_cleaned(['waqi-covid-2025Q1.csv'], data_folder='./data/', max_workers=1)
+        stored = load_cleaned(data_folder='./data/')
+        raw = import_files(sorted(str(p) for p in (tmp_path / 'data').glob('waqi-covid-*.csv')), max_workers=1)
+        with patch('data_preparation.write_dataset'):
+            expected = data_cleaning(pd.concat(raw.values()))
+
+    assert sorted(stored['Year'].unique()) == [2024, 2025]
+    assert stored.loc[stored['Year'] == 2025, 'Tavg'].isna().all()
+    pd.testing.assert_frame_equal(_sorted(stored[expected.columns]), _sorted(expected),
+                                  check_dtype=False, check_categorical=False)
@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import pytest
+import pandas as pd
+import requests
+from unittest.mock import MagicMock, patch
+sys.path.append('.')
+import data_preparation
+from instrumentation import Instrumentation
+from pipeline import Pipeline, Stage
+from synthetic_data import generate_sources, fake_meteostat
+
+def _double(df):
+    return pd.concat([df, df], ignore_index=True).assign(extra=1)
+
+def test_call_records_shapes_and_times():
+    instrumentation = Instrumentation()
+    df = pd.DataFrame({"a": range(10), "b": 1.0})
+    result = instrumentation.call("double", _double, df)
+
+    assert len(result) == 20
+    record, = instrumentation.stages
+    assert record["stage"] == "double"
+    assert record["inputs"] == {"arg0": {"rows": 10, "columns": 2}}
+    assert (record["rows_in"], record["rows_out"], record["cols_out"]) == (10, 20, 3)
+    assert record["wall_seconds"] > 0 and record["cpu_seconds"] >= 0
+    # ohne active() wird kein Speicher verfolgt
+    assert record["peak_mb"] is None
+
+def test_call_records_error():
+    instrumentation = Instrumentation()
+    with pytest.raises(ValueError):
+        instrumentation.call("broken", lambda: (_ for _ in ()).throw(ValueError("kaputt")))
+    assert "kaputt" in instrumentation.stages[0]["error"]
+    assert instrumentation.report()["summary"]["errors"] == ["broken"]
+
+def test_data_cleaning_report(tmp_path, monkeypatch):
+    generate_sources(str(tmp_path / "data"), n_cities=3, n_days=20)
+    monkeypatch.chdir(tmp_path)
+    raw = data_preparation.data_import(data_folder='./data/', max_workers=1)
+
+    instrumentation = Instrumentation(profile_dir=str(tmp_path / "profiles"))
+    with fake_meteostat(n_stations=10), instrumentation.active():
+        data_preparation.data_cleaning(raw)
+    # nach dem Block sind die Originale wieder eingesetzt
+    assert not hasattr(data_preparation.geo_data, "__wrapped__")
+
+    stages = {record["stage"]: record for record in instrumentation.stages}
+    assert stages["data_cleaning"]["parent"] is None
+    assert stages["geo_data"]["parent"] == "data_cleaning"
+    assert stages["data_cleaning"]["rows_out"] == 3 * 20
+    assert stages["data_cleaning"]["peak_mb"] > 0
+    assert stages["write_dataset"]["bytes_written"] > 0
+    # nur die äußerste Stufe wird profiliert
+    assert os.path.exists(stages["data_cleaning"]["profile"])
+    assert "profile" not in stages["geo_data"]
+
+    meteostat = [call for call in instrumentation.calls if call["kind"] == "meteostat"]
+    assert meteostat[0]["target"] == "Stations()"
+    assert any(call["target"].startswith("Daily(") and call["rows"] > 0 for call in meteostat)
+    assert all("weather_data" in call["stages"] for call in meteostat)
+
+    path = instrumentation.write_report(str(tmp_path / "report.json"))
+    with open(path, encoding="utf-8") as file:
+        report = json.load(file)
+    assert report["summary"]["external_calls"]["meteostat"] == len(meteostat)
+    assert len(report["stages"]) == len(instrumentation.stages)
+
+def test_http_calls_are_logged():
+    response = requests.Response()
+    response.status_code = 304
+    instrumentation = Instrumentation(trace_memory=False)
+    with patch.object(requests.Session, "request", MagicMock(return_value=response)), instrumentation.active():
+        requests.Session().get("https://example.org/waqi-covid-2020.csv")
+
+    call, = instrumentation.calls
+    assert call["kind"] == "http"
+    assert call["target"] == "GET https://example.org/waqi-covid-2020.csv"
+    assert call["status"] == 304
+
+def test_pipeline_stages_are_instrumented(tmp_path):
+    instrumentation = Instrumentation(trace_memory=False)
+    pipeline = Pipeline([
+        Stage("source", lambda n: pd.DataFrame({"value": range(n)}), params={"n": 4}),
+        Stage("double", lambda source: _double(source), inputs=("source",)),
+    ], cache_dir=str(tmp_path / "cache"), instrumentation=instrumentation)
+    pipeline.run()
+
+    stages = {record["stage"]: record for record in instrumentation.stages}
+    assert stages["source"]["rows_out"] == 4
+    assert stages["double"]["inputs"] == {"source": {"rows": 4, "columns": 1}}
+    assert stages["double"]["rows_out"] == 8
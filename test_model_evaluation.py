@@ -0,0 +1,67 @@
+import sys
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+sys.path.append('.')
+import model_evaluation
+from model_evaluation import (MODEL_POLLUTANTS, city_features, evaluate_models, load_city_features, load_model,
+                              summarize)
+from storage import write_dataset
+
+def _cleaned():
+    rng = np.random.default_rng(0)
+    cities = [f"Stadt{i}" for i in range(60)]
+    df = pd.DataFrame({'Year': 2023, 'Country': 'DE', 'City': np.repeat(cities, 20)})
+    level = np.repeat(rng.uniform(1, 50, len(cities)), 20)
+    for col in MODEL_POLLUTANTS:
+        df[col] = level * rng.uniform(0.5, 1.5, len(df))
+    df.loc[df['City'] == 'Stadt0', 'So2'] = np.nan
+    return df
+
+def test_city_features_matches_notebook():
+    df = _cleaned()
+    features = city_features(df)
+
+    expected = df.groupby('City')[MODEL_POLLUTANTS].median()
+    expected = expected[expected.notna().sum(axis=1) == 6].copy()
+    expected['AirQualityLabel'] = (expected['Pm25'] > expected['Pm25'].median()).astype(int)
+    pd.testing.assert_frame_equal(features, expected)
+    assert 'Stadt0' not in features.index
+
+def test_load_city_features_cached_per_version(tmp_path):
+    write_dataset(_cleaned(), "cleaned_data", data_folder=str(tmp_path))
+    features, version = load_city_features(str(tmp_path), str(tmp_path / 'eval'))
+    assert version is not None
+
+    with patch('model_evaluation.load_cleaned') as load:
+        cached, same_version = load_city_features(str(tmp_path), str(tmp_path / 'eval'))
+        load.assert_not_called()
+    assert same_version == version
+    pd.testing.assert_frame_equal(cached, features)
+
+def test_evaluate_models_grid_and_reuse(tmp_path):
+    features = city_features(_cleaned())
+    models = {"lr": LogisticRegression(max_iter=1000), "rf": RandomForestClassifier(n_estimators=20, random_state=42)}
+    sets = {"alle": ['Co', 'No2', 'O3', 'Pm10', 'So2'], "gase": ['Co', 'No2', 'O3', 'So2']}
+
+    metrics = evaluate_models(features, "v1", models, sets, n_splits=3, max_workers=2, evaluation_dir=str(tmp_path))
+    assert len(metrics) == 2 * 2 * 3
+    assert metrics[model_evaluation.METRICS].notna().all().all()
+    assert (metrics["accuracy"] > 0.7).all()
+    assert summarize(metrics).index.nlevels == 2
+
+    # zweiter Lauf lädt alle Kombinationen, nur ein geänderter Parameter wird neu trainiert
+    with patch('model_evaluation._fit_task', wraps=model_evaluation._fit_task) as fit:
+        again = evaluate_models(features, "v1", models, sets, n_splits=3, max_workers=1, evaluation_dir=str(tmp_path))
+        assert fit.call_count == 0
+        pd.testing.assert_frame_equal(again, metrics)
+
+        models["lr"] = LogisticRegression(max_iter=1000, C=0.5)
+        evaluate_models(features, "v1", models, sets, n_splits=3, max_workers=1, evaluation_dir=str(tmp_path))
+        assert fit.call_count == 2 * 3
+
+    assert isinstance(load_model("v1", "rf", "gase", fold=2, evaluation_dir=str(tmp_path)), RandomForestClassifier)
+    assert load_model("v1", "lr", "gase", evaluation_dir=str(tmp_path)).C == 0.5
+    assert (tmp_path / "v1" / "metrics.parquet").exists()
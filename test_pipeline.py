@@ -0,0 +1,193 @@
+import sys
+import shutil
+import threading
+import pandas as pd
+import pytest
+sys.path.append('.')
+from synthetic_data import fake_meteostat, generate_sources
+import pipeline
+from pipeline import Pipeline, Stage, build_pipeline, _module_dependencies, _source_hash
+
+calls = []
+
+def _source(path):
+    calls.append("source")
+    return pd.DataFrame({"value": [int(open(path).read())]})
+
+def _double(source, factor):
+    calls.append("double")
+    return source * factor
+
+def _plus_one(source):
+    calls.append("plus_one")
+    return source + 1
+
+def _total(double, plus_one):
+    calls.append("total")
+    return double + plus_one
+
+def _pipeline(tmp_path, factor=2):
+    input_file = tmp_path / "input.txt"
+    return Pipeline([
+        Stage("source", _source, files=(str(input_file),), params={"path": str(input_file)}),
+        Stage("double", _double, inputs=("source",), params={"factor": factor}),
+        Stage("plus_one", _plus_one, inputs=("source",)),
+        Stage("total", _total, inputs=("double", "plus_one")),
+    ], cache_dir=str(tmp_path / "cache"))
+
+@pytest.fixture
+def input_file(tmp_path):
+    calls.clear()
+    path = tmp_path / "input.txt"
+    path.write_text("5")
+    return path
+
+def test_second_run_is_cached(tmp_path, input_file):
+    first = _pipeline(tmp_path).run()
+    assert sorted(calls) == ["double", "plus_one", "source", "total"]
+    assert first["total"]["value"].tolist() == [16]
+
+    calls.clear()
+    pipeline = _pipeline(tmp_path)
+    second = pipeline.run()
+    assert calls == []
+    assert pipeline.last_run["total"] == "loaded"
+    assert pipeline.last_run["source"] == "cached"
+    pd.testing.assert_frame_equal(first["total"], second["total"])
+
+def test_param_change_reruns_stage_and_downstream(tmp_path, input_file):
+    _pipeline(tmp_path).run()
+    calls.clear()
+
+    result = _pipeline(tmp_path, factor=3).run()
+    assert sorted(calls) == ["double", "total"]
+    assert result["total"]["value"].tolist() == [21]
+
+def test_file_change_invalidates(tmp_path, input_file):
+    _pipeline(tmp_path).run()
+    calls.clear()
+
+    input_file.write_text("7")
+    result = _pipeline(tmp_path).run()
+    assert sorted(calls) == ["double", "plus_one", "source", "total"]
+    assert result["total"]["value"].tolist() == [22]
+
+def test_force_reruns_downstream(tmp_path, input_file):
+    _pipeline(tmp_path).run()
+    calls.clear()
+
+    _pipeline(tmp_path).run(force=["plus_one"])
+    assert sorted(calls) == ["plus_one", "total"]
+
+def test_targets_only_run_upstream(tmp_path, input_file):
+    result = _pipeline(tmp_path).run(targets=["plus_one"])
+    assert sorted(calls) == ["plus_one", "source"]
+    assert list(result) == ["plus_one"]
+
+def test_independent_stages_run_concurrently(tmp_path):
+    # beide Stufen warten aufeinander; seriell ausgeführt liefe die Barriere in den Timeout
+    barrier = threading.Barrier(2, timeout=5)
+
+    def _left():
+        barrier.wait()
+        return pd.DataFrame({"value": [1]})
+
+    def _right():
+        barrier.wait()
+        return pd.DataFrame({"value": [2]})
+
+    pipeline = Pipeline([Stage("left", _left), Stage("right", _right)], cache_dir=str(tmp_path))
+    result = pipeline.run(max_workers=2)
+    assert result["left"]["value"].tolist() == [1]
+    assert result["right"]["value"].tolist() == [2]
+
+def test_cycle_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", _plus_one, inputs=("b",)), Stage("b", _plus_one, inputs=("a",))],
+                 cache_dir=str(tmp_path))
+
+def test_build_pipeline_stages(tmp_path):
+    pipeline = build_pipeline(data_folder=str(tmp_path), cache_dir=str(tmp_path / "cache"))
+    assert pipeline.stages["weather"].inputs == ("stations",)
+    assert pipeline.stages["population"].inputs == ("reshaped",)
+    assert set(pipeline.stages["merged"].inputs) == {"reshaped", "cities", "stations", "weather", "population"}
+    assert pipeline.stages["cleaned"].inputs == ("merged", "raw")
+    assert pipeline._order.index("raw") == 0
+    assert pipeline.stages["dashboard"].inputs == ("cleaned",)
+    assert pipeline.stages["trends"].inputs == ("dashboard",)
+    assert pipeline.stages["cube"].inputs == ("cleaned",)
+    assert pipeline._order[-1] in ("trends", "cube")
+
+def test_weather_cache_in_data_folder(tmp_path):
+    stage = build_pipeline(data_folder=str(tmp_path), cache_dir=str(tmp_path / "cache")).stages["weather"]
+    assert stage.params["cache_dir"] == str(tmp_path / "weather_cache")
+    stations = pd.DataFrame({"City": ["a"], "Station": ["10001"]}, dtype=object)
+    with fake_meteostat(n_stations=5):
+        weather = stage.func(stations, **stage.params)
+    assert not weather.empty
+    assert (tmp_path / "weather_cache" / "10001.parquet").exists()
+
+def test_module_changes_invalidate(tmp_path, monkeypatch):
+    stages = build_pipeline(data_folder=str(tmp_path), cache_dir=str(tmp_path / "cache")).stages
+    assert {"data_preparation", "storage", "gazetteer", "population"} <= set(_module_dependencies(stages["raw"].func))
+    assert set(_module_dependencies(stages["cities"].func)) == {"gazetteer"}
+    before = {name: _source_hash(stage.func) for name, stage in stages.items()}
+
+    # Änderung in storage.py: nur Stufen, die data_preparation/storage verwenden, bekommen einen neuen Code-Hash
+    digest = pipeline._file_digest
+    monkeypatch.setattr(pipeline, "_file_digest", lambda path, mtime_ns: "geändert" if path.endswith("storage.py")
+                        else digest(path, mtime_ns))
+    after = {name: _source_hash(stage.func) for name, stage in stages.items()}
+    assert [name for name in stages if before[name] != after[name]] == [
+        "raw", "reshaped", "stations", "weather", "merged", "cleaned"]
+
+def _export(source, path):
+    calls.append("export")
+    with open(path, "w") as file:
+        file.write(str(source["value"].sum()))
+    return source
+
+def _pipeline_with_outputs(tmp_path, input_file):
+    export_file = tmp_path / "export.txt"
+    return Pipeline([
+        Stage("source", _source, files=(str(input_file),), params={"path": str(input_file)}, cache=False),
+        Stage("export", _export, inputs=("source",), params={"path": str(export_file)}, outputs=(str(export_file),)),
+    ], cache_dir=str(tmp_path / "cache"))
+
+def test_missing_or_changed_output_reruns_stage(tmp_path, input_file):
+    _pipeline_with_outputs(tmp_path, input_file).run()
+    calls.clear()
+
+    # Ergebnis und Datei unverändert: die Stufe ohne Cache wird gar nicht gebraucht
+    pipeline = _pipeline_with_outputs(tmp_path, input_file)
+    pipeline.run()
+    assert calls == []
+    assert pipeline.last_run == {"source": "cached", "export": "loaded"}
+    assert not list((tmp_path / "cache").glob("source-*"))
+
+    (tmp_path / "export.txt").unlink()
+    pipeline.run()
+    assert calls == ["source", "export"]
+    assert (tmp_path / "export.txt").read_text() == "5"
+
+    calls.clear()
+    (tmp_path / "export.txt").write_text("geändert, länger")
+    pipeline.run()
+    assert calls == ["source", "export"]
+
+def test_deleted_cleaned_data_reruns_cleaned(tmp_path):
+    data_folder = str(tmp_path / "data")
+    generate_sources(data_folder, n_cities=3, n_days=10)
+    pipeline = build_pipeline(data_folder=data_folder, cache_dir=str(tmp_path / "cache"))
+    with fake_meteostat(n_stations=10):
+        pipeline.run(targets=["cleaned"])
+        assert not list((tmp_path / "cache").glob("raw-*"))
+
+        pipeline.run(targets=["cleaned"])
+        assert pipeline.last_run["cleaned"] == "loaded" and pipeline.last_run["raw"] == "cached"
+
+        shutil.rmtree(tmp_path / "data" / "cleaned_data.parquet")
+        pipeline.run(targets=["cleaned"])
+    assert pipeline.last_run["cleaned"] == "ran" and pipeline.last_run["raw"] == "ran"
+    assert pipeline.last_run["merged"] == "loaded"
+    assert (tmp_path / "data" / "cleaned_data.parquet").is_dir()
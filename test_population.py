@@ -0,0 +1,81 @@
+import sys
+import numpy as np
+import pandas as pd
+sys.path.append('.')
+from unittest.mock import patch
+from population import PopulationLookup, load_population
+from data_preparation import population_data
+
+class CountingLookup(PopulationLookup):
+    """Merkt sich, wie viele Paare je Abfrage gesucht werden"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+
+    def lookup(self, cities, years):
+        self.calls.append(len(cities))
+        return super().lookup(cities, years)
+
+def _lookup():
+    return CountingLookup(
+        cities=['Hamburg', 'Hamburg', 'Hamburg', 'Berlin', 'Berlin'],
+        years=[2011, 2016, 2016, 2019, 2012],
+        values=[1800000, 1810000, 999, 3600000, 3400000])
+
+def test_lookup_nearest_year():
+    lookup = _lookup()
+
+    result = lookup.lookup(['Hamburg', 'Hamburg', 'Hamburg', 'Berlin', 'Berlin', 'Berlin'],
+                           [2010, 2015, 2020, 2011, 2016, 2024])
+
+    # vor dem ersten Jahr -> erstes Jahr, sonst letztes Jahr davor
+    assert result.tolist() == [1800000, 1800000, 1810000, 3400000, 3400000, 3600000]
+
+def test_lookup_unknown_city():
+    result = _lookup().lookup(['Atlantis', 'Hamburg'], [2020, 2016])
+    assert np.isnan(result[0])
+    assert result[1] == 1810000
+
+def test_lookup_empty_table():
+    lookup = PopulationLookup([], [], [])
+    assert np.isnan(lookup.lookup(['Hamburg'], [2020])).all()
+
+def test_population_data_scales_with_pairs():
+    test_df = pd.DataFrame({
+        'City': ['Hamburg'] * 3 + ['Berlin'] * 2 + ['Atlantis'],
+        'Year': [2019, 2019, 2010, 2020, 2012, 2020],
+        'pm25': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+    })
+
+    lookup = _lookup()
+    result = population_data(test_df, lookup=lookup)
+
+    # eine Abfrage über die 5 eindeutigen (City, Year)-Paare
+    assert lookup.calls == [5]
+    assert result['City'].tolist() == test_df['City'].tolist()
+    assert result['Population'].tolist()[:5] == [1810000, 1810000, 1800000, 3600000, 3400000]
+    assert np.isnan(result['Population'].iloc[5])
+    assert 'Pm25' in result.columns
+
+@patch('pandas.read_csv')
+def test_load_population(mock_read_csv):
+    mock_read_csv.return_value = pd.DataFrame({
+        'City': ['Berlin', 'Berlin', None],
+        'Value': [3500000.0, 3600000.0, 1.0],
+        'Year': [2015.0, 2020.0, 2020.0],
+    })
+
+    lookup = load_population('missing.csv')
+
+    assert len(lookup) == 1
+    assert lookup.lookup(['Berlin'], [2019]).tolist() == [3500000]
+
+def test_population_data_writes_csv_only_on_request(tmp_path):
+    test_df = pd.DataFrame({'City': ['Hamburg'], 'Year': [2016]})
+
+    population_data(test_df, lookup=_lookup())
+    assert not list(tmp_path.iterdir())
+
+    output_path = tmp_path / 'population_data.csv'
+    population_data(test_df, lookup=_lookup(), output_path=str(output_path))
+    assert output_path.exists()
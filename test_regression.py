@@ -0,0 +1,67 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+sys.path.append('.')
+from features import build_features
+from regression import SPECIFICATIONS, compare_effects, fit_cities, fit_specifications
+
+def _features(n_cities=5, days=400, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2022-01-01', periods=days)
+    frames = []
+    for i in range(n_cities):
+        df = pd.DataFrame({'Year': dates.year, 'Month': dates.month, 'Day': dates.day, 'City': f'Stadt{i}',
+                           'Tavg': rng.uniform(-5, 30, days), 'Humidity': rng.uniform(30, 100, days),
+                           'Prcp': rng.exponential(2, days), 'Wspd': rng.uniform(0, 30, days),
+                           'Pres': rng.normal(1013, 8, days), 'No2': rng.uniform(0, 50, days),
+                           'O3': rng.uniform(0, 80, days), 'So2': rng.uniform(0, 8, days)})
+        df['Pm25'] = (20 + i - 0.5 * df['Wspd'] + 0.1 * df['Humidity'] + 0.3 * df['No2']
+                      + rng.normal(0, 3, days))
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+    df.loc[df.sample(frac=0.03, random_state=1).index, 'Pm25'] = np.nan
+    return build_features(df)
+
+def _statsmodels(features, city, regressors):
+    df = features[features['City'] == city][['Pm25'] + regressors].dropna().astype(float)
+    return sm.OLS(df['Pm25'], sm.add_constant(df[regressors])).fit()
+
+def test_fit_cities_matches_statsmodels():
+    features = _features()
+    for name in ['ols', 'split', 'season', 'final']:
+        regressors = SPECIFICATIONS[name]
+        result = fit_cities(features, regressors)
+        assert len(result) == 5 * (len(regressors) + 1)
+        for city in ['Stadt0', 'Stadt3']:
+            expected = _statsmodels(features, city, regressors)
+            rows = result[result['City'] == city].set_index('Term')
+            np.testing.assert_allclose(rows['Coef'], expected.params[rows.index], rtol=1e-6, atol=1e-8)
+            np.testing.assert_allclose(rows['StdErr'], expected.bse[rows.index], rtol=1e-6)
+            np.testing.assert_allclose(rows['PValue'], expected.pvalues[rows.index], rtol=1e-5, atol=1e-12)
+            assert np.isclose(rows['R2'].iloc[0], expected.rsquared)
+            assert np.isclose(rows['AdjR2'].iloc[0], expected.rsquared_adj)
+            assert rows['NObs'].iloc[0] == expected.nobs
+
+def test_cities_with_too_few_rows_or_singular_matrix_are_skipped():
+    features = _features(3)
+    features.loc[features['City'] == 'Stadt1', 'Pres'] = np.float32(1000)   # konstant -> singulär
+    stadt2 = features.index[features['City'] == 'Stadt2']
+    features.loc[stadt2[5:], "Pm25"] = np.nan                                # zu wenige Zeilen
+    result = fit_cities(features, SPECIFICATIONS['ols'])
+    assert set(result['City']) == {'Stadt0'}
+
+def test_fit_specifications_and_effects():
+    results = fit_specifications(_features())
+    assert set(results['Model']) == set(SPECIFICATIONS)
+    effects = compare_effects(results, 'Wspd')
+    assert len(effects) == 5
+    assert np.allclose(effects['Coef'], -0.5, atol=0.1)
+
+def test_many_cities_in_seconds():
+    features = _features(n_cities=300, days=730, seed=2)
+    start = time.perf_counter()
+    results = fit_specifications(features)
+    assert time.perf_counter() - start < 10
+    assert results['City'].nunique() == 300
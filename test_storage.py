@@ -0,0 +1,88 @@
+import os
+import sys
+import pandas as pd
+sys.path.append('.')
+from storage import write_dataset, read_dataset, load_cleaned, dataset_path, upsert_dataset
+
+def _cleaned_frame():
+    return pd.DataFrame({
+        'Year': [2019, 2019, 2020, 2020, 2020],
+        'Month': [1, 1, 2, 2, 3],
+        'Day': [1, 2, 1, 1, 5],
+        'Country': ['DE', 'DE', 'DE', 'US', 'US'],
+        'City': ['Hamburg', 'Hamburg', 'Berlin', 'Atlanta', 'Atlanta'],
+        'Pm25': [10.0, 11.0, 12.0, 13.0, 14.0],
+        'No2': [1.0, 2.0, 3.0, 4.0, 5.0],
+    })
+
+def test_write_dataset_partitions(tmp_path):
+    path = write_dataset(_cleaned_frame(), 'cleaned_data', data_folder=str(tmp_path))
+
+    assert os.path.isdir(os.path.join(path, 'Year=2019', 'Country=DE'))
+    assert os.path.isdir(os.path.join(path, 'Year=2020', 'Country=US'))
+    assert not os.path.exists(tmp_path / 'cleaned_data.csv')
+
+def test_load_cleaned_projection_and_filter(tmp_path):
+    write_dataset(_cleaned_frame(), 'cleaned_data', data_folder=str(tmp_path))
+
+    result = load_cleaned(['Year', 'Month', 'Day', 'City', 'Pm25'], cities=['Hamburg', 'Atlanta'],
+                          data_folder=str(tmp_path))
+
+    assert list(result.columns) == ['Year', 'Month', 'Day', 'City', 'Pm25']
+    assert set(result['City']) == {'Hamburg', 'Atlanta'}
+    assert len(result) == 4
+    assert result['Year'].dtype.kind == 'i'
+
+def test_read_dataset_year_filter(tmp_path):
+    write_dataset(_cleaned_frame(), 'cleaned_data', data_folder=str(tmp_path))
+
+    result = read_dataset('cleaned_data', filters=[('Year', '=', 2020), ('Country', '=', 'US')],
+                          data_folder=str(tmp_path))
+
+    assert sorted(result['Pm25']) == [13.0, 14.0]
+
+def test_write_dataset_raw_with_csv(tmp_path):
+    raw = pd.DataFrame({
+        'Date': pd.to_datetime(['2019-12-31', '2020-01-01']),
+        'Country': ['DE', 'DE'],
+        'City': ['Hamburg', 'Hamburg'],
+        'Specie': ['pm25', 'pm25'],
+        'median': [10.0, 12.0],
+    })
+
+    write_dataset(raw, 'raw', data_folder=str(tmp_path), csv=True)
+
+    assert os.path.isdir(os.path.join(dataset_path('raw', str(tmp_path)), 'Year=2020'))
+    assert (tmp_path / 'raw.csv').exists()
+    result = read_dataset('raw', columns=['Date', 'median'], filters=[('Year', '=', 2019)],
+                          data_folder=str(tmp_path))
+    assert result['median'].tolist() == [10.0]
+
+def test_write_dataset_replace_partitions(tmp_path):
+    write_dataset(_cleaned_frame(), 'cleaned_data', data_folder=str(tmp_path))
+    update = _cleaned_frame().query('Year == 2020 and Country == "US"').assign(Pm25=99.0)
+
+    write_dataset(update, 'cleaned_data', data_folder=str(tmp_path), overwrite=False)
+
+    result = read_dataset('cleaned_data', data_folder=str(tmp_path))
+    assert len(result) == 5
+    assert result.loc[result['City'] == 'Atlanta', 'Pm25'].tolist() == [99.0, 99.0]
+
+def test_upsert_dataset(tmp_path):
+    keys = ['Year', 'Month', 'Day', 'Country', 'City']
+    write_dataset(_cleaned_frame(), 'cleaned_data', data_folder=str(tmp_path))
+
+    update = pd.DataFrame({'Year': [2020, 2020], 'Month': [3, 3], 'Day': [5, 6], 'Country': ['US', 'US'],
+                           'City': ['Atlanta', 'Atlanta'], 'Pm25': [50.0, 60.0], 'Extra': [1, 2]})
+    remove = _cleaned_frame().query('Country == "DE" and Year == 2019')[keys]
+
+    inserted, replaced = upsert_dataset(update, 'cleaned_data', keys, remove=remove, data_folder=str(tmp_path))
+
+    result = read_dataset('cleaned_data', data_folder=str(tmp_path))
+    assert (inserted, replaced) == (2, 3)
+    assert len(result) == 4
+    assert 'Extra' not in result.columns
+    assert sorted(result.loc[result['City'] == 'Atlanta', 'Pm25']) == [13.0, 50.0, 60.0]
+    # Partition 2019/DE ist leer und wird entfernt, 2020/DE bleibt unverändert
+    assert not os.path.exists(os.path.join(dataset_path('cleaned_data', str(tmp_path)), 'Year=2019'))
+    assert result.loc[result['City'] == 'Berlin', 'Pm25'].tolist() == [12.0]
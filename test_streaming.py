@@ -0,0 +1,107 @@
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch, MagicMock
+sys.path.append('.')
+from data_preparation import data_import, data_cleaning
+from gazetteer import build_gazetteer
+from population import PopulationLookup
+from storage import read_dataset
+from streaming import stream_cleaning, chunk_rows, partial_aggregates, merge_partials, SeenRows
+from weather_cache import WeatherCache
+
+CITIES = [("DE", "Berlin"), ("DE", "Hamburg"), ("FR", "Paris"), ("US", "Atlanta")]
+
+def _raw_file(path, start, days, seed):
+    """Rohdatei mit doppelten Zeilen (auch weit auseinander) und einer fast leeren Messgröße (co)"""
+    rng = np.random.default_rng(seed)
+    lines = ["# comment", "Date,Country,City,Specie,count,min,max,median,variance"]
+    for date in pd.date_range(start, periods=days):
+        for country, city in CITIES:
+            for specie in ["pm25", "no2", "o3", "humidity", "pressure"]:
+                for _ in range(rng.integers(1, 3)):
+                    lines.append(f"{date.date()},{country},{city},{specie},3,1,9,{rng.uniform(0, 50):.1f},1")
+            if rng.random() < 0.05:
+                lines.append(f"{date.date()},{country},{city},co,3,1,9,{rng.uniform(0, 5):.1f},1")
+    lines += lines[2:40]
+    path.write_text("\n".join(lines) + "\n")
+
+def _fetch_daily(station_id, start, end):
+    index = pd.date_range(start, end, freq='D', name='time')
+    value = float(int(station_id) % 7)
+    data = pd.DataFrame({col: value for col in ['tavg', 'tmin', 'tmax', 'prcp', 'wdir', 'wspd', 'pres']}, index=index)
+    return MagicMock(fetch=MagicMock(return_value=data))
+
+@pytest.fixture
+def sources(tmp_path):
+    _raw_file(tmp_path / 'waqi-covid-2019.csv', '2019-11-20', 60, 1)    # reicht bis 2020
+    _raw_file(tmp_path / 'waqi-covid-2020Q2.csv', '2020-04-01', 30, 2)
+    _raw_file(tmp_path / 'waqi-covid-2021Q1.csv', '2021-01-01', 20, 3)
+
+    gazetteer = build_gazetteer(pd.DataFrame({
+        'Country': ['DE', 'DE', 'FR', 'US'], 'City': ['Berlin', 'Hamburg', 'Paris', 'Atlanta'],
+        'Latitude': [52.5, 53.55, 48.85, 33.75], 'Longitude': [13.4, 10.0, 2.35, -84.39]}))
+    catalog = pd.DataFrame({'latitude': [52.4, 53.6, 48.7], 'longitude': [13.3, 9.9, 2.4]},
+                           index=['10384', '10147', '07150'])
+    population = PopulationLookup(['Berlin', 'Hamburg', 'Paris'], [2019, 2020, 2018], [3.6e6, 1.8e6, 2.1e6])
+
+    with patch('data_preparation.load_gazetteer', return_value=gazetteer), \
+         patch('data_preparation.Stations') as mock_stations, \
+         patch('data_preparation.Daily', side_effect=_fetch_daily), \
+         patch('data_preparation.load_population', return_value=population):
+        mock_stations.return_value.fetch.return_value = catalog
+        yield tmp_path
+
+def _sorted(df):
+    return df.sort_values(['Year', 'Month', 'Day', 'Country', 'City']).reset_index(drop=True)
+
+def test_stream_cleaning_matches_in_memory(sources):
+    with patch('data_preparation.write_dataset'):
+        expected = data_cleaning(data_import(data_folder=str(sources), max_workers=1),
+                                 weather_cache=WeatherCache(str(sources / 'weather_a')))
+
+    # kleines Budget: jede Datei wird in mehreren Blöcken gelesen
+    stream_cleaning(data_folder=str(sources), memory_budget=1000 * 512,
+                    weather_cache=WeatherCache(str(sources / 'weather_b')))
+    result = read_dataset('cleaned_data', data_folder=str(sources))
+
+    assert chunk_rows(1000 * 512) == 1000
+    assert 'Co' not in expected.columns
+    assert sorted(result.columns) == sorted(expected.columns)
+    pd.testing.assert_frame_equal(_sorted(result[expected.columns]), _sorted(expected),
+                                  check_dtype=False, check_categorical=False)
+    assert not (sources / 'stream_partials').exists()
+
+def test_merge_partials_matches_whole():
+    raw = pd.DataFrame({
+        'Date': pd.to_datetime(['2020-01-01'] * 4 + ['2020-01-02'] * 2),
+        'Country': ['DE'] * 6,
+        'City': ['Berlin', 'Berlin', 'Berlin', 'Hamburg', 'Berlin', 'Berlin'],
+        'Specie': ['pm25', 'pm25', 'no2', 'pm25', 'pm25', 'o3'],
+        'median': [10.0, 20.0, 5.0, 7.0, 3.0, np.nan],
+    })
+    partials = pd.concat([partial_aggregates(raw.iloc[:3]), partial_aggregates(raw.iloc[3:])])
+
+    merged = merge_partials(partials)
+    whole = merge_partials(partial_aggregates(raw))
+
+    pd.testing.assert_frame_equal(merged, whole)
+    assert merged.loc[0, 'pm25'] == 15.0
+    assert np.isnan(merged.loc[2, 'o3'])
+
+def test_seen_rows_spills_and_matches_drop_duplicates(tmp_path):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'City': rng.choice(['Berlin', 'Paris'], 3000), 'median': rng.integers(0, 800, 3000)})
+    seen = SeenRows(str(tmp_path / 'seen'), max_bytes=2000)
+
+    # Block für Block, Duplikate auch über Blockgrenzen hinweg
+    kept = pd.concat([block[seen.first_seen(block)] for block in (df.iloc[i:i + 300] for i in range(0, len(df), 300))])
+    pd.testing.assert_frame_equal(kept, df.drop_duplicates())
+    # höchstens max_bytes im Speicher, der Rest liegt in sortierten Läufen auf der Platte
+    assert seen.memory.nbytes <= 2000
+    assert len(seen.runs) > 1
+    assert all((np.diff(run) > 0).all() for run in seen.runs)
+
+    seen.close()
+    assert not (tmp_path / 'seen').exists()
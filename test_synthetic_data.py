@@ -0,0 +1,58 @@
+import os
+import sys
+import pytest
+import pandas as pd
+sys.path.append('.')
+from synthetic_data import generate_sources, fake_meteostat, scale_size, SPECIE_RANGES, BASE_CITIES
+from data_preparation import data_import, weather_data
+from benchmarks import bench_stages, compare_baseline, compare_and_save, save_baseline, load_baseline
+
+def test_scale_size():
+    assert scale_size(1) == (BASE_CITIES, 365)
+    assert scale_size(10, 30) == (10 * BASE_CITIES, 30)
+
+def test_generate_sources_readable(tmp_path):
+    cities = generate_sources(str(tmp_path), n_cities=5, n_days=100)
+    files = sorted(os.listdir(tmp_path))
+    assert "airquality-covid19-cities.json" in files and "population.csv" in files
+    assert [f for f in files if f.startswith("waqi-covid-")] == ["waqi-covid-2019Q1.csv", "waqi-covid-2019Q2.csv"]
+
+    df = data_import(data_folder=str(tmp_path), max_workers=1)
+    # doppelte Zeilen sind entfernt, je Tag, Stadt und Specie genau eine Zeile
+    assert len(df) == 5 * 100 * len(SPECIE_RANGES)
+    assert set(df["City"].astype(str)) == set(cities["City"])
+    assert "wind-speed" in set(df["Specie"].astype(str))
+
+def test_fake_meteostat_offline():
+    df = pd.DataFrame({'City': ['a', 'b'], 'Date': pd.to_datetime(['2020-01-01', '2020-01-02']),
+                       'Latitude': [50.0, -20.0], 'Longitude': [8.0, 30.0]})
+    with fake_meteostat(n_stations=20) as fake:
+        result = weather_data(df, max_workers=1)
+    assert fake.calls == 2
+    assert result['tavg'].notna().all()
+
+def test_bench_stages_and_compare():
+    result = bench_stages(n_cities=3, n_days=20)
+    assert result["stages"]["data_cleaning"]["rows_out"] == 3 * 20
+    assert result["meteostat_calls"] > 0
+    # Meteostat ist simuliert, der Wetter-Cache davor schreibt echte Dateien
+    assert result["weather_cache"]["stations"] > 0 and result["weather_cache"]["bytes"] > 0
+
+    baseline = {"settings": result["settings"],
+                "stages": {name: dict(stage) for name, stage in result["stages"].items()}}
+    baseline["stages"]["weather_data"].update(seconds=0.01, peak_mb=result["stages"]["weather_data"]["peak_mb"])
+    result["stages"]["weather_data"]["seconds"] = 1.0
+
+    comparison = compare_baseline(result, baseline)
+    regressions = comparison[comparison["Regression"]]
+    assert list(zip(regressions["Stage"], regressions["Metric"])) == [("weather_data", "seconds")]
+
+def test_compare_then_save(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    old = {"settings": {}, "stages": {"weather_data": {"seconds": 0.1, "peak_mb": 1.0}}}
+    new = {"settings": {}, "stages": {"weather_data": {"seconds": 1.0, "peak_mb": 1.0}}}
+    save_baseline(old, path)
+    # Regression gegen die alte Baseline, die neue wird trotzdem gespeichert
+    assert compare_and_save(new, compare=path, save=path)
+    assert load_baseline(path) == new
+    assert not compare_and_save(new, compare=path)
@@ -0,0 +1,89 @@
+import sys
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+from statsmodels.tsa.seasonal import seasonal_decompose
+sys.path.append('.')
+import trends
+from trends import monthly_series, run_trends, load_trends
+
+def _monthly():
+    rng = np.random.default_rng(0)
+    months = pd.date_range('2019-01-01', '2023-12-01', freq='MS')
+    frames = []
+    for city in ['Delhi', 'Tokyo']:
+        season = 10 * np.sin(2 * np.pi * months.month / 12)
+        frames.append(pd.DataFrame({'City': city, 'Jahr_Monat': months,
+                                    'Pm25': 50 + season + rng.normal(0, 1, len(months)),
+                                    'No2': 20 + rng.normal(0, 1, len(months))}))
+    # Osaka: nur 12 Monate, zu wenig für period=12
+    frames.append(pd.DataFrame({'City': 'Osaka', 'Jahr_Monat': months[:12],
+                                'Pm25': rng.uniform(0, 10, 12), 'No2': rng.uniform(0, 10, 12)}))
+    df = pd.concat(frames, ignore_index=True)
+    # Lücke in Tokyo/No2: zu geringe Abdeckung
+    df.loc[(df['City'] == 'Tokyo') & (df['Jahr_Monat'].dt.year < 2022), 'No2'] = np.nan
+    df.loc[(df['City'] == 'Tokyo') & df['Jahr_Monat'].dt.month.isin([6, 7, 8]), 'No2'] = np.nan
+    return df
+
+def test_monthly_series_coverage():
+    series = monthly_series(_monthly(), pollutants=['Pm25', 'No2'])
+    assert sorted(series) == [('Delhi', 'No2'), ('Delhi', 'Pm25'), ('Tokyo', 'Pm25')]
+
+def test_run_trends_matches_seasonal_decompose(tmp_path):
+    monthly = _monthly()
+    df = run_trends(monthly, path=str(tmp_path / 'trends.parquet'), pollutants=['Pm25', 'No2'], max_workers=2,
+                    batch_size=1)
+
+    assert df['Trend'].dtype == np.float32
+    delhi = monthly[monthly['City'] == 'Delhi'].set_index('Jahr_Monat')['Pm25']
+    expected = seasonal_decompose(delhi, model='additive', period=12)
+    result = df[(df['City'] == 'Delhi') & (df['Pollutant'] == 'Pm25')]
+    np.testing.assert_allclose(result['Trend'], expected.trend, rtol=1e-5)
+    np.testing.assert_allclose(result['Seasonal'], expected.seasonal, rtol=1e-5)
+    np.testing.assert_allclose(result['Resid'], expected.resid, rtol=1e-4, atol=1e-5)
+
+    stored, digests = load_trends(str(tmp_path / 'trends.parquet'))
+    pd.testing.assert_frame_equal(stored, df)
+    assert sorted(digests) == ['Delhi|No2', 'Delhi|Pm25', 'Tokyo|Pm25']
+
+def test_only_changed_series_are_recomputed(tmp_path):
+    path = str(tmp_path / 'trends.parquet')
+    monthly = _monthly()
+    first = run_trends(monthly, path=path, pollutants=['Pm25', 'No2'], max_workers=1)
+
+    with patch('trends.decompose_series', wraps=trends.decompose_series) as decompose:
+        second = run_trends(monthly, path=path, pollutants=['Pm25', 'No2'], max_workers=1)
+        assert decompose.call_count == 0
+        pd.testing.assert_frame_equal(first, second)
+
+        monthly.loc[(monthly['City'] == 'Tokyo') & (monthly['Jahr_Monat'] == '2023-12-01'), 'Pm25'] += 5
+        third = run_trends(monthly, path=path, pollutants=['Pm25', 'No2'], max_workers=1)
+        assert decompose.call_count == 1
+
+    unchanged = first[first['City'] == 'Delhi'].reset_index(drop=True)
+    pd.testing.assert_frame_equal(third[third['City'] == 'Delhi'].reset_index(drop=True), unchanged)
+    tokyo = third[third['City'] == 'Tokyo']
+    assert tokyo['Observed'].iloc[-1] == np.float32(first[first['City'] == 'Tokyo']['Observed'].iloc[-1] + 5)
+
+def test_missing_months_keep_seasonal_phase(tmp_path):
+    months = pd.date_range('2019-01-01', '2023-12-01', freq='MS')
+    season = 10 * np.sin(2 * np.pi * months.month / 12)
+    monthly = pd.DataFrame({'City': 'Delhi', 'Jahr_Monat': months, 'Pm25': 50 + season})
+    # einzelne und doppelte Lücken, ohne Auffüllen verschiebt sich die Saisonphase
+    gaps = pd.to_datetime(['2020-03-01', '2021-07-01', '2021-08-01', '2022-11-01'])
+    monthly = monthly[~monthly['Jahr_Monat'].isin(gaps)]
+
+    series = monthly_series(monthly, pollutants=['Pm25'])[('Delhi', 'Pm25')]
+    assert len(series) == len(months) and series.isna().sum() == len(gaps)
+
+    df = run_trends(monthly, path=str(tmp_path / 'trends.parquet'), pollutants=['Pm25'], max_workers=1)
+    assert list(df['Datum']) == list(months)
+    assert df.loc[df['Datum'].isin(gaps), 'Observed'].isna().all()
+    np.testing.assert_allclose(df['Seasonal'], season, atol=0.5)
+
+def test_long_gap_is_skipped():
+    months = pd.date_range('2019-01-01', '2023-12-01', freq='MS')
+    monthly = pd.DataFrame({'City': 'Delhi', 'Jahr_Monat': months, 'Pm25': np.arange(len(months), dtype=float)})
+    # 3 Monate am Stück fehlen, die Abdeckung läge mit 95% noch über MIN_COVERAGE
+    monthly.loc[monthly['Jahr_Monat'].between('2021-04-01', '2021-06-01'), 'Pm25'] = np.nan
+    assert monthly_series(monthly, pollutants=['Pm25']) == {}
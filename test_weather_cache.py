@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+sys.path.append('.')
+from datetime import datetime, timedelta
+from weather_cache import WeatherCache
+
+class FakeDaily:
+    """Ersetzt Daily(...).fetch() und merkt sich die angefragten Zeiträume"""
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, start, end):
+        self.calls.append((start, end))
+        index = pd.date_range(start, end, freq='D', name='time')
+        return pd.DataFrame({'tavg': np.arange(len(index), dtype=float), 'prcp': 0.5}, index=index)
+
+def test_cache_miss_then_hit(tmp_path):
+    fetch = FakeDaily()
+    cache = WeatherCache(str(tmp_path))
+
+    first = cache.get('10147', datetime(2015, 1, 1), datetime(2024, 12, 31), fetch)
+    second = WeatherCache(str(tmp_path)).get('10147', datetime(2015, 1, 1), datetime(2024, 12, 31), fetch)
+
+    assert len(fetch.calls) == 1
+    assert len(first) == len(pd.date_range('2015-01-01', '2024-12-31'))
+    # Datentypen wie abgerufen (float32 erst in station_weather(compact=True))
+    assert first['tavg'].dtype == 'float64'
+    pd.testing.assert_frame_equal(first, second, check_freq=False)
+    assert cache.coverage('10147') == (pd.Timestamp('2015-01-01'), pd.Timestamp('2024-12-31'))
+
+def test_cache_fetches_only_missing_tail(tmp_path):
+    fetch = FakeDaily()
+    cache = WeatherCache(str(tmp_path))
+    cache.get('10147', datetime(2015, 1, 1), datetime(2024, 12, 31), fetch)
+
+    result = cache.get('10147', datetime(2015, 1, 1), datetime(2025, 3, 31), fetch)
+
+    assert fetch.calls[1] == (datetime(2025, 1, 1), datetime(2025, 3, 31))
+    assert result.index.min() == pd.Timestamp('2015-01-01')
+    assert result.index.max() == pd.Timestamp('2025-03-31')
+    assert result.index.is_unique
+
+def test_cache_subrange(tmp_path):
+    fetch = FakeDaily()
+    cache = WeatherCache(str(tmp_path))
+    cache.get('10147', datetime(2015, 1, 1), datetime(2024, 12, 31), fetch)
+
+    result = cache.get('10147', datetime(2020, 2, 1), datetime(2020, 2, 29), fetch)
+
+    assert len(fetch.calls) == 1
+    assert len(result) == 29
+
+def test_cache_recent_days_are_refetched(tmp_path):
+    fetch = FakeDaily()
+    cache = WeatherCache(str(tmp_path), recent_days=7)
+    today = pd.Timestamp.today().normalize()
+
+    cache.get('10147', today - timedelta(days=30), today, fetch)
+    cache.get('10147', today - timedelta(days=30), today, fetch)
+
+    assert len(fetch.calls) == 2
+    assert pd.Timestamp(fetch.calls[1][0]) == today - timedelta(days=6)
+
+def test_cache_size_limit_and_evict(tmp_path):
+    fetch = FakeDaily()
+    cache = WeatherCache(str(tmp_path))
+    cache.get('A', datetime(2015, 1, 1), datetime(2024, 12, 31), fetch)
+    one_station = cache.total_bytes()
+
+    limited = WeatherCache(str(tmp_path), max_bytes=int(one_station * 1.5))
+    limited.get('B', datetime(2015, 1, 1), datetime(2024, 12, 31), fetch)
+
+    assert limited.coverage('A') is None
+    assert not os.path.exists(tmp_path / 'A.parquet')
+    assert limited.coverage('B') is not None
+
+    assert limited.evict(['B']) == ['B']
+    assert limited.coverage('B') is None
+    assert limited.total_bytes() == 0
+
+def test_cache_hit_saves_index_once(tmp_path):
+    fetch = FakeDaily()
+    WeatherCache(str(tmp_path)).get('A', datetime(2020, 1, 1), datetime(2020, 12, 31), fetch)
+    index = tmp_path / 'index.json'
+    before = json.loads(index.read_text())
+
+    # Treffer schreiben index.json nicht, erst flush()
+    cache = WeatherCache(str(tmp_path))
+    cache.get('A', datetime(2020, 1, 1), datetime(2020, 12, 31), fetch)
+    assert json.loads(index.read_text()) == before
+    cache.flush()
+    assert json.loads(index.read_text())['A']['last_access'] > before['A']['last_access']
+    assert len(fetch.calls) == 1
+
+def test_cache_hit_after_concurrent_evict(tmp_path, monkeypatch):
+    fetch = FakeDaily()
+    cache = WeatherCache(str(tmp_path))
+    cache.get('A', datetime(2020, 1, 1), datetime(2020, 12, 31), fetch)
+
+    # ein anderer Thread entfernt die Station zwischen Index-Abfrage und Lesen der Datei
+    read = cache._read
+    def read_after_evict(station_id):
+        cache.evict([station_id])
+        return read(station_id)
+    monkeypatch.setattr(cache, "_read", read_after_evict)
+
+    result = cache.get('A', datetime(2020, 1, 1), datetime(2020, 12, 31), fetch)
+    assert len(fetch.calls) == 2
+    assert len(result) == 366
+    assert cache.coverage('A') == (pd.Timestamp('2020-01-01'), pd.Timestamp('2020-12-31'))
@@ -0,0 +1,144 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+from statsmodels.tsa.seasonal import seasonal_decompose
+from dashboard_data import POLLUTANTS
+
+# Zeitreihenzerlegung (Trend, Saison, Rest) der Monatsmittel für alle Städte und Schadstoffe
+# wie in 6_time_series.ipynb: additives Modell, period=12. Jede Reihe wird auf alle Monate zwischen
+# erstem und letztem Wert erweitert, damit die Saisonphase stimmt; kurze Lücken (bis MAX_GAP Monate)
+# werden für die Zerlegung linear interpoliert, Reihen mit längeren Lücken ausgelassen.
+# Eingabe ist der Monatswürfel des Dashboards (City, Jahr_Monat, Schadstoffe).
+# Ergebnis ist eine Parquet-Datei; je Reihe wird ein Hash der Eingabe in den Metadaten
+# gespeichert, beim nächsten Lauf werden nur Reihen mit geänderten Monatswerten neu zerlegt.
+
+TRENDS_FILE = './data/trends.parquet'
+PERIOD = 12
+# genug Abdeckung: mindestens zwei volle Zyklen und 80% der Monate zwischen erstem und letztem Wert,
+# höchstens MAX_GAP fehlende Monate am Stück
+MIN_MONTHS = 2 * PERIOD
+MIN_COVERAGE = 0.8
+MAX_GAP = 2
+DIGEST_KEY = b"trend_digests"
+
+def monthly_series(monthly, pollutants=POLLUTANTS, start_year=None, end_year=None):
+    """
+    {(Stadt, Schadstoff): Monatsreihe} für alle Reihen mit genug Abdeckung
+    Jede Reihe hat einen lückenlosen Monatsindex (freq MS); fehlende Monate sind NaN.
+    """
+    monthly = monthly.reindex(columns=["City", "Jahr_Monat"] + list(pollutants))
+    months = pd.to_datetime(monthly["Jahr_Monat"])
+    keep = pd.Series(True, index=monthly.index)
+    if start_year is not None:
+        keep &= months.dt.year >= start_year
+    if end_year is not None:
+        keep &= months.dt.year <= end_year
+    monthly = monthly[keep].assign(Jahr_Monat=months[keep]).sort_values(["City", "Jahr_Monat"])
+
+    series = {}
+    for city, group in monthly.groupby(monthly["City"].astype(object), sort=True):
+        index = pd.DatetimeIndex(group["Jahr_Monat"])
+        for pollutant in pollutants:
+            values = pd.Series(group[pollutant].to_numpy(dtype=np.float64), index=index, name=pollutant).dropna()
+            if len(values) < MIN_MONTHS:
+                continue
+            full = values.reindex(pd.date_range(values.index[0], values.index[-1], freq='MS'))
+            if len(values) / len(full) >= MIN_COVERAGE and _longest_gap(full) <= MAX_GAP:
+                series[(city, pollutant)] = full
+    return series
+
+def _longest_gap(values):
+    """Längste Folge fehlender Monate"""
+    missing = values.isna()
+    if not missing.any():
+        return 0
+    return int(missing.groupby((~missing).cumsum()).sum().max())
+
+def series_digest(values):
+    """Hash über Monate und Werte einer Reihe"""
+    hashes = pd.util.hash_pandas_object(values, index=True).to_numpy()
+    return f"{int(np.add.reduce(hashes * np.arange(1, len(hashes) + 1, dtype=np.uint64))):016x}"
+
+def decompose_series(values, period=PERIOD):
+    """
+    seasonal_decompose einer Monatsreihe -> Datum, Observed, Trend, Seasonal, Resid
+    Fehlende Monate werden nur für die Zerlegung interpoliert, Observed bleibt dort NaN.
+    """
+    result = seasonal_decompose(values.interpolate(limit_area='inside'), model='additive', period=period)
+    return pd.DataFrame({
+        "Datum": values.index,
+        "Observed": values.to_numpy(),
+        "Trend": result.trend.to_numpy(),
+        "Seasonal": result.seasonal.to_numpy(),
+        "Resid": result.resid.to_numpy(),
+    })
+
+def _decompose_batch(batch):
+    """Worker: mehrere Reihen je Aufgabe, damit der Prozess-Overhead nicht überwiegt"""
+    return [(key, decompose_series(values)) for key, values in batch]
+
+def load_trends(path=TRENDS_FILE):
+    """Gespeicherte Zerlegung und Hashes je Reihe ("Stadt|Schadstoff" -> Hash)"""
+    if not os.path.exists(path):
+        return None, {}
+    metadata = pq.read_schema(path).metadata or {}
+    digests = json.loads(metadata.get(DIGEST_KEY, b"{}"))
+    return pd.read_parquet(path, engine="pyarrow"), digests
+
+def _write_trends(df, digests, path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[DIGEST_KEY] = json.dumps(digests, sort_keys=True).encode("utf-8")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+
+def _series_key(city, pollutant):
+    return f"{city}|{pollutant}"
+
+def run_trends(monthly, path=TRENDS_FILE, pollutants=POLLUTANTS, start_year=None, end_year=None,
+               max_workers=None, batch_size=16):
+    """
+    Zerlegt alle Reihen mit genug Abdeckung und speichert sie in path
+    - unveränderte Reihen (gleicher Hash) werden aus der bestehenden Datei übernommen
+    - die übrigen werden in Paketen zu batch_size Reihen auf einen Prozess-Pool verteilt
+    Ergebnis: City, Pollutant, Datum, Observed, Trend, Seasonal, Resid (kompakt: Kategorien, float32)
+    """
+    series = monthly_series(monthly, pollutants, start_year, end_year)
+    digests = {_series_key(*key): series_digest(values) for key, values in series.items()}
+    old, old_digests = load_trends(path)
+
+    todo = [(key, values) for key, values in series.items()
+            if old is None or old_digests.get(_series_key(*key)) != digests[_series_key(*key)]]
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(batches)) if batches else 1
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = [item for batch in pool.map(_decompose_batch, batches) for item in batch]
+    else:
+        results = [item for batch in batches for item in _decompose_batch(batch)]
+
+    frames = [frame.assign(City=city, Pollutant=pollutant) for (city, pollutant), frame in results]
+    if old is not None:
+        reused = {key for key in digests if key not in {_series_key(*key) for key, _ in todo}}
+        old_keys = old["City"].astype(str) + "|" + old["Pollutant"].astype(str)
+        frames.insert(0, old[old_keys.isin(reused)])
+    frames = [frame for frame in frames if not frame.empty]
+
+    columns = ["City", "Pollutant", "Datum", "Observed", "Trend", "Seasonal", "Resid"]
+    if frames:
+        df = pd.concat([frame[columns].astype({"City": object, "Pollutant": object}) for frame in frames],
+                       ignore_index=True)
+    else:
+        df = pd.DataFrame({col: pd.Series(dtype=object if col in ("City", "Pollutant") else float) for col in columns})
+    df = df.astype({"City": "category", "Pollutant": "category",
+                    **{col: "float32" for col in ["Observed", "Trend", "Seasonal", "Resid"]}})
+    df = df.sort_values(["City", "Pollutant", "Datum"]).reset_index(drop=True)
+
+    _write_trends(df, digests, path)
+    print(f"✅ Zeitreihenzerlegung: {len(todo)} von {len(series)} Reihen neu berechnet ({path})")
+    return df
@@ -0,0 +1,186 @@
+import os
+import json
+import threading
+import pandas as pd
+from datetime import datetime, timedelta
+
+# Cache der täglichen Meteostat-Daten je Station auf der Platte.
+# Jede Station liegt als eigene Parquet-Datei im Cache-Verzeichnis, die Datei index.json
+# merkt sich, welcher Zeitraum bereits abgedeckt ist. Bei einer Anfrage werden nur die
+# fehlenden Tage davor/danach nachgeladen (z. B. neue Tage in 2025).
+# Treffer ändern nur die Zugriffszeit im Speicher; index.json wird beim Nachladen,
+# beim Entfernen und mit flush() (einmal am Ende eines Laufs) geschrieben.
+
+WEATHER_CACHE_DIR = './data/weather_cache/'
+INDEX_FILE = "index.json"
+
+def _day(value):
+    return pd.Timestamp(value).normalize()
+
+class WeatherCache:
+    """
+    Wetterdaten-Cache mit Zeitraum je Station
+    - max_bytes: Obergrenze für die Gesamtgröße, älteste Zugriffe werden zuerst entfernt
+    - recent_days: die letzten Tage vor dem Abruf gelten als vorläufig und werden beim
+      nächsten Mal erneut geladen (Meteostat korrigiert frische Werte noch)
+    """
+
+    def __init__(self, cache_dir=WEATHER_CACHE_DIR, max_bytes=None, recent_days=7):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.recent_days = recent_days
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+        # Zugriffszeiten geändert, aber noch nicht gespeichert
+        self._dirty = False
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, INDEX_FILE)
+
+    def _data_path(self, station_id):
+        return os.path.join(self.cache_dir, f"{station_id}.parquet")
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self):
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self._index, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self._index_path())
+        self._dirty = False
+
+    def flush(self):
+        """Zugriffszeiten der Treffer speichern (einmal am Ende eines Laufs)"""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def coverage(self, station_id):
+        """Abgedeckter Zeitraum (start, end) oder None"""
+        entry = self._index.get(str(station_id))
+        if entry is None:
+            return None
+        return _day(entry["start"]), _day(entry["end"])
+
+    def stations(self):
+        """IDs aller Stationen im Cache"""
+        return sorted(self._index)
+
+    def total_bytes(self):
+        return sum(entry.get("size", 0) for entry in self._index.values())
+
+    def _read(self, station_id):
+        df = pd.read_parquet(self._data_path(station_id), engine="pyarrow")
+        return df.set_index("time")
+
+    def _write(self, station_id, data):
+        """Speichert die Daten einer Station, Index 'time' als Spalte (erst vollständig, dann umbenannt)"""
+        path = self._data_path(station_id)
+        tmp_path = path + ".tmp"
+        data.rename_axis("time").reset_index().to_parquet(tmp_path, engine="pyarrow", index=False)
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+
+    def _cached(self, station_id):
+        """
+        (Zeitraum, Daten) der Station aus dem Cache, sonst (None, None)
+        Die Zugriffszeit wird nur im Speicher gesetzt; wurde die Station gerade von einem
+        anderen Thread entfernt, zählt das als fehlender Eintrag.
+        """
+        with self._lock:
+            entry = self._index.get(station_id)
+            if entry is None:
+                return None, None
+            entry["last_access"] = datetime.now().isoformat()
+            self._dirty = True
+            covered = _day(entry["start"]), _day(entry["end"])
+        try:
+            return covered, self._read(station_id)
+        except FileNotFoundError:
+            return None, None
+
+    def get(self, station_id, start, end, fetch):
+        """
+        Tägliche Daten der Station für [start, end]
+        fetch(start, end) lädt einen fehlenden Zeitraum (DataFrame mit DatetimeIndex 'time').
+        """
+        station_id = str(station_id)
+        start, end = _day(start), _day(end)
+        covered, cached = self._cached(station_id)
+
+        if covered is None:
+            gaps = [(start, end)]
+        else:
+            gaps = []
+            if start < covered[0]:
+                gaps.append((start, covered[0] - timedelta(days=1)))
+            if end > covered[1]:
+                gaps.append((covered[1] + timedelta(days=1), end))
+
+        if gaps:
+            frames = [cached] if covered is not None else []
+            frames += [fetch(gap_start.to_pydatetime(), gap_end.to_pydatetime()) for gap_start, gap_end in gaps]
+            frames = [frame for frame in frames if not frame.empty]
+            data = pd.concat(frames) if frames else pd.DataFrame(index=pd.DatetimeIndex([], name="time"))
+            data = data[~data.index.duplicated(keep="last")].sort_index()
+
+            new_start = start if covered is None else min(start, covered[0])
+            new_end = end if covered is None else max(end, covered[1])
+            # frische Tage nicht als endgültig merken
+            provisional = _day(datetime.now()) - timedelta(days=self.recent_days)
+            new_end = max(min(new_end, provisional), new_start - timedelta(days=1))
+
+            with self._lock:
+                size = self._write(station_id, data)
+                self._index[station_id] = {
+                    "start": new_start.strftime('%Y-%m-%d'),
+                    "end": new_end.strftime('%Y-%m-%d'),
+                    "size": size,
+                    "last_access": datetime.now().isoformat(),
+                }
+                self._enforce_limit(keep=station_id)
+                self._save_index()
+        else:
+            data = cached
+
+        return data.loc[start:end]
+
+    def _enforce_limit(self, keep=None):
+        """Entfernt die am längsten nicht genutzten Stationen, bis max_bytes eingehalten ist"""
+        if self.max_bytes is None:
+            return
+        by_access = sorted(self._index.items(), key=lambda item: item[1].get("last_access", ""))
+        for station_id, entry in by_access:
+            if self.total_bytes() <= self.max_bytes:
+                break
+            if station_id != keep:
+                self._remove(station_id)
+
+    def _remove(self, station_id):
+        self._index.pop(station_id, None)
+        try:
+            os.remove(self._data_path(station_id))
+        except FileNotFoundError:
+            pass
+
+    def evict(self, station_ids=None, older_than=None):
+        """
+        Entfernt Stationen aus dem Cache
+        - station_ids: diese Stationen (None = alle, die zu older_than passen)
+        - older_than: nur Stationen, deren letzter Zugriff länger als diese timedelta her ist
+        """
+        with self._lock:
+            candidates = list(self._index) if station_ids is None else [str(sid) for sid in station_ids]
+            if older_than is not None:
+                limit = (datetime.now() - older_than).isoformat()
+                candidates = [sid for sid in candidates if self._index.get(sid, {}).get("last_access", "") < limit]
+            for station_id in candidates:
+                self._remove(station_id)
+            self._save_index()
+        return candidates